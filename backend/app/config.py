@@ -22,6 +22,20 @@ class DatabaseSettings(BaseSettings):
         name (str): Database name. Default: "ddfr_db".
         collection (str): MongoDB collection name. Default: "people".
         hash (str): Hash for data security. Required, no default value.
+        max_pool_size (int): Maximum connections in the client pool. Default: 50.
+        min_pool_size (int): Connections kept open even when idle. Default: 0.
+        max_idle_time_ms (Optional[int]): Close pooled connections idle for longer. Default: None (never).
+        wait_queue_timeout_ms (Optional[int]): Maximum wait for a free pooled connection. Default: None (no limit).
+        connect_timeout_ms (int): Timeout to open a connection. Default: 5000.
+        socket_timeout_ms (Optional[int]): Timeout of a single operation on the socket. Default: None (no limit).
+        server_selection_timeout_ms (int): Time to find a suitable server before failing. Default: 5000.
+        heartbeat_frequency_ms (int): Interval between server monitoring checks. Default: 10000.
+        compressors (str): Comma-separated wire compressors in order of preference
+            (zstd, snappy, zlib); empty disables compression. Default: "zstd,snappy".
+        read_preference (str): Read preference (primary, primaryPreferred, secondary,
+            secondaryPreferred, nearest). Default: "primary".
+        ensure_indexes (bool): Create the collection indexes at startup if missing. Default: True.
+        slow_query_ms (int): Log commands slower than this; 0 disables. Default: 100.
 
     """
 
@@ -29,6 +43,18 @@ class DatabaseSettings(BaseSettings):
     name: str = "ddfr_dev_db"
     collection: str = "people"
     hash: str 
+    max_pool_size: int = 50
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = None
+    wait_queue_timeout_ms: Optional[int] = None
+    connect_timeout_ms: int = 5000
+    socket_timeout_ms: Optional[int] = None
+    server_selection_timeout_ms: int = 5000
+    heartbeat_frequency_ms: int = 10000
+    compressors: str = "zstd,snappy"
+    read_preference: str = "primary"
+    ensure_indexes: bool = True
+    slow_query_ms: int = 100
     
     class Config:
         env_prefix = "DB_"
@@ -74,6 +100,12 @@ class APISettings(BaseSettings):
         use_https (bool): Enable HTTPS. Default: False.
         keypath (Optional[str]): Path to SSL private key file. Default: None.
         certpath (Optional[str]): Path to SSL certificate file. Default: None.
+        warmup (bool): Load the gallery and the models at startup and run warm-up
+            inferences before reporting ready; when False the engine is built by the
+            first request. Default: True.
+        warmup_runs (int): Repetitions of every warm-up inference. Default: 2.
+        warmup_retry_delay (float): Seconds between warm-up attempts when it fails
+            (e.g. database not reachable yet). Default: 5.0.
 
     """
 
@@ -87,6 +119,9 @@ class APISettings(BaseSettings):
     use_https: bool = False
     keypath: Optional[str] = None
     certpath: Optional[str] = None
+    warmup: bool = True
+    warmup_runs: int = 2
+    warmup_retry_delay: float = 5.0
 
     class Config:
         env_prefix = "APP_"
@@ -94,6 +129,319 @@ class APISettings(BaseSettings):
         env_file_encoding = 'utf-8'
         extra = "ignore"
 
+class StreamSettings(BaseSettings):
+    """Frame streaming configuration settings.
+
+    Loads settings from .env file using the "STREAM_" prefix.
+    All environment variables must be prefixed with STREAM_ to be recognized.
+
+    Attributes:
+        decode_backend (str): JPEG decoder to use: "auto", "turbojpeg", "simplejpeg"
+            or "opencv". "auto" picks the fastest installed one. Default: "auto".
+        reduced_decode (bool): Decode JPEG frames at 1/2, 1/4 or 1/8 scale when the
+            frame is larger than the detection size. Default: True.
+        motion_gate (bool): Skip detection on frames that did not change since the
+            last analyzed one and return the previous result. Default: True.
+        motion_threshold (float): Mean absolute gray-level difference (0-255) between
+            downsampled frames above which the scene is considered changed. Default: 4.0.
+        motion_max_skip (int): Consecutive static frames after which a full analysis
+            is forced anyway. Default: 50.
+        channel_queue_size (int): Results buffered per channel viewer; slow viewers
+            lose the oldest ones. Default: 8.
+        hints (bool): Add to every WebSocket response the frame interval and capture
+            resolution the client should use given the server load. Default: True.
+        hint_min_interval_ms (int): Shortest frame interval ever recommended. Default: 15.
+        hint_max_interval_ms (int): Longest frame interval ever recommended. Default: 1000.
+        hint_utilization (float): Fraction of the inference workers the recommended
+            intervals aim to keep busy. Default: 0.8.
+        hint_resolutions (str): Comma-separated capture resolutions recommended from
+            no load to overload. Default: "640x480,480x360,320x240".
+        roi_full_scan_every (int): Between full-frame detections, search only around
+            the faces of the previous frame; a full scan runs every this many frames
+            (1 disables region detection). Also used by video ingestion. Default: 10.
+        roi_det_size (int): Detection input size for the regions (multiple of 32). Default: 160.
+        track_iou (float): Minimum IoU to continue a face track. Default: 0.3.
+        track_max_missed (int): Processed frames a track survives without a match. Default: 5.
+
+    """
+
+    decode_backend: str = "auto"
+    reduced_decode: bool = True
+    motion_gate: bool = True
+    motion_threshold: float = 4.0
+    motion_max_skip: int = 50
+    channel_queue_size: int = 8
+    hints: bool = True
+    hint_min_interval_ms: int = 15
+    hint_max_interval_ms: int = 1000
+    hint_utilization: float = 0.8
+    hint_resolutions: str = "640x480,480x360,320x240"
+    roi_full_scan_every: int = 10
+    roi_det_size: int = 160
+    track_iou: float = 0.3
+    track_max_missed: int = 5
+
+    class Config:
+        env_prefix = "STREAM_"
+        env_file = ENV_FILE_PATH
+        env_file_encoding = 'utf-8'
+        extra = "ignore"
+
+class BatchSettings(BaseSettings):
+    """Batch identification configuration settings.
+
+    Loads settings from .env file using the "BATCH_" prefix.
+    All environment variables must be prefixed with BATCH_ to be recognized.
+
+    Attributes:
+        max_images (int): Maximum number of images accepted by a single request. Default: 1000.
+        max_image_mb (float): Maximum size of a single image in MB; larger ones are
+            reported as errors. Default: 20.0.
+        decode_workers (int): Threads decoding images while the inference worker
+            runs detection. Default: 2.
+        prefetch (int): Images decoded ahead of the inference worker. Default: 4.
+        identify_batch (int): Images whose faces are searched in the gallery with
+            a single identify call. Default: 16.
+
+    """
+
+    max_images: int = 1000
+    max_image_mb: float = 20.0
+    decode_workers: int = 2
+    prefetch: int = 4
+    identify_batch: int = 16
+
+    class Config:
+        env_prefix = "BATCH_"
+        env_file = ENV_FILE_PATH
+        env_file_encoding = 'utf-8'
+        extra = "ignore"
+
+class IngestSettings(BaseSettings):
+    """Server-side video ingestion configuration settings.
+
+    Loads settings from .env file using the "INGEST_" prefix.
+    All environment variables must be prefixed with INGEST_ to be recognized.
+
+    Attributes:
+        sources (str): Comma-separated ``name=source`` pairs started with the server,
+            where source is a video file path, a stream URL (rtsp://, http://) or a
+            camera index. Default: "" (no ingestion).
+        fps (float): Frames per second sampled from each source. Default: 5.0.
+        sinks (str): Comma-separated result sinks: "log", "jsonl", "broadcast".
+            Default: "broadcast".
+        jsonl_folder (str): Directory of the ``<name>.jsonl`` files written by the
+            "jsonl" sink. Default: "ingest" in backend directory.
+        queue_size (int): Decoded frames buffered between the decode and inference
+            threads. Live streams drop the oldest frame when full. Default: 2.
+        reconnect_delay (float): Seconds to wait before reopening a failed stream. Default: 5.0.
+        track_iou (float): Minimum IoU to continue a face track. Default: 0.3.
+        track_max_missed (int): Processed frames a track survives without a match. Default: 5.
+
+    """
+
+    sources: str = ""
+    fps: float = 5.0
+    sinks: str = "broadcast"
+    jsonl_folder: str = os.path.join(BACKEND_DIR, "ingest")
+    queue_size: int = 2
+    reconnect_delay: float = 5.0
+    track_iou: float = 0.3
+    track_max_missed: int = 5
+
+    class Config:
+        env_prefix = "INGEST_"
+        env_file = ENV_FILE_PATH
+        env_file_encoding = 'utf-8'
+        extra = "ignore"
+
+class SchedulerSettings(BaseSettings):
+    """Inference scheduling configuration settings.
+
+    Loads settings from .env file using the "SCHED_" prefix.
+    All environment variables must be prefixed with SCHED_ to be recognized.
+
+    Attributes:
+        workers (int): Inference worker threads. Default: 1.
+        max_queue (int): Queued jobs from which new WebSocket frames are rejected
+            with a "busy" response. Default: 16.
+        degrade_queue (int): Queued jobs from which WebSocket frames are analyzed in
+            degraded mode. Default: 8.
+        degrade_det_size (int): Detection input size in degraded mode. Default: 320.
+        degrade_skip_recognition (bool): Skip embedding and gallery search in degraded
+            mode (faces are reported without identity). Default: False.
+        default_priority (str): Priority of WebSocket connections that do not ask for
+            one: "high", "normal" or "low". Default: "normal".
+        allowed_priorities (str): Comma-separated priorities a WebSocket client may
+            request with ``?priority=``; "high" skips admission control and is served
+            before every other client, so it must be enabled explicitly. Default: "normal,low".
+        batch_priority (str): Priority of batch identification requests. Default: "low".
+        ingest_priority (str): Priority of ingestion workers. Default: "normal".
+
+    """
+
+    workers: int = 1
+    max_queue: int = 16
+    degrade_queue: int = 8
+    degrade_det_size: int = 320
+    degrade_skip_recognition: bool = False
+    default_priority: str = "normal"
+    allowed_priorities: str = "normal,low"
+    batch_priority: str = "low"
+    ingest_priority: str = "normal"
+
+    class Config:
+        env_prefix = "SCHED_"
+        env_file = ENV_FILE_PATH
+        env_file_encoding = 'utf-8'
+        extra = "ignore"
+
+class QualitySettings(BaseSettings):
+    """Face quality check configuration settings.
+
+    Loads settings from .env file using the "QUALITY_" prefix.
+    All environment variables must be prefixed with QUALITY_ to be recognized.
+
+    Attributes:
+        stream (bool): Skip recognition of low-quality faces in WebSocket streams and
+            video ingestion; they are reported as unknown. Default: True.
+        enrol (bool): Reject enrolment photos whose face is of low quality. Default: True.
+        min_face_size (float): Minimum shortest side of the face box, in pixels. Default: 32.
+        min_det_score (float): Minimum detection confidence. Default: 0.6.
+        min_sharpness (float): Minimum Laplacian variance of the face crop resized to
+            64x64; lower values mean blur. Default: 20.0.
+        max_yaw (float): Maximum horizontal offset of the nose from the eye midpoint,
+            relative to the eye distance. Default: 0.6.
+        max_pitch (float): Maximum vertical offset of the nose from halfway between
+            eyes and mouth, relative to their distance. Default: 0.35.
+        enrol_min_face_size (float): Minimum face size for enrolment photos. Default: 80.
+        enrol_min_sharpness (float): Minimum sharpness for enrolment photos. Default: 40.0.
+        enrol_dedupe (bool): Drop enrolment embeddings nearly identical to another
+            photo of the same person. Default: True.
+        enrol_dedupe_similarity (float): Cosine similarity from which two enrolment
+            embeddings are duplicates. Default: 0.95.
+        enrol_dedupe_merge (bool): Average duplicates into the embedding they
+            duplicate instead of dropping them. Default: False.
+
+    """
+
+    stream: bool = True
+    enrol: bool = True
+    min_face_size: float = 32
+    min_det_score: float = 0.6
+    min_sharpness: float = 20.0
+    max_yaw: float = 0.6
+    max_pitch: float = 0.35
+    enrol_min_face_size: float = 80
+    enrol_min_sharpness: float = 40.0
+    enrol_dedupe: bool = True
+    enrol_dedupe_similarity: float = 0.95
+    enrol_dedupe_merge: bool = False
+
+    class Config:
+        env_prefix = "QUALITY_"
+        env_file = ENV_FILE_PATH
+        env_file_encoding = 'utf-8'
+        extra = "ignore"
+
+class IdentitySettings(BaseSettings):
+    """Per-track identity smoothing configuration settings.
+
+    Loads settings from .env file using the "IDENTITY_" prefix.
+    All environment variables must be prefixed with IDENTITY_ to be recognized.
+
+    Attributes:
+        window (int): Identification results kept per tracked face. Default: 10.
+        min_support (float): Fraction of the results in the window the reported
+            identity must have; below it the face is reported as unknown. Default: 0.5.
+        reuse_frames (int): Frames a confident identity is reused without computing
+            the embedding and searching the gallery; 0 searches every frame. Default: 10.
+        reuse_confidence (float): Confidence from which an identity is reused. Default: 0.5.
+
+    """
+
+    window: int = 10
+    min_support: float = 0.5
+    reuse_frames: int = 10
+    reuse_confidence: float = 0.5
+
+    class Config:
+        env_prefix = "IDENTITY_"
+        env_file = ENV_FILE_PATH
+        env_file_encoding = 'utf-8'
+        extra = "ignore"
+
+class EmbeddingSettings(BaseSettings):
+    """Embedding model and re-embedding job configuration settings.
+
+    Loads settings from .env file using the "EMBED_" prefix.
+    All environment variables must be prefixed with EMBED_ to be recognized.
+
+    Attributes:
+        model (str): InsightFace model pack producing the gallery embeddings. Stored
+            embeddings of another pack are not searched until they are re-embedded
+            (see ``services.reembed``). Default: "buffalo_l".
+        reembed_workers (int): Threads reading and decoding the source images of a
+            re-embedding job. Default: 4.
+        reembed_batch_size (int): People re-embedded per step: their images are
+            embedded together and their embeddings written with one bulk write.
+            Default: 32.
+        reembed_priority (str): Inference scheduler priority of a re-embedding job
+            ("high", "normal" or "low"). Default: "low".
+
+    """
+
+    model: str = "buffalo_l"
+    reembed_workers: int = 4
+    reembed_batch_size: int = 32
+    reembed_priority: str = "low"
+
+    class Config:
+        env_prefix = "EMBED_"
+        env_file = ENV_FILE_PATH
+        env_file_encoding = 'utf-8'
+        extra = "ignore"
+
+class ImageStoreSettings(BaseSettings):
+    """Enrolment image store configuration settings.
+
+    Loads settings from .env file using the "STORE_" prefix.
+    All environment variables must be prefixed with STORE_ to be recognized.
+
+    Attributes:
+        folder (str): Directory of the image store. Default: "img/store" in app directory.
+        format (str): Format of the stored originals, "webp" or "jpeg". Default: "webp".
+        quality (int): Encoding quality of the stored originals, 1-100. Default: 85.
+        max_side (int): Originals with a longer side are downscaled to it before
+            being stored; 0 keeps the full resolution. Default: 2048.
+        faces (bool): Also store the aligned face crop of each enrolment photo, so
+            a re-embedding can skip detection. Default: True.
+        gc_min_age (int): Seconds an unreferenced image is kept before garbage
+            collection removes it, covering enrolments still in progress. Default: 3600.
+
+    """
+
+    folder: str = os.path.join(BASE_DIR, "img", "store")
+    format: str = "webp"
+    quality: int = 85
+    max_side: int = 2048
+    faces: bool = True
+    gc_min_age: int = 3600
+
+    class Config:
+        env_prefix = "STORE_"
+        env_file = ENV_FILE_PATH
+        env_file_encoding = 'utf-8'
+        extra = "ignore"
+
 database_settings = DatabaseSettings()
 path_settings = PathSettings()
-api_settings = APISettings()
\ No newline at end of file
+api_settings = APISettings()
+stream_settings = StreamSettings()
+batch_settings = BatchSettings()
+ingest_settings = IngestSettings()
+scheduler_settings = SchedulerSettings()
+quality_settings = QualitySettings()
+identity_settings = IdentitySettings()
+embedding_settings = EmbeddingSettings()
+image_store_settings = ImageStoreSettings()
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""Run face recognition on a video file or stream without the server.
+
+Examples (from the ``backend/app`` directory)::
+
+    python ingestvideo.py /videos/ingresso.mp4 --fps 5 --jsonl ingresso.jsonl
+    python ingestvideo.py rtsp://192.168.1.20/stream1 --name porta --sinks log
+
+"""
+import argparse
+import logging
+import os
+from datetime import datetime
+
+from config import ingest_settings, path_settings
+
+os.makedirs(path_settings.logfolder, exist_ok=True)
+log_filename = os.path.join(
+    path_settings.logfolder, f"ingestvideo-{datetime.now().strftime('%Y%m%d-%H%M%S')}.log"
+)
+
+root_logger = logging.getLogger()
+if not root_logger.handlers:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+        handlers=[logging.FileHandler(log_filename), logging.StreamHandler()],
+    )
+
+logger = logging.getLogger(__name__)
+
+from routers.ingest import create_worker  # noqa: E402
+
+
+def main(argv=None) -> None:
+    """Process a video source until it ends (files) or Ctrl+C (streams).
+
+    Args:
+        argv: Argument list. Default: sys.argv[1:].
+
+    """
+    parser = argparse.ArgumentParser(description="Riconoscimento facciale da file video o stream")
+    parser.add_argument("source", help="File video, URL dello stream (rtsp://, http://) o indice della webcam")
+    parser.add_argument("--name", default="video", help="Nome della sorgente nei risultati")
+    parser.add_argument("--fps", type=float, default=ingest_settings.fps, help="Frame al secondo da analizzare")
+    parser.add_argument("--sinks", default="log,jsonl", help="Sink dei risultati: log, jsonl")
+    parser.add_argument("--jsonl", default=None, help="File JSONL dei risultati (default: INGEST_JSONL_FOLDER/<name>.jsonl)")
+    args = parser.parse_args(argv)
+
+    sinks = [s.strip() for s in args.sinks.split(",") if s.strip()]
+    # Senza il server non c'è un event loop su cui pubblicare i canali
+    if "broadcast" in sinks:
+        parser.error("il sink broadcast è disponibile solo nel server")
+    try:
+        worker = create_worker(args.name, args.source, sinks, fps=args.fps, jsonl_path=args.jsonl)
+    except (FileNotFoundError, ValueError, RuntimeError) as e:
+        parser.error(str(e))
+    worker.start()
+    try:
+        worker.wait()
+    except KeyboardInterrupt:
+        print("Interruzione richiesta.")
+    finally:
+        worker.stop()
+
+    status = worker.status()
+    logger.info(f"Frame letti: {status['frames_read']}, analizzati: {status['frames_processed']}, "
+                f"scartati: {status['frames_dropped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,10 @@ from pathlib import Path
 from services.recognition import FaceEngine
 
 import services.database as database
-from config import database_settings as set, path_settings
+from config import database_settings as set, embedding_settings, path_settings
 from models.person import Person
 from utils.constants import RoleType
+from utils.quality import LowQualityFace, build_gate, dedupe_enrolment
 
 os.makedirs(path_settings.logfolder, exist_ok=True)
 log_filename = os.path.join(
@@ -52,7 +53,8 @@ def main() -> None:
 
     Analyzes all images in the configured images folder, extracts face encodings,
     and inserts a demo person with the collected encodings into the database.
-    Logs errors if no valid encodings are found or if database insertion fails.
+    Photos whose embedding nearly duplicates another one are not stored
+    (``QUALITY_ENROL_DEDUPE``). Logs errors if no valid encodings are found or if database insertion fails.
 
     """
     dataset = database.Database(
@@ -60,17 +62,22 @@ def main() -> None:
         name=set.name,
         collection=set.collection,
     )
-    people = dataset.get_all_people() 
-    engine = FaceEngine(people)   
+    engine = FaceEngine(dataset.load_gallery(model=embedding_settings.model), model_name=embedding_settings.model)
     demo_person = _build_demo_person()
     
     all_encodings = {} 
     folder = Path(path_settings.imgsfolder)
+    quality = build_gate(enrol=True)
     
     for elemento in folder.iterdir():
         if elemento.is_file() and not elemento.name.startswith('.'):
             print(f"Analisi di: {elemento.name}...")
-            new_data = engine.analyze_img(elemento)
+            try:
+                new_data = engine.analyze_img(elemento, quality=quality)
+            except LowQualityFace as e:
+                logger.warning(f"Foto {elemento.name} scartata: {e}")
+                print(f" -> Scartata: {e}.")
+                continue
 
             if new_data is not None:
                 all_encodings.update(new_data) 
@@ -82,7 +89,12 @@ def main() -> None:
         logger.error("Nessun encoding valido generato da nessuna foto.")
         return
 
+    all_encodings, duplicates = dedupe_enrolment(all_encodings)
+    if duplicates:
+        print(f"Foto quasi duplicate non salvate: {len(duplicates)}")
+
     demo_person.encoding = all_encodings
+    demo_person.encoding_model = engine.model_name
     saved = dataset.add_person(demo_person)
 
     if saved is not None:
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
@@ -41,6 +42,11 @@ logger = logging.getLogger(__name__)
 
 from routers import websocket  # noqa: E402
 from routers import route      # noqa: E402
+from routers import batch      # noqa: E402
+from routers import ingest     # noqa: E402
+from routers import channels   # noqa: E402
+from routers import health     # noqa: E402
+from routers import reembed    # noqa: E402
 
 
 @asynccontextmanager
@@ -48,8 +54,12 @@ async def lifespan(app: FastAPI):
     """Manage application lifespan events.
 
     Context manager for FastAPI application startup and shutdown events.
-    Currently performs no operations, but can be extended for initialization
-    and cleanup tasks.
+    Binds the channel hub to the event loop, starts the server-side video
+    ingestion workers configured with ``INGEST_SOURCES`` and stops them on
+    shutdown. With ``APP_WARMUP`` the gallery and the models are loaded and
+    warmed up in the background (see ``routers.health.warm_up``) while the
+    server already answers liveness checks. A running re-embedding job is
+    stopped on shutdown and resumes when started again.
 
     Args:
         app (FastAPI): The FastAPI application instance.
@@ -58,7 +68,18 @@ async def lifespan(app: FastAPI):
         None: Control is yielded to the application.
 
     """
+    channels.hub.bind(asyncio.get_running_loop())
+    warmup = None
+    if api_settings.warmup:
+        warmup = asyncio.create_task(health.warm_up())
+    else:
+        health.state["ready"] = True
+    ingest.start_ingestion()
     yield
+    if warmup is not None:
+        warmup.cancel()
+    ingest.stop_ingestion()
+    reembed.stop_job()
 
 
 app = FastAPI(
@@ -79,6 +100,11 @@ app.add_middleware(
 
 app.include_router(websocket.router)
 app.include_router(route.router)
+app.include_router(batch.router)
+app.include_router(ingest.router)
+app.include_router(channels.router)
+app.include_router(health.router)
+app.include_router(reembed.router)
 
 
 @app.get("/")
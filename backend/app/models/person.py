@@ -28,6 +28,8 @@ class Person(BaseModel):
         birthday (datetime): Person's date of birth. Required, must be valid date.
         relationship (RelationshipType): Relationship type to the user. Default: ALTRO.
         encoding (Optional[dict]): Dictionary of face encodings (hash -> embedding vector). Default: None.
+        encoding_model (Optional[str]): Model pack that produced ``encoding``; None means
+            the configured one (``EMBED_MODEL``) when saved. Default: None.
         role (RoleType): Person's role in the system. Default: GUEST.
 
     """
@@ -40,6 +42,7 @@ class Person(BaseModel):
     
     relationship: RelationshipType = RelationshipType.ALTRO
     encoding: Optional[dict] = None 
+    encoding_model: Optional[str] = None
     role: RoleType = RoleType.GUEST   
     
 
@@ -86,10 +89,80 @@ class Person(BaseModel):
             int: Person's age in years. Returns 0 if birthday is not set.
 
         """
-        today = date.today()
-        if not self.birthday:
-            return 0
-        
-        return today.year - self.birthday.year - (
-            (today.month, today.day) < (self.birthday.month, self.birthday.day)
-        )
\ No newline at end of file
+        return compute_age(self.birthday)
+
+
+def compute_age(birthday: Optional[datetime]) -> int:
+    """Return the age in years of a person born on ``birthday``, 0 if not set."""
+    if not birthday:
+        return 0
+    today = date.today()
+    return today.year - birthday.year - ((today.month, today.day) < (birthday.month, birthday.day))
+
+
+class GalleryPerson:
+    """Compact, read-only record of a person in the recognition gallery.
+
+    Holds only the fields reported with a recognized face, without the face
+    encodings: ``FaceEngine`` keeps one record per person and maps each
+    embedding row to it, instead of keeping a full ``Person`` (with its
+    encodings as lists of Python floats) per row.
+
+    Attributes:
+        id (Optional[PyObjectId]): MongoDB document ID.
+        name (str): First name.
+        surname (str): Last name.
+        birthday (datetime): Date of birth.
+        relationship (RelationshipType): Relationship to the user.
+        role (RoleType): Role in the system.
+
+    """
+
+    __slots__ = ("id", "name", "surname", "birthday", "relationship", "role")
+
+    def __init__(self, id, name: str, surname: str, birthday: datetime, relationship: RelationshipType, role: RoleType):
+        """Initialize GalleryPerson."""
+        self.id = id
+        self.name = name
+        self.surname = surname
+        self.birthday = birthday
+        self.relationship = relationship
+        self.role = role
+
+    @classmethod
+    def from_person(cls, person: Person) -> "GalleryPerson":
+        """Build the record of a Person, dropping its encodings."""
+        return cls(person.id, person.name, person.surname, person.birthday, person.relationship, person.role)
+
+    @property
+    def age(self) -> int:
+        """Age in years, computed on access like ``Person.age``."""
+        return compute_age(self.birthday)
+
+    def __repr__(self) -> str:
+        return f"GalleryPerson(id={self.id!r}, name={self.name!r}, surname={self.surname!r})"
+
+
+class Gallery:
+    """Embeddings and person records ready to be searched, built without ``Person`` objects.
+
+    Produced by ``Database.load_gallery`` and accepted by ``FaceEngine`` in
+    place of a list of people.
+
+    Attributes:
+        matrix (np.ndarray | None): float32 (N, D) embeddings, not normalized; None if empty.
+        people (list[GalleryPerson]): One record per person with at least one embedding.
+        person_rows (np.ndarray): int32 index into ``people`` of each row of ``matrix``.
+
+    """
+
+    __slots__ = ("matrix", "people", "person_rows")
+
+    def __init__(self, matrix, people: list, person_rows):
+        """Initialize Gallery."""
+        self.matrix = matrix
+        self.people = people
+        self.person_rows = person_rows
+
+    def __len__(self) -> int:
+        return len(self.person_rows)
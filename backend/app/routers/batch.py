@@ -0,0 +1,377 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import UploadFile
+import asyncio
+import io
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, BinaryIO, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pillow_heif as heif
+from PIL import Image
+
+from config import batch_settings, scheduler_settings
+
+from . import route
+from .websocket import IDENTIFY_THRESHOLD, GalleryFilter, build_faces_data, decoder, parse_gallery_filter, scheduler
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tiff", ".gif", ".heic")
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+ARCHIVE_CONTENT_TYPES = (
+    "application/zip",
+    "application/x-zip-compressed",
+    "application/x-tar",
+    "application/gzip",
+    "application/x-gzip",
+)
+
+# Il body grezzo di un archivio resta in memoria fino a questa dimensione, poi va su disco
+SPOOL_MAX_SIZE = 32 * 1024 * 1024
+
+# Decodifica in parallelo all'inferenza: cv2/simplejpeg rilasciano il GIL
+decode_executor = ThreadPoolExecutor(max_workers=batch_settings.decode_workers, thread_name_prefix="batch-decode")
+
+# (nome file, bytes dell'immagine o None, messaggio di errore o None)
+SourceItem = Tuple[str, Optional[bytes], Optional[str]]
+
+
+def _is_image(name: str) -> bool:
+    """Check whether a file name has a supported image extension."""
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def _is_archive(name: str | None, content_type: str | None) -> bool:
+    """Check whether an upload is a zip or tar archive from its name or content type."""
+    if name and name.lower().endswith(ARCHIVE_EXTENSIONS):
+        return True
+    return (content_type or "").split(";")[0].strip().lower() in ARCHIVE_CONTENT_TYPES
+
+
+def _check_size(name: str, size: int) -> Optional[str]:
+    """Return an error message if an image exceeds ``max_image_mb``."""
+    if size > batch_settings.max_image_mb * 1024 * 1024:
+        return f"Immagine troppo grande ({size / 1024 / 1024:.1f} MB, massimo {batch_settings.max_image_mb} MB)"
+    return None
+
+
+def iter_archive(fileobj: BinaryIO, name: str = "archive") -> Iterator[SourceItem]:
+    """Iterate over the images contained in a zip or tar archive.
+
+    Members are read one at a time, so only the image being decoded is held
+    in memory. Directories and files without an image extension are skipped.
+
+    Args:
+        fileobj (BinaryIO): Seekable file object with the archive content.
+        name (str): Archive name used as prefix of member names. Default: "archive".
+
+    Yields:
+        SourceItem: (member name, image bytes or None, error or None).
+
+    """
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not _is_image(info.filename):
+                    continue
+                member = f"{name}/{info.filename}"
+                error = _check_size(member, info.file_size)
+                yield (member, None, error) if error else (member, archive.read(info), None)
+        return
+
+    fileobj.seek(0)
+    with tarfile.open(fileobj=fileobj, mode="r:*") as archive:
+        for info in archive:
+            if not info.isfile() or not _is_image(info.name):
+                continue
+            member = f"{name}/{info.name}"
+            error = _check_size(member, info.size)
+            if error:
+                yield member, None, error
+                continue
+            extracted = archive.extractfile(info)
+            yield member, extracted.read() if extracted is not None else None, None
+
+
+def iter_uploads(uploads: List[UploadFile]) -> Iterator[SourceItem]:
+    """Iterate over uploaded images, expanding zip and tar archives.
+
+    Args:
+        uploads (List[UploadFile]): Files of a multipart request.
+
+    Yields:
+        SourceItem: (file name, image bytes or None, error or None).
+
+    """
+    for index, upload in enumerate(uploads):
+        name = upload.filename or f"file{index}"
+        if _is_archive(upload.filename, upload.content_type):
+            yield from iter_archive(upload.file, name)
+            continue
+        upload.file.seek(0, os.SEEK_END)
+        error = _check_size(name, upload.file.tell())
+        if error:
+            yield name, None, error
+            continue
+        upload.file.seek(0)
+        yield name, upload.file.read(), None
+
+
+def decode_image(data: bytes) -> Tuple[Optional[np.ndarray], float]:
+    """Decode an uploaded image for detection.
+
+    Uses the streaming ``FrameDecoder`` (reduced-scale JPEG decoding) and falls
+    back to Pillow for formats OpenCV cannot read (HEIC, animated GIF).
+
+    Args:
+        data (bytes): Encoded image.
+
+    Returns:
+        Tuple[Optional[np.ndarray], float]: BGR frame (None if unreadable) and the
+            factor mapping frame coordinates back to the original image.
+
+    """
+    frame, scale = decoder.decode(data)
+    if frame is not None:
+        return frame, scale
+
+    heif.register_heif_opener()
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            rgb = np.asarray(img.convert("RGB"))
+    except Exception:
+        return None, 1.0
+    return np.ascontiguousarray(rgb[:, :, ::-1]), 1.0
+
+
+def _next_decoded(source: Iterator[SourceItem], lock: threading.Lock):
+    """Read the next image from the source and decode it (runs on the decode pool).
+
+    Reading is serialized by ``lock`` because archives are read sequentially;
+    decoding runs in parallel across decode workers.
+
+    Returns:
+        tuple | None: (name, frame, scale, error), or None when the source is exhausted.
+
+    """
+    with lock:
+        try:
+            item = next(source, None)
+        except Exception as e:
+            logger.error(f"Errore nella lettura dell'archivio: {e}")
+            return "archive", None, 1.0, f"Archivio non leggibile: {e}"
+    if item is None:
+        return None
+
+    name, data, error = item
+    if error is not None or data is None:
+        return name, None, 1.0, error or "File non leggibile"
+    try:
+        frame, scale = decode_image(data)
+    except Exception as e:
+        logger.error(f"Errore decodifica {name}: {e}")
+        frame, scale = None, 1.0
+    if frame is None:
+        return name, None, 1.0, "Immagine non decodificabile"
+    return name, frame, scale, None
+
+
+def _has_more(source: Iterator[SourceItem], lock: threading.Lock) -> bool:
+    """Read one more item from the source, without decoding it (runs on the decode pool).
+
+    Returns:
+        bool: True if the source was not exhausted.
+
+    """
+    with lock:
+        try:
+            return next(source, None) is not None
+        except Exception as e:
+            logger.error(f"Errore nella lettura dell'archivio: {e}")
+            return False
+
+
+def _identify_group(engine, group: list, gallery: Optional[GalleryFilter] = None) -> List[dict]:
+    """Identify the faces of several images with a single gallery search.
+
+    Args:
+        engine (FaceEngine): Face recognition engine.
+        group (list): (name, faces, width, height, scale) of analyzed images.
+        gallery (GalleryFilter | None): Search only the people with these roles and
+            relationships. Default: None (whole gallery).
+
+    Returns:
+        List[dict]: One result per image, in the order of ``group``.
+
+    """
+    embeddings = [face.embedding for _, faces, _, _, _ in group for face in faces]
+    if embeddings and engine.feature_matrix is not None:
+        partition = engine.partition(*gallery) if gallery is not None else None
+        identities = engine.identify(embeddings, threshold=IDENTIFY_THRESHOLD, partition=partition)
+    else:
+        identities = [(None, 0.0)] * len(embeddings)
+
+    results = []
+    offset = 0
+    for name, faces, width, height, scale in group:
+        people = [person for person, _ in identities[offset:offset + len(faces)]]
+        offset += len(faces)
+        faces_data = build_faces_data(list(zip(people, faces)), width, height, scale)
+        results.append({"file": name, "status": "ok", "width": width, "height": height, "faces": faces_data})
+    return results
+
+
+def _line(result: dict) -> bytes:
+    """Serialize a result as one NDJSON line."""
+    return (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def identify_stream(
+    source: Iterator[SourceItem], closables: list, gallery: Optional[GalleryFilter] = None
+) -> AsyncIterator[bytes]:
+    """Run the batch pipeline and yield one NDJSON line per image.
+
+    Decoding runs on ``decode_executor`` up to ``prefetch`` images ahead of the
+    inference worker; detection and recognition are submitted to the inference
+    scheduler one image at a time, as a ``SCHED_BATCH_PRIORITY`` client that is
+    never rejected, so live streams keep being served between images. Faces of up to ``identify_batch`` analyzed images are searched in the
+    gallery together; a partial group is flushed as soon as no decoded image is
+    waiting, so results are never held back by slow decoding. A final summary
+    line closes the stream.
+
+    Args:
+        source (Iterator[SourceItem]): Images to process.
+        closables (list): File objects to close when the stream ends.
+        gallery (GalleryFilter | None): Search only the people with these roles and
+            relationships. Default: None (whole gallery).
+
+    Yields:
+        bytes: NDJSON lines.
+
+    """
+    loop = asyncio.get_running_loop()
+    lock = threading.Lock()
+    in_flight: set = set()
+    group: list = []
+    exhausted = False
+    stats = {"images": 0, "faces": 0, "errors": 0}
+    executor = scheduler.register("batch", priority=scheduler_settings.batch_priority, admission=False)
+
+    try:
+        engine = await loop.run_in_executor(executor, route.get_engine)
+
+        while True:
+            while not exhausted and len(in_flight) < batch_settings.prefetch:
+                if stats["images"] + stats["errors"] + len(in_flight) + len(group) >= batch_settings.max_images:
+                    break
+                in_flight.add(loop.run_in_executor(decode_executor, _next_decoded, source, lock))
+            if not in_flight:
+                break
+
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item = task.result()
+                if item is None:
+                    exhausted = True
+                    continue
+                name, frame, scale, error = item
+                if error is not None:
+                    stats["errors"] += 1
+                    yield _line({"file": name, "status": "error", "detail": error})
+                    continue
+                faces = await loop.run_in_executor(executor, engine.analyze_frame, frame)
+                height, width = frame.shape[:2]
+                group.append((name, faces, round(width * scale), round(height * scale), scale))
+
+            if group and (len(group) >= batch_settings.identify_batch or not any(t.done() for t in in_flight)):
+                for result in await loop.run_in_executor(executor, _identify_group, engine, group, gallery):
+                    stats["images"] += 1
+                    stats["faces"] += len(result["faces"])
+                    yield _line(result)
+                group = []
+
+        # Limite raggiunto: errore solo se resta davvero qualche immagine
+        if not exhausted and await loop.run_in_executor(decode_executor, _has_more, source, lock):
+            stats["errors"] += 1
+            yield _line({"status": "error", "detail": f"Limite di {batch_settings.max_images} immagini raggiunto"})
+        yield _line({"status": "done", **stats})
+    finally:
+        executor.shutdown()
+        for task in in_flight:
+            task.cancel()
+        for f in closables:
+            try:
+                f.close()
+            except Exception as e:
+                logger.warning(f"Errore nella chiusura di un file caricato: {e}")
+
+
+@router.post("/api/identify/batch")
+async def identify_batch(request: Request) -> StreamingResponse:
+    """Identify faces in many images, streaming results as NDJSON.
+
+    Accepts either a ``multipart/form-data`` request with any number of image
+    files (zip and tar archives among them are expanded), or a zip/tar archive
+    sent as the raw request body (``Content-Type: application/zip``,
+    ``application/x-tar`` or ``application/gzip``). Each line of the response is
+    a JSON object for one image, emitted as soon as that image is done:
+    ``{"file": str, "status": "ok", "width": int, "height": int, "faces": [...]}``
+    with faces in the WebSocket format, or ``{"file": str, "status": "error",
+    "detail": str}``. The last line is ``{"status": "done", "images": int,
+    "faces": int, "errors": int}``.
+
+    The ``roles`` and ``relationships`` query parameters restrict the search
+    to part of the gallery, as for WebSocket connections.
+
+    Args:
+        request (Request): Incoming request.
+
+    Returns:
+        StreamingResponse: ``application/x-ndjson`` stream of results.
+
+    Raises:
+        HTTPException: If the content type is not supported, no file was sent or
+            a role or relationship is not valid.
+
+    """
+    content_type = request.headers.get("content-type", "")
+    try:
+        gallery = parse_gallery_filter(request.query_params.get("roles"), request.query_params.get("relationships"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form(max_files=batch_settings.max_images)
+        uploads = [value for _, value in form.multi_items() if isinstance(value, UploadFile)]
+        if not uploads:
+            raise HTTPException(status_code=400, detail="Almeno un file è richiesto")
+        source = iter_uploads(uploads)
+        closables = [upload.file for upload in uploads]
+
+    elif _is_archive(None, content_type):
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        async for chunk in request.stream():
+            spool.write(chunk)
+        if spool.tell() == 0:
+            spool.close()
+            raise HTTPException(status_code=400, detail="Archivio vuoto")
+        source = iter_archive(spool)
+        closables = [spool]
+
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail="Usa multipart/form-data oppure un archivio application/zip o application/x-tar",
+        )
+
+    return StreamingResponse(identify_stream(source, closables, gallery), media_type="application/x-ndjson")
@@ -0,0 +1,68 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+import asyncio
+import logging
+
+from config import stream_settings
+from services.channels import ChannelHub
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# Registro unico dei canali: publisher (/ws?channel=..., ingestione) e spettatori
+hub = ChannelHub(queue_size=stream_settings.channel_queue_size)
+
+
+@router.get("/api/channels")
+async def get_channels() -> dict:
+    """Return the active channels with their publisher and subscribers.
+
+    Returns:
+        dict: {"channels": [{"name": str, "publisher": str | None,
+            "subscribers": int, "published": int}, ...]}
+
+    """
+    return {"channels": hub.status()}
+
+
+@router.websocket("/ws/channels/{name}")
+async def subscribe_channel(websocket: WebSocket, name: str):
+    """Stream the recognition results of a channel to a viewer.
+
+    The channel is fed by a browser camera connected to ``/ws?channel=<name>``
+    or by the ingestion worker of the same name; recognition runs once for
+    all viewers. A viewer may connect before the publisher and receives the
+    last result immediately when one exists. Viewers do not send frames.
+
+    Args:
+        websocket (WebSocket): FastAPI WebSocket connection instance.
+        name (str): Channel name.
+
+    """
+    await websocket.accept()
+    _, results = hub.subscribe(name)
+    # Anche con il canale fermo la disconnessione va rilevata subito
+    disconnected = asyncio.create_task(_wait_disconnect(websocket))
+    try:
+        while True:
+            next_result = asyncio.ensure_future(results.get())
+            await asyncio.wait({next_result, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                next_result.cancel()
+                break
+            await websocket.send_json(next_result.result())
+        logger.info(f"Spettatore del canale {name} disconnesso")
+    except WebSocketDisconnect:
+        logger.info(f"Spettatore del canale {name} disconnesso")
+    except Exception as e:
+        logger.error(f"Errore WebSocket sul canale {name}: {e}")
+    finally:
+        disconnected.cancel()
+        hub.unsubscribe(name, results)
+
+
+async def _wait_disconnect(websocket: WebSocket):
+    """Consume incoming messages of a viewer until it disconnects."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
@@ -0,0 +1,97 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+import asyncio
+import logging
+
+from config import api_settings, scheduler_settings, stream_settings
+import services.recognition as fr
+from services.database import Database
+
+from . import route
+from .websocket import scheduler
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# Stato del preriscaldamento, letto dall'endpoint di readiness
+state = {"ready": False, "warmup_ms": None, "attempts": 0, "error": None}
+
+
+def warm_up_engine() -> float:
+    """Build the face engine and run its warm-up inferences (runs on an inference worker).
+
+    Every detection input size used by the pipeline is warmed up: full frames,
+    region detection (``STREAM_ROI_DET_SIZE``) and degraded mode
+    (``SCHED_DEGRADE_DET_SIZE``).
+
+    Returns:
+        float: Seconds spent in the warm-up inferences.
+
+    """
+    engine = route.get_engine()
+    det_sizes = tuple(dict.fromkeys((fr.DETECTION_SIZE, stream_settings.roi_det_size, scheduler_settings.degrade_det_size)))
+    return engine.warm_up(det_sizes=det_sizes, runs=api_settings.warmup_runs)
+
+
+async def warm_up():
+    """Preload the gallery and the models, then mark the service as ready.
+
+    The warm-up runs as a high priority scheduler client, so it executes on
+    the same worker threads (and thread-local buffers) as real frames. If it
+    fails, typically because the database is not reachable yet, it is retried
+    every ``APP_WARMUP_RETRY_DELAY`` seconds; readiness reports the last error
+    meanwhile.
+
+    """
+    client = scheduler.register("warmup", priority="high", admission=False)
+    try:
+        while True:
+            state["attempts"] += 1
+            try:
+                seconds = await asyncio.wrap_future(client.submit(warm_up_engine))
+                break
+            except Exception as e:
+                state["error"] = str(e)
+                logger.error(f"Warm-up fallito (tentativo {state['attempts']}): {e}")
+                await asyncio.sleep(api_settings.warmup_retry_delay)
+    finally:
+        client.shutdown()
+    state.update(ready=True, warmup_ms=round(seconds * 1000, 1), error=None)
+    logger.info("Servizio pronto")
+
+
+@router.get("/health/live")
+async def liveness() -> dict:
+    """Report that the process is up and serving requests.
+
+    Returns:
+        dict: {"status": "alive"}
+
+    """
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def readiness():
+    """Report whether the engine is loaded and warmed up.
+
+    Frames sent before readiness are still served, but the first of them waits
+    for the engine to be loaded. ``database`` reports the MongoDB state seen by
+    the driver's server monitoring (see ``ServerHealth``), without a round trip;
+    recognition keeps working while the database is unreachable, so it does not
+    affect the status code.
+
+    Returns:
+        dict | JSONResponse: {"status": "ready", "warmup_ms": float, "attempts": int,
+            "database": dict | None} with status 200, or {"status": "starting",
+            "attempts": int, "error": str | None, "database": dict | None} with
+            status 503 while the warm-up is running.
+
+    """
+    database = Database.health.snapshot() if Database.health is not None else None
+    if state["ready"]:
+        return {"status": "ready", "warmup_ms": state["warmup_ms"], "attempts": state["attempts"], "database": database}
+    return JSONResponse(
+        status_code=503,
+        content={"status": "starting", "attempts": state["attempts"], "error": state["error"], "database": database},
+    )
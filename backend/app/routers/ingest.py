@@ -0,0 +1,188 @@
+from fastapi import APIRouter
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import services.recognition as fr
+from config import ingest_settings, scheduler_settings, stream_settings
+from services.ingest import BroadcastSink, IngestWorker, JsonlSink, LogSink, VideoSource
+from services.tracking import FaceTracker, IdentityCache, RegionPlanner
+
+from . import route
+from .channels import hub
+from .websocket import build_faces_data, identify_tracked, new_identity_cache, scheduler
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+SINK_TYPES = ("log", "jsonl", "broadcast")
+
+# Worker attivi, per nome della sorgente
+workers: Dict[str, IngestWorker] = {}
+
+
+def analyze_video_frame(
+    frame: np.ndarray,
+    tracker: FaceTracker,
+    identities: IdentityCache,
+    planner: Optional[RegionPlanner] = None,
+) -> dict:
+    """Detect, identify and track the faces of a video frame.
+
+    Args:
+        frame (np.ndarray): BGR frame.
+        tracker (FaceTracker): Tracker of the source the frame belongs to.
+        identities (IdentityCache): Smoothed identities of the tracks of the source.
+        planner (RegionPlanner | None): Region detection state of the source; when
+            None every frame gets a full scan. Default: None.
+
+    Returns:
+        dict: {"status": "ok", "faces": [...]} with faces in the WebSocket format,
+            including the ``track_id`` stable across frames and the smoothed
+            ``confidence`` of the identity.
+
+    """
+    engine = route.get_engine()
+    regions = planner.plan(frame.shape) if planner is not None else None
+    # Regioni che coprono mezzo frame: scansione completa, da registrare come tale nel planner
+    if regions is not None and fr.region_crops(regions, frame.shape) is None:
+        regions = None
+    faces = engine.analyze_frame(
+        frame,
+        det_size=stream_settings.roi_det_size if regions is not None else None,
+        recognize=False,
+        regions=regions,
+    )
+    if planner is not None:
+        planner.update(np.array([face.bbox for face in faces], dtype=np.float32), frame.shape, regions)
+    tracked = identify_tracked(engine, frame, faces, tracker, identities)
+    if not faces:
+        return {"status": "ok", "faces": []}
+
+    height, width = frame.shape[:2]
+    faces_data = build_faces_data([(person, face) for (person, _, _), face in zip(tracked, faces)], width, height)
+    for face_dict, (_, confidence, track_id) in zip(faces_data, tracked):
+        face_dict["track_id"] = track_id
+        face_dict["confidence"] = round(confidence, 3)
+    return {"status": "ok", "faces": faces_data}
+
+
+def parse_sources(value: str) -> Dict[str, str]:
+    """Parse ``INGEST_SOURCES`` into a name -> source mapping.
+
+    Args:
+        value (str): Comma-separated ``name=source`` pairs. A pair without a name
+            is named ``source<N>``.
+
+    Returns:
+        Dict[str, str]: Sources by name.
+
+    """
+    sources = {}
+    for i, entry in enumerate(part.strip() for part in value.split(",")):
+        if not entry:
+            continue
+        name, sep, source = entry.partition("=")
+        # Le URL contengono "=" solo dopo "://", il nome no
+        if not sep or "://" in name:
+            name, source = f"source{i}", entry
+        sources[name.strip()] = source.strip()
+    return sources
+
+
+def create_worker(
+    name: str,
+    source: str,
+    sinks: List[str],
+    fps: Optional[float] = None,
+    jsonl_path: Optional[str] = None,
+) -> IngestWorker:
+    """Build an ingestion worker for a source with the configured settings.
+
+    Args:
+        name (str): Source name.
+        source (str): Video file path, stream URL or camera index.
+        sinks (List[str]): Sink types among "log", "jsonl", "broadcast". "broadcast"
+            publishes on the channel ``name`` and needs the server event loop.
+        fps (float | None): Sampling rate. Default: ``INGEST_FPS``.
+        jsonl_path (str | None): Output of the "jsonl" sink. Default: ``<INGEST_JSONL_FOLDER>/<name>.jsonl``.
+
+    Returns:
+        IngestWorker: The worker, not yet started.
+
+    Raises:
+        FileNotFoundError: If the source is a file path that does not exist.
+        ValueError: If a sink type is unknown or the channel already has a publisher.
+        RuntimeError: If "broadcast" is requested outside the server.
+
+    """
+    unknown = [sink for sink in sinks if sink not in SINK_TYPES]
+    if unknown:
+        raise ValueError(f"Sink sconosciuti: {unknown}. Valori accettati: {list(SINK_TYPES)}")
+    # Prima dei sink: un file mancante non deve lasciare il canale occupato
+    video = VideoSource(source, fps or ingest_settings.fps, ingest_settings.reconnect_delay)
+    tracker = FaceTracker(ingest_settings.track_iou, ingest_settings.track_max_missed)
+    identities = new_identity_cache()
+    planner = RegionPlanner(stream_settings.roi_full_scan_every)
+    result_sinks = []
+    try:
+        for sink in sinks:
+            if sink == "log":
+                result_sinks.append(LogSink(name))
+            elif sink == "jsonl":
+                result_sinks.append(JsonlSink(jsonl_path or os.path.join(ingest_settings.jsonl_folder, f"{name}.jsonl")))
+            else:
+                result_sinks.append(BroadcastSink(hub, name))
+    except Exception:
+        # Libera canale e file dei sink già creati
+        for sink in result_sinks:
+            sink.close()
+        raise
+
+    return IngestWorker(
+        name=name,
+        source=video,
+        process=lambda frame: analyze_video_frame(frame, tracker, identities, planner),
+        sinks=result_sinks,
+        queue_size=ingest_settings.queue_size,
+        executor=scheduler.register(f"ingest-{name}", priority=scheduler_settings.ingest_priority, admission=False),
+    )
+
+
+def start_ingestion():
+    """Start a worker for every source in ``INGEST_SOURCES`` (called at startup)."""
+    sinks = [s.strip() for s in ingest_settings.sinks.split(",") if s.strip()]
+    for name, source in parse_sources(ingest_settings.sources).items():
+        try:
+            worker = create_worker(name, source, sinks)
+        except Exception as e:
+            logger.error(f"Impossibile avviare l'ingestione di {name}: {e}")
+            continue
+        workers[name] = worker
+        worker.start()
+
+
+def stop_ingestion():
+    """Stop all workers (called at shutdown)."""
+    for worker in workers.values():
+        worker.stop()
+    workers.clear()
+
+
+@router.get("/api/ingest")
+async def get_ingest_status() -> dict:
+    """Return the state of the server-side ingestion workers.
+
+    Returns:
+        dict: {"sources": [...]} with counters, latency and channel viewers per source.
+
+    """
+    sources = []
+    for name, worker in workers.items():
+        status = worker.status()
+        channel = hub.channels.get(name)
+        status["subscribers"] = channel.subscribers if channel is not None else 0
+        sources.append(status)
+    return {"sources": sources}
@@ -0,0 +1,106 @@
+from fastapi import APIRouter, HTTPException, Query
+import logging
+from typing import Optional
+
+from pymongo.errors import ConnectionFailure
+
+from config import embedding_settings, path_settings
+from services.reembed import ReembedJob
+
+from . import route
+from .websocket import scheduler
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# Job di ri-estrazione corrente o ultimo terminato
+job: Optional[ReembedJob] = None
+
+
+def _status(current: ReembedJob) -> dict:
+    status = current.status()
+    status["active_model"] = embedding_settings.model
+    try:
+        status["people"] = route.get_database().count_stale_encodings(current.model)
+    except ConnectionFailure:
+        status["people"] = None
+    return status
+
+
+@router.post("/api/reembed")
+def start_reembed(
+    model: str = Query(..., min_length=1),
+    force: bool = False,
+) -> dict:
+    """Start re-embedding the gallery with another model pack.
+
+    Runs in the background (see ``services.reembed.ReembedJob``): recognition
+    keeps using the current model and index until the job swaps in the new
+    ones. Starting a job for the model of an interrupted one resumes it.
+
+    Args:
+        model: InsightFace model pack to switch to.
+        force: Switch even if some people could not be re-embedded; they are
+            excluded from recognition until enrolled again.
+
+    Returns:
+        dict: Job status.
+
+    Raises:
+        HTTPException: 409 if a job is already running.
+
+    """
+    global job
+    if job is not None and job.running:
+        raise HTTPException(status_code=409, detail=f"Ri-estrazione già in corso (modello {job.model})")
+
+    job = ReembedJob(
+        database=route.get_database(),
+        model=model,
+        install=route.install_engine,
+        image_folder=path_settings.imgsfolder,
+        executor=scheduler.register(f"reembed-{model}", priority=embedding_settings.reembed_priority, admission=False),
+        workers=embedding_settings.reembed_workers,
+        batch_size=embedding_settings.reembed_batch_size,
+        force=force,
+    )
+    job.start()
+    return _status(job)
+
+
+@router.get("/api/reembed")
+def get_reembed_status() -> dict:
+    """Return the state of the current or last re-embedding job.
+
+    Returns:
+        dict: Job status with the serving ``active_model`` and, in ``people``, the
+            people still to re-embed ("pending") and already re-embedded ("staged");
+            {"state": "idle", "active_model": str} when no job was started.
+
+    """
+    if job is None:
+        return {"state": "idle", "active_model": embedding_settings.model}
+    return _status(job)
+
+
+@router.delete("/api/reembed")
+def stop_reembed() -> dict:
+    """Stop the running re-embedding job; a new job for the same model resumes it.
+
+    Returns:
+        dict: Job status.
+
+    Raises:
+        HTTPException: 404 if no job was started.
+
+    """
+    if job is None:
+        raise HTTPException(status_code=404, detail="Nessuna ri-estrazione avviata")
+    job.stop()
+    return _status(job)
+
+
+def stop_job():
+    """Stop the running job, if any (called at shutdown)."""
+    if job is not None and job.running:
+        job.stop()
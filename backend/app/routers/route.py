@@ -1,17 +1,22 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query
 from fastapi.responses import JSONResponse
 import logging
 import os
 import tempfile
-from typing import List
+import threading
+from typing import Callable, List, Optional
 from datetime import datetime
 from pathlib import Path
 
+from pymongo.errors import ConnectionFailure
+
 from services.recognition import FaceEngine
-from services.database import Database
-from config import database_settings as set, path_settings
+from services.database import Database, LIST_MAX_LIMIT
+from config import database_settings as set, embedding_settings, image_store_settings, path_settings
 from models.person import Person
 from utils.constants import RelationshipType, RoleType
+from utils.imgstore import image_store
+from utils.quality import LowQualityFace, build_gate, dedupe_enrolment
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -19,6 +24,8 @@ router = APIRouter()
 # Inizializza database e engine (singleton pattern)
 _dataset = None
 _engine = None
+# Warm-up all'avvio e prime richieste non devono costruire due engine
+_engine_lock = threading.Lock()
 
 def get_database() -> Database:
     """Get or create database instance."""
@@ -35,12 +42,37 @@ def get_engine() -> FaceEngine:
     """Get or create face engine instance."""
     global _engine, _dataset
     if _engine is None:
-        if _dataset is None:
-            _dataset = get_database()
-        people = _dataset.get_all_people()
-        _engine = FaceEngine(people)
+        with _engine_lock:
+            if _engine is None:
+                if _dataset is None:
+                    _dataset = get_database()
+                # Caricamento diretto in array NumPy, senza oggetti Person
+                model = embedding_settings.model
+                _engine = FaceEngine(_dataset.load_gallery(model=model), model_name=model)
     return _engine
 
+def install_engine(build: Callable[[], FaceEngine]) -> FaceEngine:
+    """Replace the serving engine with the one returned by ``build``.
+
+    ``build`` runs under the engine lock, so no other engine is built
+    meanwhile; requests already holding the previous engine finish with it
+    and the following ones get the new engine, whose model becomes
+    ``EMBED_MODEL`` for the rest of the process.
+
+    Args:
+        build (Callable[[], FaceEngine]): Builds the new engine.
+
+    Returns:
+        FaceEngine: The installed engine.
+
+    """
+    global _engine
+    with _engine_lock:
+        engine = build()
+        _engine = engine
+        embedding_settings.model = engine.model_name
+    return engine
+
 @router.get("/")
 async def home() -> dict:
     """Return home endpoint greeting message.
@@ -127,6 +159,66 @@ async def get_status() -> dict:
         logger.error(f"   Messaggio: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Errore nel controllo stato: {str(e)}")
 
+@router.get("/api/people")
+def list_people(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=LIST_MAX_LIMIT),
+    fields: Optional[str] = None,
+    embedding_count: bool = True,
+) -> dict:
+    """List the people in the database one page at a time, without embeddings.
+
+    Declared without ``async``: the MongoDB query runs in the threadpool
+    instead of blocking the event loop.
+
+    Args:
+        cursor: ``next_cursor`` of the previous page; omitted for the first page.
+        limit: People per page (1-500). Default: 50.
+        fields: Comma-separated fields to return (see ``Database.list_people``).
+        embedding_count: Add the number of stored embeddings of each person. Default: true.
+
+    Returns:
+        dict: {"people": list[dict], "next_cursor": str | None}
+
+    Raises:
+        HTTPException: 400 if the cursor or a field is not valid, 503 if the
+            database is not reachable.
+
+    """
+    selected = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    try:
+        people, next_cursor = get_database().list_people(
+            after=cursor, limit=limit, fields=selected, embedding_count=embedding_count
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ConnectionFailure as e:
+        raise HTTPException(status_code=503, detail=f"Database non raggiungibile: {e}")
+    return {"people": people, "next_cursor": next_cursor}
+
+@router.post("/api/images/gc")
+def collect_image_garbage(dry_run: bool = False) -> dict:
+    """Remove the stored enrolment photos no person refers to.
+
+    Photos stored less than ``STORE_GC_MIN_AGE`` seconds ago are kept, so
+    enrolments in progress are not affected (see ``ImageStore.collect_garbage``).
+
+    Args:
+        dry_run: Only count the files that would be removed. Default: false.
+
+    Returns:
+        dict: {"files": int, "removed": int, "freed_bytes": int, "kept_recent": int}
+
+    Raises:
+        HTTPException: 503 if the database is not reachable (nothing is removed).
+
+    """
+    try:
+        referenced = get_database().referenced_hashes()
+    except ConnectionFailure as e:
+        raise HTTPException(status_code=503, detail=f"Database non raggiungibile: {e}")
+    return image_store.collect_garbage(referenced, image_store_settings.gc_min_age, dry_run=dry_run)
+
 @router.post("/api/person")
 async def create_person(
     name: str = Form(...),
@@ -139,7 +231,11 @@ async def create_person(
     """Create a new person with multiple photos.
 
     Processes uploaded photos to extract face encodings, combines them,
-    and saves the person to the database.
+    and saves the person to the database. With ``QUALITY_ENROL`` photos whose
+    face is too small, blurred, uncertain or turned away are skipped and
+    listed in ``photos_rejected`` with the reason. With ``QUALITY_ENROL_DEDUPE``
+    photos whose embedding nearly duplicates another one are not stored and
+    are listed in ``photos_duplicate``.
 
     Args:
         name: Person's first name.
@@ -200,7 +296,10 @@ async def create_person(
         # Processa le foto
         dataset = get_database()
         engine = get_engine()
+        quality = build_gate(enrol=True)
         all_encodings = {}
+        files = {}
+        rejected = []
         temp_files = []
         
         try:
@@ -220,20 +319,30 @@ async def create_person(
                 
                 # Processa immagine
                 logger.info(f"Processando foto: {photo.filename}")
-                new_data = engine.analyze_img(temp_file.name)
+                try:
+                    new_data = engine.analyze_img(temp_file.name, quality=quality)
+                except LowQualityFace as e:
+                    logger.warning(f"Foto {photo.filename} scartata: {e}")
+                    rejected.append({"file": photo.filename, "detail": str(e)})
+                    continue
                 
                 if new_data is not None:
                     all_encodings.update(new_data)
+                    files.update({key: photo.filename for key in new_data})
                     logger.info(f"Volto trovato in {photo.filename}")
                 else:
                     logger.warning(f"Nessun volto trovato in {photo.filename}")
             
             # Verifica che almeno un encoding sia stato trovato
             if not all_encodings:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Nessun volto valido trovato nelle foto caricate"
-                )
+                detail = "Nessun volto valido trovato nelle foto caricate"
+                if rejected:
+                    reasons = "; ".join(f"{r['file']}: {r['detail']}" for r in rejected)
+                    detail = f"{detail} (scartate per qualità: {reasons})"
+                raise HTTPException(status_code=400, detail=detail)
+
+            # Scatti a raffica e copie ridimensionate: un solo embedding
+            all_encodings, duplicates = dedupe_enrolment(all_encodings)
             
             # Crea Person object
             person = Person(
@@ -242,7 +351,8 @@ async def create_person(
                 birthday=birthday_date,
                 relationship=relationship_enum,
                 role=role_enum,
-                encoding=all_encodings
+                encoding=all_encodings,
+                encoding_model=engine.model_name,
             )
             
             # Salva nel database
@@ -267,7 +377,12 @@ async def create_person(
                 "birthday": saved_person.birthday.isoformat(),
                 "relationship": saved_person.relationship.value,
                 "role": saved_person.role.value,
-                "photos_processed": len(all_encodings)
+                "photos_processed": len(all_encodings),
+                "photos_rejected": rejected,
+                "photos_duplicate": [
+                    {"file": files.get(key), "duplicate_of": files.get(original)}
+                    for key, original in duplicates.items()
+                ],
             }
             
             return response_data
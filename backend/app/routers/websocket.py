@@ -1,6 +1,5 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 import os
-import cv2
 # Limitiamo i problemi che può causare il Multithreading a numpy
 os.environ["OMP_NUM_THREADS"] = "1"
 os.environ["OPENBLAS_NUM_THREADS"] = "1"
@@ -11,42 +10,353 @@ import numpy as np
 import logging
 
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from itertools import count
 
-from insightface.app.common import Face
-from models.person import Person
-from typing import List, Tuple, Optional
+from models.person import GalleryPerson
+from typing import TYPE_CHECKING, List, Tuple, Optional
 
 import services.recognition as fr
+from config import identity_settings, scheduler_settings, stream_settings
+from services.scheduler import InferenceScheduler, SchedulerBusy, SchedulerClient
+from services.tracking import FaceTracker, IdentityCache, RegionPlanner
+from utils.buffers import buffer_pool
+from utils.constants import RelationshipType, RoleType
+from utils.frames import FrameDecoder
+from utils.motion import MotionGate
+from utils.quality import build_gate
 
 from . import route
+from .channels import hub
+
+if TYPE_CHECKING:
+    from insightface.app.common import Face
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-executor = ThreadPoolExecutor(max_workers=1)
+# Soglia di similarità coseno per considerare un volto riconosciuto
+IDENTIFY_THRESHOLD = 0.4
+
+# Tutta l'inferenza (WebSocket, batch, ingestione) passa da qui: code eque per client
+scheduler = InferenceScheduler(
+    workers=scheduler_settings.workers,
+    max_queue=scheduler_settings.max_queue,
+    degrade_queue=scheduler_settings.degrade_queue,
+)
+_connection_ids = count(1)
+decoder = FrameDecoder(
+    target_size=fr.DETECTION_SIZE,
+    backend=stream_settings.decode_backend,
+    reduced=stream_settings.reduced_decode,
+)
+# Controllo qualità prima del riconoscimento, condiviso con l'ingestione (None se disabilitato)
+quality_gate = build_gate()
+
+# Risposte consecutive a carico più basso prima di risalire di una risoluzione
+HINT_HOLD = 20
+# Risposte consecutive sotto pressione prima di scendere di una risoluzione
+HINT_PRESSURE = 5
+
+
+def parse_resolutions(value: str) -> List[Tuple[int, int]]:
+    """Parse ``STREAM_HINT_RESOLUTIONS`` into (width, height) pairs.
+
+    Args:
+        value (str): Comma-separated ``<width>x<height>`` entries.
+
+    Returns:
+        List[Tuple[int, int]]: Resolutions in the given order.
+
+    Raises:
+        ValueError: If an entry is malformed or the list is empty.
+
+    """
+    resolutions = []
+    for entry in (part.strip() for part in value.split(",")):
+        if not entry:
+            continue
+        width, _, height = entry.lower().partition("x")
+        resolutions.append((int(width), int(height)))
+    if not resolutions:
+        raise ValueError("STREAM_HINT_RESOLUTIONS non contiene risoluzioni")
+    return resolutions
+
+
+CAPTURE_RESOLUTIONS = parse_resolutions(stream_settings.hint_resolutions)
+
+# (ruoli, relazioni) a cui limitare la ricerca nella galleria
+GalleryFilter = Tuple[frozenset, frozenset]
+
+
+def parse_gallery_filter(roles: Optional[str] = None, relationships: Optional[str] = None) -> Optional[GalleryFilter]:
+    """Parse the ``roles`` and ``relationships`` query parameters of a request.
+
+    Args:
+        roles (Optional[str]): Comma-separated ``RoleType`` values. Default: None.
+        relationships (Optional[str]): Comma-separated ``RelationshipType`` values.
+            Default: None.
+
+    Returns:
+        Optional[GalleryFilter]: (roles, relationships) for ``FaceEngine.partition``,
+            or None when neither is given (search the whole gallery).
+
+    Raises:
+        ValueError: If a value is not a valid role or relationship.
+
+    """
+    selected = []
+    for value, enum in ((roles, RoleType), (relationships, RelationshipType)):
+        names = [part.strip() for part in (value or "").split(",") if part.strip()]
+        allowed = {member.value for member in enum}
+        invalid = [name for name in names if name not in allowed]
+        if invalid:
+            raise ValueError(f"Valori non validi: {invalid}. Valori accettati: {sorted(allowed)}")
+        selected.append(frozenset(names))
+    if not any(selected):
+        return None
+    return selected[0], selected[1]
+
+
+class StreamSession:
+    """Per-connection state for a WebSocket frame stream.
+
+    Holds the motion gate and the last analysis result so that static
+    frames can be answered without running detection, the regions where the
+    next frame is searched for faces, the tracks and their smoothed
+    identities, and the state of the frame rate hints sent to the client.
+
+    Attributes:
+        motion_gate (MotionGate | None): Scene-change pre-filter, None if disabled.
+        last_result (dict | None): Last result produced by a full analysis.
+        planner (RegionPlanner): Full-frame or region detection for the next frame.
+        tracker (FaceTracker): Faces followed across frames.
+        identities (IdentityCache): Smoothed identity of each track.
+        gallery (GalleryFilter | None): Roles and relationships searched, None for all.
+        interval_ms (float): Last recommended frame interval.
+        level (int): Index of the last recommended capture resolution.
+        frame_size (tuple | None): Decoded size and scale of the last analyzed frame.
+
+    """
+
+    def __init__(self, gallery: Optional[GalleryFilter] = None):
+        """Initialize StreamSession from stream settings.
+
+        Args:
+            gallery (GalleryFilter | None): Restrict recognition to part of the
+                gallery (see ``parse_gallery_filter``). Default: None.
+
+        """
+        self.motion_gate: MotionGate | None = None
+        if stream_settings.motion_gate:
+            self.motion_gate = MotionGate(
+                threshold=stream_settings.motion_threshold,
+                max_skip=stream_settings.motion_max_skip,
+            )
+        self.last_result: dict | None = None
+        self.planner = RegionPlanner(stream_settings.roi_full_scan_every)
+        self.tracker = FaceTracker(stream_settings.track_iou, stream_settings.track_max_missed)
+        self.identities = new_identity_cache()
+        self.gallery = gallery
+        self.interval_ms = float(stream_settings.hint_min_interval_ms)
+        self.level = 0
+        self.frame_size: tuple | None = None
+        self._calm = 0
+        self._pressure = 0
+
+    def set_frame_size(self, shape: tuple, scale: float):
+        """Reset regions, tracks and identities when the frame size changes.
+
+        Their boxes are in the coordinates of the previous frames, which no
+        longer match after the client switched capture resolution (see
+        ``stream_hints``).
+
+        Args:
+            shape (tuple): Shape of the decoded frame.
+            scale (float): Decoding scale of the frame.
+
+        """
+        size = (shape[:2], scale)
+        if self.frame_size is not None and size != self.frame_size:
+            self.planner.reset()
+            self.tracker.reset()
+            self.identities.reset()
+        self.frame_size = size
+
+
+def new_identity_cache() -> IdentityCache:
+    """Build an identity cache with the ``IDENTITY_`` settings."""
+    return IdentityCache(
+        window=identity_settings.window,
+        min_support=identity_settings.min_support,
+        reuse_frames=identity_settings.reuse_frames,
+        reuse_confidence=identity_settings.reuse_confidence,
+    )
+
+
+def identify_tracked(
+    engine,
+    frame: np.ndarray,
+    faces: List["Face"],
+    tracker: FaceTracker,
+    identities: IdentityCache,
+    recognize: bool = True,
+    gallery: Optional[GalleryFilter] = None,
+) -> List[Tuple[Optional[GalleryPerson], float, int]]:
+    """Track the faces of a frame and identify them through the identity cache.
+
+    Only faces whose track has no confident identity (or whose identity is due
+    for a refresh) are embedded and searched; the others reuse the cached
+    identity. Every search result is a vote in the sliding window of its track,
+    and the reported identity is the one the window supports, so it does not
+    flicker from frame to frame.
+
+    Args:
+        engine (FaceEngine): Face recognition engine.
+        frame (np.ndarray): Frame the faces were detected in.
+        faces (List[Face]): Detected faces, without embeddings.
+        tracker (FaceTracker): Tracker of the stream.
+        identities (IdentityCache): Identity cache of the stream.
+        recognize (bool): Search the gallery; when False only cached identities
+            are reported. Default: True.
+        gallery (GalleryFilter | None): Search only the people with these roles and
+            relationships. Default: None (whole gallery).
+
+    Returns:
+        List[Tuple[Optional[GalleryPerson], float, int]]: (person, confidence, track_id) for
+            each face, in order.
+
+    """
+    tracks = tracker.update(np.array([face.bbox for face in faces], dtype=np.float32))
+    searched = set()
+    if recognize and faces and engine.feature_matrix is not None:
+        pending = [(face, track) for face, track in zip(faces, tracks) if identities.needs_search(track.track_id)]
+        if pending:
+            pending_faces = [face for face, _ in pending]
+            engine.embed_faces(frame, pending_faces, quality=quality_gate)
+            partition = engine.partition(*gallery) if gallery is not None else None
+            results = engine.identify_faces(pending_faces, threshold=IDENTIFY_THRESHOLD, partition=partition)
+            for (face, track), (person, score) in zip(pending, results):
+                # I volti scartati dal controllo qualità non votano
+                if face.embedding is not None:
+                    identities.add(track.track_id, person, score)
+                    searched.add(track.track_id)
+    for track in tracks:
+        if track.track_id not in searched:
+            identities.reuse(track.track_id)
+    identities.prune(track.track_id for track in tracker.tracks)
+    return [(*identities.get(track.track_id), track.track_id) for track in tracks]
+
+
+def stream_hints(session: StreamSession, client: SchedulerClient, payload: dict) -> dict:
+    """Recommend the frame interval and capture resolution of a connection.
+
+    The interval is the one at which the connection uses no more than its fair
+    share of the inference workers (see ``InferenceScheduler.fair_interval_ms``),
+    clamped to ``STREAM_HINT_MIN_INTERVAL_MS``/``STREAM_HINT_MAX_INTERVAL_MS``. It
+    follows increases immediately and decreases by at most 10% per response, and
+    doubles when the frame was rejected.
 
-def process_image_sync(image_bytes: bytes) -> dict | None:
+    The resolution steps down the ``STREAM_HINT_RESOLUTIONS`` list when, for
+    ``HINT_PRESSURE`` responses in a row, even the longest interval is not
+    enough or the queue is at the degradation threshold, and straight to the
+    last entry when the frame was rejected or analyzed in degraded mode. It
+    steps back up one entry after ``HINT_HOLD`` responses at lower load, so the
+    client does not oscillate between sizes.
+
+    Args:
+        session (StreamSession): Per-connection state, updated in place.
+        client (SchedulerClient): Scheduler client of the connection.
+        payload (dict): Response about to be sent.
+
+    Returns:
+        dict: {"interval_ms": int, "width": int, "height": int}
+
+    """
+    low, high = stream_settings.hint_min_interval_ms, stream_settings.hint_max_interval_ms
+    fair = scheduler.fair_interval_ms(client, stream_settings.hint_utilization) or low
+    busy = payload["status"] == "busy"
+    if busy:
+        fair = max(fair, session.interval_ms * 2)
+    session.interval_ms = min(max(fair, session.interval_ms * 0.9, low), high)
+
+    lowest = len(CAPTURE_RESOLUTIONS) - 1
+    if busy or payload.get("degraded"):
+        target = lowest
+    elif fair > high or scheduler.depth >= scheduler.degrade_queue:
+        session._pressure += 1
+        target = min(session.level + 1, lowest) if session._pressure >= HINT_PRESSURE else session.level
+    else:
+        session._pressure = 0
+        target = 0
+
+    if target > session.level:
+        session.level, session._calm, session._pressure = target, 0, 0
+    elif target < session.level:
+        session._calm += 1
+        if session._calm >= HINT_HOLD:
+            session.level, session._calm = session.level - 1, 0
+    else:
+        session._calm = 0
+
+    width, height = CAPTURE_RESOLUTIONS[session.level]
+    return {"interval_ms": round(session.interval_ms), "width": width, "height": height}
+
+
+def process_image_sync(image_bytes: bytes, session: StreamSession | None = None, degraded: bool = False) -> dict | None:
     """Process image bytes synchronously for face detection and recognition.
 
     Decodes image bytes, detects faces, and identifies persons using the face engine.
     Returns face detection results with bounding boxes and person information.
+    JPEG frames larger than the detection size are decoded at reduced scale;
+    bounding boxes are always reported in original frame coordinates.
+
+    When a session with a motion gate is given, a 1/8 scale grayscale version of
+    the frame is compared with the last analyzed frame first; if the scene did not
+    change, the previous result is returned with ``"cached": True`` and neither
+    full decoding nor detection are performed.
+
+    With a session, detection between periodic full scans only searches crops
+    around the faces of the previous frame at ``STREAM_ROI_DET_SIZE`` (see
+    ``services.tracking.RegionPlanner``).
+
+    Faces failing the quality check (``QUALITY_STREAM``: too small, uncertain,
+    blurred or turned away) are not recognized. With a session, faces are
+    tracked and identified through the per-track identity cache (see
+    ``identify_tracked``): each face carries a ``track_id`` and the smoothed
+    ``confidence`` of its identity.
+
+    In degraded mode (set by the scheduler when the inference queue is deep)
+    full-frame detection runs at ``SCHED_DEGRADE_DET_SIZE`` and, with
+    ``SCHED_DEGRADE_SKIP_RECOGNITION``, faces are not identified.
 
     Args:
-        image_bytes (bytes): Raw image bytes to process.
+        image_bytes (bytes): Encoded image (JPEG, PNG, WebP) or raw frame
+            prefixed with ``utils.frames.RAW_HEADER``.
+        session (StreamSession | None): Per-connection state. Default: None.
+        degraded (bool): Run the cheaper degraded analysis. Default: False.
 
     Returns:
         dict | None: Dictionary containing status and list of detected faces.
             Format: {"status": "ok", "faces": [{"id": str, "top": int, "right": int, 
             "bottom": int, "left": int, "name": str, "surname": str, "age": int,
-            "relationship": str, "role": str}, ...]}
+            "relationship": str, "role": str, "track_id": int, "confidence": float}, ...],
+            "cached": bool, "degraded": bool}
             Returns None if image decoding fails.
 
     """
     engine = route.get_engine()
+    thumb = None
+    gate = session.motion_gate if session is not None else None
     try:
-        np_arr = np.frombuffer(image_bytes, np.uint8)
-        frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        if gate is not None:
+            gray = decoder.decode_gray(image_bytes)
+            if gray is not None:
+                changed, thumb = gate.check(gray)
+                if not changed and session.last_result is not None:
+                    return {**session.last_result, "cached": True}
+
+        # Il frame vive nel buffer del worker: valido solo fino al prossimo frame
+        frame, scale = decoder.decode(image_bytes, buffer_pool)
 
         if frame is None:
             return None
@@ -54,17 +364,44 @@ def process_image_sync(image_bytes: bytes) -> dict | None:
         logger.error(f"Errore parsing immagine: {e}")
         return None
 
-    faces: List[Face] = engine.analyze_frame(frame)
-    found_people_list: List[Tuple[Optional[Person], Face]] = []
+    recognize = not (degraded and scheduler_settings.degrade_skip_recognition)
+    if session is not None:
+        session.set_frame_size(frame.shape, scale)
+    regions = session.planner.plan(frame.shape) if session is not None else None
+    # Regioni che coprono mezzo frame: scansione completa, da registrare come tale nel planner
+    if regions is not None and fr.region_crops(regions, frame.shape) is None:
+        regions = None
+    if regions is not None:
+        det_size = stream_settings.roi_det_size
+    else:
+        det_size = scheduler_settings.degrade_det_size if degraded else None
+    # Con una sessione il riconoscimento passa dalla cache delle identità per traccia
+    faces: List["Face"] = engine.analyze_frame(
+        frame, det_size=det_size, recognize=recognize and session is None, regions=regions, quality=quality_gate
+    )
+    tracked = None
+    if session is not None:
+        session.planner.update(np.array([face.bbox for face in faces], dtype=np.float32), frame.shape, regions)
+        tracked = identify_tracked(
+            engine, frame, faces, session.tracker, session.identities, recognize, session.gallery
+        )
+    found_people_list: List[Tuple[Optional[GalleryPerson], "Face"]] = []
 
     # Nessun volto rilevato (uscita rapida)
     if not faces:
-        return {"status": "ok", "faces": []}
+        return _remember(session, thumb, {"status": "ok", "faces": [], "degraded": degraded})
+
+    # Identità stabili per traccia
+    if tracked is not None:
+        found_people_list = [(person, face) for (person, _, _), face in zip(tracked, faces)]
+
+    # Modalità degradata senza riconoscimento: solo bounding box
+    elif not recognize:
+        found_people_list = [(None, face) for face in faces]
 
     # Abbiamo volti E il Database è attivo -> BATCH PROCESSING
-    if engine.feature_matrix is not None:
-        embeddings = [face.embedding for face in faces]
-        identities = engine.identify(embeddings, threshold=0.4)
+    elif engine.feature_matrix is not None:
+        identities = engine.identify_faces(faces, threshold=IDENTIFY_THRESHOLD)
         
         for (found_person, score), face in zip(identities, faces):
             found_people_list.append((found_person, face))
@@ -75,14 +412,48 @@ def process_image_sync(image_bytes: bytes) -> dict | None:
         for face in faces:
             found_people_list.append((None, face))
 
-    faces_data = []
-    
-    # Ottieni dimensioni frame per validazione coordinate
+    # Ottieni dimensioni frame originale per validazione coordinate
     frame_height, frame_width = frame.shape[:2]
+    if scale != 1.0:
+        frame_height, frame_width = round(frame_height * scale), round(frame_width * scale)
     logger.info(f"Frame processato: {frame_width}x{frame_height} (aspect ratio: {frame_width/frame_height:.2f})")
-    
+
+    faces_data = build_faces_data(found_people_list, frame_width, frame_height, scale)
+    if tracked is not None:
+        for face_dict, (_, confidence, track_id) in zip(faces_data, tracked):
+            face_dict["track_id"] = track_id
+            face_dict["confidence"] = round(confidence, 3)
+
+    return _remember(session, thumb, {"status": "ok", "faces": faces_data, "degraded": degraded})
+
+
+def build_faces_data(
+    found_people_list: List[Tuple[Optional[GalleryPerson], "Face"]],
+    frame_width: int,
+    frame_height: int,
+    scale: float = 1.0,
+) -> List[dict]:
+    """Format identified faces as the JSON-ready dictionaries sent to clients.
+
+    Bounding boxes are rescaled to original frame coordinates and clamped to
+    the frame.
+
+    Args:
+        found_people_list (List[Tuple[Optional[GalleryPerson], Face]]): Identified person
+            (or None) and detected face pairs.
+        frame_width (int): Width of the original frame.
+        frame_height (int): Height of the original frame.
+        scale (float): Factor from decoded to original coordinates. Default: 1.0.
+
+    Returns:
+        List[dict]: One dictionary per face with id, top, right, bottom, left,
+            name, surname, age, relationship and role.
+
+    """
+    faces_data = []
+
     for person_data, face in found_people_list:
-        bbox = face.bbox.astype(int)
+        bbox = (face.bbox * scale).astype(int)
         left, top, right, bottom = int(bbox[0]), int(bbox[1]), int(bbox[2]), int(bbox[3])
         
         # Log dettagliato per debug coordinate
@@ -131,18 +502,80 @@ def process_image_sync(image_bytes: bytes) -> dict | None:
 
         faces_data.append(face_dict)
 
-    return {"status": "ok", "faces": faces_data}
+    return faces_data
+
+
+def _remember(session: StreamSession | None, thumb: np.ndarray | None, result: dict) -> dict:
+    """Store a fresh result in the session and mark it as not cached.
+
+    Args:
+        session (StreamSession | None): Per-connection state.
+        thumb (np.ndarray | None): Motion gate thumbnail of the analyzed frame.
+        result (dict): Result of the full analysis.
+
+    Returns:
+        dict: The result with ``"cached": False``.
+
+    """
+    result["cached"] = False
+    # Un risultato degradato non deve essere riusato per i frame statici successivi
+    if session is not None and not result.get("degraded"):
+        session.last_result = result
+        if thumb is not None and session.motion_gate is not None:
+            session.motion_gate.accept(thumb)
+    return result
         
+@router.get("/api/scheduler")
+async def get_scheduler_status() -> dict:
+    """Return the state of the inference scheduler.
+
+    Returns:
+        dict: Queue depth, admission thresholds and, for each client (WebSocket
+            connections, batch requests, ingestion workers), priority, queued,
+            served, rejected and degraded jobs and average run and wait times.
+
+    """
+    return scheduler.status()
+
+
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    channel: Optional[str] = None,
+    priority: Optional[str] = None,
+    roles: Optional[str] = None,
+    relationships: Optional[str] = None,
+):
     """WebSocket endpoint for real-time face recognition.
 
     Accepts binary image data over WebSocket connection, processes frames
     asynchronously for face detection and recognition, and returns results in JSON format.
-    Rate limiting is handled on the frontend (50ms = 20 FPS).
+    Rate limiting is handled on the client, following the ``hints`` object added
+    to every response (see ``stream_hints``) unless ``STREAM_HINTS`` is disabled.
+
+    Each connection is a client of the inference scheduler with the requested
+    priority class (``?priority=high|normal|low``, among
+    ``SCHED_ALLOWED_PRIORITIES``). When the inference queue is too deep the
+    frame is not analyzed and ``{"status": "busy", "faces": []}`` is sent
+    instead; high priority connections are never rejected.
+
+    With ``?channel=<name>`` the connection also publishes every result on that
+    channel, so viewers on ``/ws/channels/<name>`` receive it without sending
+    frames of their own. A channel accepts a single publisher: a second one is
+    closed with code 1008.
+
+    With ``?roles=...`` and/or ``?relationships=...`` (comma-separated values)
+    faces are only searched among the people with those roles and
+    relationships, e.g. ``?relationships=badante,assistente`` to recognize
+    caregivers only; everyone else is reported as unknown.
 
     Args:
         websocket (WebSocket): FastAPI WebSocket connection instance.
+        channel (Optional[str]): Channel to publish results on. Default: None.
+        priority (Optional[str]): Scheduling priority class. Default: None
+            (``SCHED_DEFAULT_PRIORITY``).
+        roles (Optional[str]): Roles to search. Default: None (any).
+        relationships (Optional[str]): Relationships to search. Default: None (any).
 
     Raises:
         WebSocketDisconnect: When client disconnects from the WebSocket.
@@ -150,21 +583,51 @@ async def websocket_endpoint(websocket: WebSocket):
 
     """
     await websocket.accept()
-    loop = asyncio.get_event_loop()
+    allowed = [p.strip() for p in scheduler_settings.allowed_priorities.split(",")]
+    if priority is None:
+        priority = scheduler_settings.default_priority
+    elif priority not in allowed:
+        await websocket.close(code=1008, reason=f"Priorità non consentita. Valori accettati: {allowed}")
+        return
+    try:
+        gallery = parse_gallery_filter(roles, relationships)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    if channel is not None and hub.claim(channel, "camera") is None:
+        await websocket.close(code=1008, reason=f"Il canale {channel} ha già un publisher")
+        return
+
+    client = scheduler.register(
+        f"ws-{next(_connection_ids)}", priority=priority, admission=priority != "high"
+    )
+    session = StreamSession(gallery)
 
     try:
         while True:
             data = await websocket.receive_bytes()
             
-            # Il rate limiting è gestito lato frontend (50ms = 20 FPS)
-            result = await loop.run_in_executor(executor, process_image_sync, data)
+            # Il rate limiting è gestito dal client, seguendo i suggerimenti "hints"
+            try:
+                result = await asyncio.wrap_future(client.submit_degradable(process_image_sync, data, session))
+            except SchedulerBusy:
+                result = {"status": "busy", "faces": [], "cached": False}
 
             # Invia sempre una risposta per sbloccare il frontend (isProcessing).
             # Se result è None (decode fallito) inviamo comunque {"status":"ok","faces":[]}.
             payload = result if result is not None else {"status": "ok", "faces": []}
+            if channel is not None and payload["status"] == "ok":
+                hub.publish(channel, {"channel": channel, **payload})
+            if stream_settings.hints:
+                # Copia: il risultato può essere riusato dal motion gate o dal canale
+                payload = {**payload, "hints": stream_hints(session, client, payload)}
             await websocket.send_json(payload)
 
     except WebSocketDisconnect:
         logger.info("Client disconnesso")
     except Exception as e:
-        logger.error(f"Errore WebSocket: {e}")
\ No newline at end of file
+        logger.error(f"Errore WebSocket: {e}")
+    finally:
+        client.shutdown()
+        if channel is not None:
+            hub.release(channel)
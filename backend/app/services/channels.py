@@ -0,0 +1,192 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Channel:
+    """Results of one video source, fanned out to any number of viewers.
+
+    A channel has at most one publisher (a browser camera on ``/ws`` or an
+    ingestion worker) and any number of subscribers. Each subscriber gets a
+    bounded queue: a slow viewer loses its oldest results instead of slowing
+    down the publisher or the other viewers. New subscribers immediately
+    receive the last published result.
+
+    Attributes:
+        name (str): Channel name.
+        queue_size (int): Results buffered per subscriber.
+        publisher (str | None): Kind of the attached publisher ("camera" or "ingest").
+        last_result (dict | None): Last published result.
+        published (int): Results published so far.
+
+    """
+
+    def __init__(self, name: str, queue_size: int = 8):
+        """Initialize Channel.
+
+        Args:
+            name (str): Channel name.
+            queue_size (int): Results buffered per subscriber. Default: 8.
+
+        """
+        self.name = name
+        self.queue_size = queue_size
+        self.publisher: Optional[str] = None
+        self.last_result: Optional[dict] = None
+        self.published = 0
+        self._subscribers: set[asyncio.Queue] = set()
+
+    @property
+    def subscribers(self) -> int:
+        """Number of connected subscribers."""
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a subscriber.
+
+        Returns:
+            asyncio.Queue: Queue receiving the results, pre-filled with the last one.
+
+        """
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.last_result is not None:
+            q.put_nowait(self.last_result)
+        self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        """Remove a subscriber."""
+        self._subscribers.discard(q)
+
+    def publish(self, result: dict):
+        """Deliver a result to every subscriber.
+
+        Args:
+            result (dict): Result to deliver; shared, not copied, across subscribers.
+
+        """
+        self.last_result = result
+        self.published += 1
+        for q in self._subscribers:
+            if q.full():
+                q.get_nowait()
+            q.put_nowait(result)
+
+
+class ChannelHub:
+    """Registry of the channels of the server.
+
+    All methods except ``publish_threadsafe`` must be called from the event
+    loop thread. Channels are created on first use and removed when they have
+    neither a publisher nor subscribers.
+
+    Attributes:
+        queue_size (int): Results buffered per subscriber.
+        loop (asyncio.AbstractEventLoop | None): Event loop the channels live on.
+
+    """
+
+    def __init__(self, queue_size: int = 8):
+        """Initialize ChannelHub.
+
+        Args:
+            queue_size (int): Results buffered per subscriber. Default: 8.
+
+        """
+        self.queue_size = queue_size
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.channels: Dict[str, Channel] = {}
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Set the event loop used by ``publish_threadsafe`` (called at startup)."""
+        self.loop = loop
+
+    def _get_or_create(self, name: str) -> Channel:
+        channel = self.channels.get(name)
+        if channel is None:
+            channel = self.channels[name] = Channel(name, self.queue_size)
+        return channel
+
+    def _discard_if_unused(self, channel: Channel):
+        if channel.publisher is None and channel.subscribers == 0:
+            self.channels.pop(channel.name, None)
+
+    def claim(self, name: str, publisher: str) -> Optional[Channel]:
+        """Attach a publisher to a channel.
+
+        Args:
+            name (str): Channel name.
+            publisher (str): Publisher kind ("camera" or "ingest").
+
+        Returns:
+            Channel | None: The channel, or None if it already has a publisher.
+
+        """
+        channel = self._get_or_create(name)
+        if channel.publisher is not None:
+            return None
+        channel.publisher = publisher
+        logger.info(f"Canale {name}: publisher {publisher} collegato")
+        return channel
+
+    def release(self, name: str):
+        """Detach the publisher of a channel."""
+        channel = self.channels.get(name)
+        if channel is None:
+            return
+        channel.publisher = None
+        self._discard_if_unused(channel)
+        logger.info(f"Canale {name}: publisher scollegato")
+
+    def subscribe(self, name: str) -> tuple[Channel, asyncio.Queue]:
+        """Subscribe to a channel, creating it if no publisher is attached yet.
+
+        Args:
+            name (str): Channel name.
+
+        Returns:
+            tuple[Channel, asyncio.Queue]: The channel and the subscriber queue.
+
+        """
+        channel = self._get_or_create(name)
+        return channel, channel.subscribe()
+
+    def unsubscribe(self, name: str, q: asyncio.Queue):
+        """Remove a subscriber from a channel."""
+        channel = self.channels.get(name)
+        if channel is None:
+            return
+        channel.unsubscribe(q)
+        self._discard_if_unused(channel)
+
+    def publish(self, name: str, result: dict):
+        """Publish a result on a channel (event loop thread)."""
+        channel = self.channels.get(name)
+        if channel is not None:
+            channel.publish(result)
+
+    def publish_threadsafe(self, name: str, result: dict):
+        """Publish a result from a worker thread.
+
+        Raises:
+            RuntimeError: If the hub is not bound to an event loop.
+
+        """
+        if self.loop is None:
+            raise RuntimeError("ChannelHub non collegato a un event loop")
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.publish, name, result)
+
+    def status(self) -> list[dict]:
+        """Return publisher, subscribers and published count of every channel."""
+        return [
+            {
+                "name": channel.name,
+                "publisher": channel.publisher,
+                "subscribers": channel.subscribers,
+                "published": channel.published,
+            }
+            for channel in self.channels.values()
+        ]
@@ -1,18 +1,439 @@
+import importlib.util
 import logging
+import threading
+import time
+from functools import lru_cache
 from typing import Optional
 
 import numpy as np
 import pymongo
+import bson
 from bson import ObjectId, errors
-from pymongo import ReturnDocument
-from pymongo.errors import DuplicateKeyError, WriteConcernError, ConnectionFailure, ServerSelectionTimeoutError
-from datetime import datetime, date
-from models.person import Person  
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import ASCENDING, IndexModel, InsertOne, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError, WriteConcernError, ConnectionFailure, ServerSelectionTimeoutError
+from datetime import datetime, date, timezone
+from models.person import Gallery, GalleryPerson, Person
 from pymongo.uri_parser import parse_uri
-from utils.constants import RoleType  
+from config import database_settings, embedding_settings, quality_settings
+from utils.constants import RelationshipType, RoleType
+from utils.quality import dedupe_enrolment
 
 logger = logging.getLogger(__name__)
 
+# Campi letti per costruire la galleria del motore di riconoscimento
+GALLERY_PROJECTION = {"_id": 1, "name": 1, "surname": 1, "birthday": 1, "relationship": 1, "role": 1, "encoding": 1, "encoding_model": 1}
+# Documenti per batch del cursore: pochi round trip anche con gallerie grandi
+GALLERY_BATCH_SIZE = 1000
+BSON_DOUBLE = 0x01
+BSON_ARRAY = 0x04
+BSON_NULL = 0x0A
+# Campi restituiti dall'elenco persone; encoding solo se richiesto esplicitamente
+LIST_FIELDS = ("name", "surname", "birthday", "relationship", "role", "updated_at", "encoding_hashes", "encoding_model", "encoding")
+LIST_DEFAULT_FIELDS = ("name", "surname", "birthday", "relationship", "role", "updated_at")
+LIST_MAX_LIMIT = 500
+# Modello degli embeddings salvati prima del campo encoding_model (l'unico usato fino ad allora)
+LEGACY_ENCODING_MODEL = "buffalo_l"
+# Embeddings ri-estratti con un nuovo modello, in attesa di sostituire "encoding" a fine job
+STAGED_FIELDS = {"encoding_staged": "", "encoding_staged_model": ""}
+# Operazioni per chiamata bulk_write: pochi round trip, messaggi ben sotto il limite di 48 MB
+BULK_BATCH_SIZE = 500
+# Indici della collection persone, creati all'avvio (create_indexes è idempotente)
+INDEXES = [
+    # Filtri per ruolo/relazione (check_patient_existence, partizioni della galleria)
+    IndexModel([("role", ASCENDING), ("relationship", ASCENDING)], name="role_relationship"),
+    # Al più un documento con role=USER, garantito dal server
+    IndexModel(
+        [("role", ASCENDING)],
+        name="single_user",
+        unique=True,
+        partialFilterExpression={"role": RoleType.USER.value},
+    ),
+    # Hash delle immagini di cui è salvato l'embedding (chiavi di "encoding")
+    IndexModel([("encoding_hashes", ASCENDING)], name="encoding_hashes"),
+    # Sincronizzazione incrementale: documenti modificati dopo un istante
+    IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    # Galleria per modello e documenti da ri-estrarre dopo un cambio di modello
+    IndexModel([("encoding_model", ASCENDING)], name="encoding_model"),
+]
+# Compressore di rete -> modulo Python richiesto (zlib è sempre disponibile)
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": None}
+
+# Lunghezza in byte di un array BSON di double -> segmenti a passo costante (None se non è un array di double)
+_double_layouts: dict[int, Optional[list[tuple[int, int, int]]]] = {}
+
+
+def _double_layout(length: int) -> Optional[list[tuple[int, int, int]]]:
+    """Return the byte layout of a BSON array of doubles of the given total length.
+
+    An array of N doubles is a document with keys "0".."N-1": each element is
+    a type byte, the key, a NUL byte and 8 bytes of value. Elements whose keys
+    have the same number of digits are equally spaced, so the array splits into
+    a few constant-stride segments (0-9, 10-99, 100-999, ...). The layout only
+    depends on N, which is recovered from the length; layouts are cached per
+    length (in practice one per embedding dimension).
+
+    Args:
+        length (int): Total length of the array in bytes.
+
+    Returns:
+        list[tuple[int, int, int]] | None: (offset, element count, stride) of
+            each segment, or None if no N matches the length.
+
+    """
+    if length not in _double_layouts:
+        segments = []
+        index, offset, digits = 0, 4, 1
+        # Ogni elemento: tipo (1) + chiave (cifre) + NUL (1) + double (8)
+        while offset + digits + 10 <= length - 1:
+            stride = digits + 10
+            count = min(10 ** digits - index, (length - 1 - offset) // stride)
+            segments.append((offset, count, stride))
+            index, offset, digits = index + count, offset + count * stride, digits + 1
+        _double_layouts[length] = segments if segments and offset == length - 1 else None
+    return _double_layouts[length]
+
+
+def _raw_vectors(arrays: list[bytes]) -> list[np.ndarray]:
+    """Decode raw BSON arrays into float32 vectors.
+
+    Arrays of the same length made only of doubles (as written by
+    ``_person_to_document``) are joined into one byte block and read segment
+    by segment through NumPy slices; anything else goes through the BSON
+    decoder.
+
+    Args:
+        arrays (list[bytes]): Raw BSON arrays.
+
+    Returns:
+        list[np.ndarray]: float32 vector of each array, in input order.
+
+    """
+    vectors: list[Optional[np.ndarray]] = [None] * len(arrays)
+    groups: dict[int, list[int]] = {}
+    for i, array in enumerate(arrays):
+        groups.setdefault(len(array), []).append(i)
+
+    for length, indices in groups.items():
+        layout = _double_layout(length)
+        if layout is None:
+            continue
+        block = np.frombuffer(b"".join([arrays[i] for i in indices]), dtype=np.uint8).reshape(len(indices), length)
+        doubles = np.ones(len(indices), dtype=bool)
+        parts = []
+        for offset, count, stride in layout:
+            segment = block[:, offset:offset + count * stride].reshape(len(indices), count, stride)
+            doubles &= (segment[:, :, 0] == BSON_DOUBLE).all(axis=1)
+            parts.append(np.ascontiguousarray(segment[:, :, stride - 8:]).view("<f8")[:, :, 0])
+        matrix = np.hstack(parts).astype(np.float32)
+        for row, i in enumerate(indices):
+            if doubles[row]:
+                vectors[i] = matrix[row]
+
+    for i, vector in enumerate(vectors):
+        if vector is None:
+            vectors[i] = np.asarray(list(bson.decode(arrays[i]).values()), dtype=np.float32)
+    return vectors
+
+
+def _raw_encodings(raw: bytes | memoryview) -> Optional[list[tuple[str, bytes]]]:
+    """Split a raw ``encoding`` sub-document into its arrays, without decoding them.
+
+    Args:
+        raw (bytes | memoryview): Bytes of the BSON document mapping image hash -> array.
+
+    Returns:
+        list[tuple[str, bytes]] | None: (hash, raw BSON array) pairs, skipping null
+            values; None if the document holds other types.
+
+    """
+    raw = bytes(raw)
+    encodings = []
+    pos, end = 4, len(raw) - 1
+    while pos < end:
+        kind = raw[pos]
+        key_end = raw.index(b"\x00", pos + 1)
+        key = raw[pos + 1:key_end].decode("utf-8")
+        pos = key_end + 1
+        if kind == BSON_NULL:
+            continue
+        if kind != BSON_ARRAY:
+            return None
+        length = int.from_bytes(raw[pos:pos + 4], "little")
+        encodings.append((key, raw[pos:pos + length]))
+        pos += length
+    return encodings
+
+
+def _doc_encodings(doc) -> list[tuple[str, np.ndarray | bytes]]:
+    """Return the embeddings of a person document as (hash, vector) pairs.
+
+    Vectors are float32 arrays, or raw BSON arrays for ``RawBSONDocument``
+    (decoded in bulk by ``_raw_vectors``).
+
+    """
+    encoding = doc.get("encoding")
+    if encoding is None:
+        return []
+    # Niente len()/items() su un RawBSONDocument: decodificherebbe gli array in liste
+    if isinstance(encoding, RawBSONDocument):
+        pairs = _raw_encodings(encoding.raw)
+        if pairs is not None:
+            return pairs
+    vectors = []
+    for key, value in encoding.items():
+        if value is None:
+            continue
+        vectors.append((key, np.asarray(value, dtype=np.float32).ravel()))
+    return vectors
+
+
+def _model_values(model: str) -> list[Optional[str]]:
+    """Return the ``encoding_model`` values meaning embeddings of ``model``.
+
+    Documents written before the field existed hold ``LEGACY_ENCODING_MODEL``
+    embeddings.
+
+    """
+    return [model, None] if model == LEGACY_ENCODING_MODEL else [model]
+
+
+def _gallery_person(doc) -> GalleryPerson:
+    """Build the gallery record of a person document, validating only the fields it needs.
+
+    Raises:
+        ValueError: If the role or relationship is not valid, or the birthday is missing.
+
+    """
+    birthday = doc.get("birthday")
+    if not isinstance(birthday, datetime):
+        raise ValueError(f"data di nascita non valida: {birthday!r}")
+    return GalleryPerson(
+        id=doc.get("_id"),
+        name=str(doc.get("name", "Unknown")),
+        surname=str(doc.get("surname", "Unknown")),
+        birthday=birthday,
+        relationship=RelationshipType(doc.get("relationship", RelationshipType.ALTRO.value)),
+        role=RoleType(doc.get("role", RoleType.GUEST.value)),
+    )
+
+def available_compressors(value: str) -> list[str]:
+    """Parse a comma-separated list of wire compressors, keeping the usable ones.
+
+    Compressors whose Python module is not installed are dropped (with a
+    warning) instead of letting pymongo warn on every client; the server picks
+    the first one of the remaining list it also supports.
+
+    Args:
+        value (str): Compressors in order of preference, e.g. "zstd,snappy".
+
+    Returns:
+        list[str]: Compressors to pass to ``MongoClient``; empty disables compression.
+
+    Raises:
+        ValueError: If a compressor is not known.
+
+    """
+    compressors = []
+    for name in (part.strip().lower() for part in value.split(",")):
+        if not name:
+            continue
+        if name not in COMPRESSOR_MODULES:
+            raise ValueError(f"Compressore non valido: {name} (ammessi: {', '.join(COMPRESSOR_MODULES)})")
+        module = COMPRESSOR_MODULES[name]
+        if module is not None and importlib.util.find_spec(module) is None:
+            logger.warning(f"Compressore {name} ignorato: modulo {module} non installato")
+            continue
+        compressors.append(name)
+    return compressors
+
+
+def client_options(settings=database_settings) -> dict:
+    """Build the ``MongoClient`` keyword arguments from the ``DB_`` settings.
+
+    Options left to None keep the pymongo default.
+
+    Args:
+        settings (DatabaseSettings): Database settings. Default: ``database_settings``.
+
+    Returns:
+        dict: Pool size, timeouts, compressors and read preference.
+
+    """
+    options = {
+        "maxPoolSize": settings.max_pool_size,
+        "minPoolSize": settings.min_pool_size,
+        "maxIdleTimeMS": settings.max_idle_time_ms,
+        "waitQueueTimeoutMS": settings.wait_queue_timeout_ms,
+        "connectTimeoutMS": settings.connect_timeout_ms,
+        "socketTimeoutMS": settings.socket_timeout_ms,
+        "serverSelectionTimeoutMS": settings.server_selection_timeout_ms,
+        "heartbeatFrequencyMS": settings.heartbeat_frequency_ms,
+        "readPreference": settings.read_preference,
+    }
+    options = {key: value for key, value in options.items() if value is not None}
+    compressors = available_compressors(settings.compressors)
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
+@lru_cache(maxsize=8)
+def _uri_nodes(url: str) -> frozenset:
+    """Return the (host, port) nodes of a connection URL, parsed once per URL."""
+    return frozenset(parse_uri(url)["nodelist"])
+
+
+class ServerHealth(monitoring.TopologyListener):
+    """Reachability of the MongoDB deployment, tracked from pymongo's server monitoring.
+
+    pymongo checks every server from background threads (one heartbeat every
+    ``DB_HEARTBEAT_FREQUENCY_MS``) and reports each change of the topology to
+    its listeners. Recording the changes turns ``Database.is_connected`` into
+    a flag read, instead of a ``ping`` round trip per call.
+
+    Attributes:
+        readable (bool): At least one server answers reads (standalone, primary or secondary).
+        writable (bool): A standalone or primary server is reachable.
+        changed_at (float | None): ``time.monotonic()`` of the last availability change.
+
+    """
+
+    def __init__(self):
+        """Initialize ServerHealth; the deployment is unknown until the first heartbeat."""
+        self.readable = False
+        self.writable = False
+        self.changed_at: Optional[float] = None
+
+    def opened(self, event: monitoring.TopologyOpenedEvent):
+        pass
+
+    def description_changed(self, event: monitoring.TopologyDescriptionChangedEvent):
+        # Server "Unknown" (heartbeat fallito) non è né leggibile né scrivibile
+        servers = event.new_description.server_descriptions().values()
+        readable = any(server.is_readable for server in servers)
+        writable = any(server.is_writable for server in servers)
+        if (readable, writable) != (self.readable, self.writable):
+            self.changed_at = time.monotonic()
+            if readable:
+                logger.info(f"Database raggiungibile (scrittura: {'sì' if writable else 'no'})")
+            else:
+                logger.warning("Database non raggiungibile")
+        self.readable, self.writable = readable, writable
+
+    def closed(self, event: monitoring.TopologyClosedEvent):
+        self.readable = self.writable = False
+
+    def snapshot(self) -> dict:
+        """Return the current state.
+
+        Returns:
+            dict: {"readable": bool, "writable": bool, "since_s": float | None}, where
+                ``since_s`` is the time since the last change.
+
+        """
+        since = None if self.changed_at is None else round(time.monotonic() - self.changed_at, 1)
+        return {"readable": self.readable, "writable": self.writable, "since_s": since}
+
+
+def _encoding_hashes(encoding: Optional[dict]) -> list[str]:
+    """Return the image hashes of an ``encoding`` field that hold an embedding."""
+    if not isinstance(encoding, dict):
+        return []
+    return [key for key, value in encoding.items() if value is not None]
+
+
+class SlowQueryLogger(monitoring.CommandListener):
+    """Log the MongoDB commands slower than a threshold.
+
+    Only the command name, the collection and the names of the filter fields
+    are kept from the started event, never the values (embeddings, personal
+    data).
+
+    Attributes:
+        threshold_ms (float): Duration from which a command is reported.
+        slow_count (int): Slow commands seen since the client was created.
+
+    """
+
+    # Comandi di cui si registra il filtro
+    FILTERED = {"find": "filter", "count": "query", "delete": "deletes", "update": "updates", "aggregate": "pipeline", "findAndModify": "query"}
+
+    def __init__(self, threshold_ms: float):
+        """Initialize SlowQueryLogger.
+
+        Args:
+            threshold_ms (float): Duration from which a command is reported.
+
+        """
+        self.threshold_ms = threshold_ms
+        self.slow_count = 0
+        self._started: dict = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        name = event.command_name
+        command = event.command
+        # getMore indica la collection in un campo a parte
+        collection = command.get("collection") if name == "getMore" else command.get(name)
+        if not isinstance(collection, str):
+            return
+        spec = command.get(self.FILTERED.get(name, ""))
+        if name == "aggregate":
+            # Pipeline: nomi degli stadi
+            fields = [next(iter(stage), "") for stage in spec or []]
+        else:
+            if name in ("update", "delete"):
+                # Filtro della prima operazione del comando
+                spec = spec[0].get("q", {}) if spec else {}
+            fields = sorted(spec) if isinstance(spec, dict) else []
+        self._started[(event.connection_id, event.request_id)] = (collection, fields)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event)
+
+    def _finished(self, event):
+        collection, fields = self._started.pop((event.connection_id, event.request_id), ("-", []))
+        duration_ms = event.duration_micros / 1000
+        if duration_ms >= self.threshold_ms:
+            self.slow_count += 1
+            logger.warning(
+                f"Query lenta: {event.command_name} su {event.database_name}.{collection} "
+                f"(campi: {', '.join(fields) or '-'}) in {duration_ms:.0f} ms"
+            )
+
+
+class BulkItemResult:
+    """Outcome of one item of a bulk write.
+
+    Attributes:
+        index (int): Position of the item in the input.
+        id (str | None): Person ID; assigned before the write for inserts.
+        ok (bool): Whether the write was applied.
+        error (str | None): Why it was not, None on success.
+
+    """
+
+    __slots__ = ("index", "id", "ok", "error")
+
+    def __init__(self, index: int, id: Optional[str], ok: bool = True, error: Optional[str] = None):
+        """Initialize BulkItemResult."""
+        self.index = index
+        self.id = id
+        self.ok = ok
+        self.error = error
+
+    def fail(self, error: str):
+        """Mark the item as failed."""
+        self.ok, self.error = False, error
+
+    def __repr__(self) -> str:
+        return f"BulkItemResult(index={self.index}, id={self.id!r}, ok={self.ok}, error={self.error!r})"
+
+
 class Database():
     """MongoDB database service for person data management.
 
@@ -21,6 +442,10 @@ class Database():
 
     Attributes:
         current_client (Optional[pymongo.MongoClient]): Class-level MongoDB client instance.
+        health (Optional[ServerHealth]): Monitoring state of ``current_client``; None when
+            the client was not created by ``get_connection``.
+        slow_queries (Optional[SlowQueryLogger]): Slow command reporter of ``current_client``;
+            None when disabled (``DB_SLOW_QUERY_MS=0``).
         url (str): MongoDB connection URL.
         name_db (str): Database name.
         collection_name (str): Collection name within the database.
@@ -29,6 +454,11 @@ class Database():
     """
 
     current_client = None 
+    health: Optional[ServerHealth] = None
+    slow_queries: Optional[SlowQueryLogger] = None
+    _lock = threading.Lock()
+    # (database, collection) i cui indici sono già stati verificati in questo processo
+    _indexed: set = set()
 
     def __init__(self, url: str, name: str, collection: str):
         """Initialize Database instance and establish connection.
@@ -46,7 +476,12 @@ class Database():
         self.url = url
         self.name_db = name
         self.collection_name = collection
+        # Handle della collection, valido finché il client condiviso non cambia
+        self._collection = None
+        self._collection_client = None
         self.get_connection(self.url)
+        if database_settings.ensure_indexes and (name, collection) not in Database._indexed:
+            self.ensure_indexes()
         self.patient: Optional[Person] = None
         self.patient = self.check_patient_existence()
 
@@ -54,12 +489,18 @@ class Database():
     def is_connected(self) -> bool:
         """Check if database connection is active.
 
+        Reads the state kept by ``ServerHealth`` from pymongo's heartbeats, so
+        no round trip is made; a client installed from outside (e.g. mongomock
+        in the benchmarks) is pinged instead.
+
         Returns:
             bool: True if connection is active and responsive, False otherwise.
 
         """
         if self.current_client is None:
             return False
+        if self.health is not None:
+            return self.health.readable
         try:
             self.current_client.admin.command('ping')
             return True      
@@ -151,7 +592,9 @@ class Database():
         """Get or create MongoDB client connection.
 
         Creates a new connection if none exists, or validates existing connection.
-        Uses singleton pattern to share connection across instances.
+        Uses singleton pattern to share connection across instances. The client
+        is configured from the ``DB_`` settings (see ``client_options``) and
+        reports server availability to ``Database.health``.
 
         Args:
             url (str): MongoDB connection URL.
@@ -170,17 +613,27 @@ class Database():
             return None
         
         if cls.current_client is None:
-            try:
-                cls.current_client = pymongo.MongoClient(url)
-                cls.current_client.admin.command('ping')
-            except (pymongo.errors.ConnectionFailure, pymongo.errors.ConfigurationError) as e:
-                logger.critical(f"Errore critico di connessione al database: {e}")
-                cls.current_client = None
-                raise
+            with cls._lock:
+                if cls.current_client is None:
+                    health = ServerHealth()
+                    listeners = [health]
+                    slow_queries = None
+                    if database_settings.slow_query_ms > 0:
+                        slow_queries = SlowQueryLogger(database_settings.slow_query_ms)
+                        listeners.append(slow_queries)
+                    client = None
+                    try:
+                        client = pymongo.MongoClient(url, event_listeners=listeners, **client_options())
+                        client.admin.command('ping')
+                    except (pymongo.errors.ConnectionFailure, pymongo.errors.ConfigurationError) as e:
+                        logger.critical(f"Errore critico di connessione al database: {e}")
+                        if client is not None:
+                            client.close()
+                        raise
+                    cls.current_client, cls.health, cls.slow_queries = client, health, slow_queries
         else:
             try:
-                parsed_uri = parse_uri(url)
-                new_nodes = set(parsed_uri['nodelist'])
+                new_nodes = _uri_nodes(url)
                 current_node = cls.current_client.address 
                 
                 if current_node and current_node not in new_nodes:
@@ -206,6 +659,8 @@ class Database():
         if cls.current_client is not None:
             cls.current_client.close()
             cls.current_client = None
+        cls.health = None
+        cls.slow_queries = None
     
     @staticmethod
     def convert_to_objectid(id_string: str) -> Optional[ObjectId]:
@@ -231,7 +686,8 @@ class Database():
         """Convert Person object to MongoDB document format.
 
         Serializes Person to dictionary, handling dates, enums, and numpy arrays
-        in encoding dictionaries for MongoDB storage.
+        in encoding dictionaries for MongoDB storage. Encodings are tagged with
+        ``person.encoding_model``, or the configured model (``EMBED_MODEL``).
 
         Args:
             person (Person): Person object to serialize.
@@ -263,11 +719,14 @@ class Database():
                     else:
                         serialized_encoding[hash_key] = encoding_value
                 person_dict["encoding"] = serialized_encoding
+            person_dict["encoding_hashes"] = _encoding_hashes(person_dict["encoding"])
+            person_dict["encoding_model"] = person_dict.get("encoding_model") or embedding_settings.model
 
         for key, value in person_dict.items():
             if hasattr(value, "value"):  
                 person_dict[key] = value.value
 
+        person_dict["updated_at"] = datetime.now(timezone.utc)
         return person_dict
 
     @staticmethod
@@ -289,13 +748,124 @@ class Database():
             logger.error(f"Documento Person non valido: {exc}")
             return None
     
+    def ensure_indexes(self) -> list[str]:
+        """Create the indexes in ``INDEXES`` if missing.
+
+        ``create_indexes`` does nothing for indexes that already exist with
+        the same definition, so this is safe at every startup. Documents
+        written before ``encoding_hashes``, ``updated_at`` and ``encoding_model``
+        existed are backfilled first, with one server-side update each; their
+        embeddings are tagged ``LEGACY_ENCODING_MODEL``.
+
+        The ``single_user`` index cannot be built while more than one USER
+        exists: the error is logged and the other indexes are created anyway.
+
+        Returns:
+            list[str]: Names of the indexes that are in place.
+
+        """
+        collection = self.get_collection()
+        if collection is None:
+            return []
+
+        try:
+            # Campi introdotti dopo i primi documenti: calcolati sul server, senza leggere gli embeddings
+            backfill = collection.update_many(
+                {"encoding_hashes": {"$exists": False}},
+                [{"$set": {"encoding_hashes": {"$map": {
+                    "input": {"$filter": {
+                        "input": {"$objectToArray": {"$ifNull": ["$encoding", {}]}},
+                        "cond": {"$ne": ["$$this.v", None]},
+                    }},
+                    "in": "$$this.k",
+                }}}}],
+            )
+            stamped = collection.update_many({"updated_at": {"$exists": False}}, {"$set": {"updated_at": datetime.now(timezone.utc)}})
+            tagged = collection.update_many({"encoding_model": {"$exists": False}}, {"$set": {"encoding_model": LEGACY_ENCODING_MODEL}})
+            changed = max(backfill.modified_count, stamped.modified_count, tagged.modified_count)
+            if changed:
+                logger.info(f"Campi indicizzati aggiunti a {changed} documenti")
+        except PyMongoError as e:
+            logger.error(f"Aggiornamento dei documenti esistenti fallito: {e}")
+
+        created = []
+        for index in INDEXES:
+            name = index.document["name"]
+            try:
+                collection.create_indexes([index])
+                created.append(name)
+            except OperationFailure as e:
+                if name == "single_user":
+                    logger.critical(f"Indice {name} non creato: più persone con role=USER nel database ({e})")
+                else:
+                    logger.error(f"Indice {name} non creato: {e}")
+        Database._indexed.add((self.name_db, self.collection_name))
+        logger.info(f"Indici verificati su {self.name_db}.{self.collection_name}: {', '.join(created)}")
+        return created
+
+    def find_encoding_owners(self, hashes: list[str]) -> dict[str, str]:
+        """Return the people who already have an embedding for the given image hashes.
+
+        Uses the ``encoding_hashes`` index: one query, no embedding is read.
+
+        Args:
+            hashes (list[str]): Image hashes.
+
+        Returns:
+            dict[str, str]: Image hash -> person ID, for the hashes found.
+
+        """
+        collection = self.get_collection()
+        if collection is None or not hashes:
+            return {}
+        wanted = set(hashes)
+        owners = {}
+        for doc in collection.find({"encoding_hashes": {"$in": list(wanted)}}, {"_id": 1, "encoding_hashes": 1}):
+            for key in wanted.intersection(doc.get("encoding_hashes", [])):
+                owners[key] = str(doc["_id"])
+        return owners
+
+    def referenced_hashes(self, batch_size: int = GALLERY_BATCH_SIZE) -> set[str]:
+        """Return the hashes of every image with a stored embedding.
+
+        Reads ``encoding_hashes``, not the embeddings (except for documents
+        written before that field existed). Used to find the images of the
+        image store no person refers to any more.
+
+        Args:
+            batch_size (int): Documents per cursor batch. Default: ``GALLERY_BATCH_SIZE``.
+
+        Returns:
+            set[str]: Image hashes.
+
+        Raises:
+            ConnectionFailure: If the database is not reachable.
+
+        """
+        collection = self.get_collection()
+        if collection is None:
+            raise ConnectionFailure("database non raggiungibile")
+        hashes = set()
+        for doc in collection.find({"encoding_hashes.0": {"$exists": True}}, {"_id": 0, "encoding_hashes": 1}, batch_size=batch_size):
+            hashes.update(doc["encoding_hashes"])
+        # Documenti non ancora aggiornati da ensure_indexes: chiavi lette da "encoding"
+        for doc in collection.find({"encoding_hashes": {"$exists": False}}, {"_id": 0, "encoding": 1}, batch_size=batch_size):
+            hashes.update(_encoding_hashes(doc.get("encoding")))
+        return hashes
+
     def get_collection(self) -> pymongo.collection.Collection | None:
         """Get MongoDB collection instance.
 
+        The handle is cached and reused while the shared client stays the same,
+        so the connection URL is not validated again on every call.
+
         Returns:
             pymongo.collection.Collection | None: MongoDB collection instance, or None if connection fails.
 
         """
+        if self._collection is not None and self._collection_client is Database.current_client:
+            return self._collection
+
         client = None
         try :
             client = self.get_connection(self.url)
@@ -307,7 +877,9 @@ class Database():
             return None
         
         db = client[self.name_db] 
-        return db[self.collection_name]
+        self._collection = db[self.collection_name]
+        self._collection_client = client
+        return self._collection
     
     def add_person(self, person: Person) -> Optional[Person] | None:
         """Add a new person to the database.
@@ -329,6 +901,7 @@ class Database():
         """
         collection = self.get_collection()
         person_dict = self._person_to_document(person)
+        person_dict.setdefault("encoding_hashes", [])
 
         if person.role == RoleType.USER:
             if getattr(self, "patient", None) is not None:
@@ -403,6 +976,69 @@ class Database():
             logger.warning(f"Nessuna persona trovata con ID {person_id}.")
             return False
     
+    def list_people(
+        self,
+        after: Optional[str] = None,
+        limit: int = 50,
+        fields: Optional[list[str]] = None,
+        embedding_count: bool = True,
+    ) -> tuple[list[dict], Optional[str]]:
+        """Return one page of people, without their embeddings unless asked.
+
+        Pages are keyset-paginated on ``_id``: the next page starts after the
+        last ID of the previous one, so every page costs an index range scan
+        whatever its position, and people added meanwhile are neither skipped
+        nor repeated. The count of embeddings is computed on the server with
+        ``$size`` on ``encoding_hashes``, so no embedding leaves the database.
+
+        Args:
+            after (str | None): ID of the last person of the previous page; None for the first page.
+            limit (int): People per page, at most ``LIST_MAX_LIMIT``. Default: 50.
+            fields (list[str] | None): Fields to return, among ``LIST_FIELDS``; None for
+                ``LIST_DEFAULT_FIELDS``. ``id`` is always returned.
+            embedding_count (bool): Add ``embedding_count`` to each person. Default: True.
+
+        Returns:
+            tuple[list[dict], str | None]: People of the page and the cursor of the next
+                page, None on the last one.
+
+        Raises:
+            ValueError: If the cursor, the limit or a field is not valid.
+
+        """
+        if not 1 <= limit <= LIST_MAX_LIMIT:
+            raise ValueError(f"limit deve essere tra 1 e {LIST_MAX_LIMIT}")
+        fields = list(LIST_DEFAULT_FIELDS if fields is None else fields)
+        unknown = [field for field in fields if field not in LIST_FIELDS]
+        if unknown:
+            raise ValueError(f"Campi non validi: {unknown}. Valori accettati: {list(LIST_FIELDS)}")
+        match = {}
+        if after is not None:
+            oid = Database.convert_to_objectid(after)
+            if oid is None:
+                raise ValueError(f"Cursore non valido: {after}")
+            match["_id"] = {"$gt": oid}
+
+        collection = self.get_collection()
+        if collection is None:
+            raise ConnectionFailure("Database non raggiungibile")
+
+        projection = {field: 1 for field in fields}
+        if embedding_count:
+            projection["embedding_count"] = {"$size": {"$ifNull": ["$encoding_hashes", []]}}
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"_id": ASCENDING}},
+            # Un elemento in più per sapere se esiste una pagina successiva
+            {"$limit": limit + 1},
+            {"$project": projection},
+        ]
+        docs = list(collection.aggregate(pipeline))
+
+        next_cursor = str(docs[limit - 1]["_id"]) if len(docs) > limit else None
+        people = [{"id": str(doc.pop("_id")), **doc} for doc in docs[:limit]]
+        return people, next_cursor
+
     def get_all_people(self) -> list[Person]:
         """Retrieve all people from the database.
 
@@ -431,6 +1067,96 @@ class Database():
                 people.append(person)
         return people
 
+    def load_gallery(self, raw: bool = True, batch_size: int = GALLERY_BATCH_SIZE, model: Optional[str] = None) -> Gallery:
+        """Load the recognition gallery without building ``Person`` objects.
+
+        Streams the documents of the collection and fills the embedding
+        matrix and the person arrays directly. Only the fields shown with a
+        recognized face are validated (role, relationship, birthday type); a
+        document failing them is skipped, as are embeddings with the wrong
+        dimension or NaN/Inf values.
+
+        With ``raw`` the cursor returns ``RawBSONDocument``: the ``encoding``
+        sub-document is never turned into Python lists: its arrays are kept
+        as bytes and copied into NumPy with one gather per array length (see
+        ``_raw_vectors``).
+
+        Embeddings of different models cannot be compared: with ``model`` only
+        the people whose embeddings were produced by it are loaded, and the
+        others are counted in a warning until they are re-embedded.
+
+        Args:
+            raw (bool): Decode embeddings from raw BSON. Default: True.
+            batch_size (int): Documents per cursor batch. Default: ``GALLERY_BATCH_SIZE``.
+            model (str | None): Model pack of the embeddings to load. Default: None
+                (all, whatever their model).
+
+        Returns:
+            Gallery: Embeddings, person records and row -> person index.
+
+        """
+        collection = self.get_collection()
+        if raw:
+            collection = collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+
+        query = {}
+        if model is not None:
+            query = {"encoding_model": {"$in": _model_values(model)}}
+            other = collection.count_documents({"encoding_model": {"$nin": _model_values(model)}, "encoding_hashes.0": {"$exists": True}})
+            if other:
+                logger.warning(f"{other} persone con embeddings di un altro modello escluse dalla galleria {model}: serve una ri-estrazione")
+
+        candidates: list[GalleryPerson] = []
+        entries: list[tuple[int, str]] = []
+        payloads: list[np.ndarray | bytes] = []
+        skipped = 0
+        for doc in collection.find(query, GALLERY_PROJECTION, batch_size=batch_size):
+            try:
+                person = _gallery_person(doc)
+                encodings = _doc_encodings(doc)
+            except Exception as e:
+                logger.error(f"Documento {doc.get('_id')} escluso dalla galleria: {e}")
+                skipped += 1
+                continue
+            for key, payload in encodings:
+                entries.append((len(candidates), key))
+                payloads.append(payload)
+            candidates.append(person)
+
+        # Array grezzi decodificati tutti insieme, un gather per lunghezza
+        raw_indices = [i for i, payload in enumerate(payloads) if isinstance(payload, bytes)]
+        for i, vector in zip(raw_indices, _raw_vectors([payloads[i] for i in raw_indices])):
+            payloads[i] = vector
+
+        vectors: list[np.ndarray] = []
+        rows: list[int] = []
+        people: list[GalleryPerson] = []
+        person_index: dict[int, int] = {}
+        dimension = None
+        for (candidate, key), vector in zip(entries, payloads):
+            person = candidates[candidate]
+            if dimension is None:
+                dimension = len(vector)
+            if len(vector) != dimension:
+                logger.error(f"Embedding con dimensione errata per {person.name} {person.surname} (hash: {key})")
+                continue
+            if candidate not in person_index:
+                person_index[candidate] = len(people)
+                people.append(person)
+            vectors.append(vector)
+            rows.append(person_index[candidate])
+
+        matrix = np.vstack(vectors) if vectors else None
+        person_rows = np.array(rows, dtype=np.int32)
+        if matrix is not None:
+            # Righe con NaN/Inf scartate in un colpo solo
+            finite = np.isfinite(matrix).all(axis=1)
+            if not finite.all():
+                logger.error(f"{int((~finite).sum())} embeddings con valori NaN/Inf scartati")
+                matrix, person_rows = matrix[finite], person_rows[finite]
+        logger.info(f"Galleria caricata: {len(people)} persone, {len(rows)} embeddings, {skipped} documenti scartati")
+        return Gallery(matrix, people, person_rows)
+
     def get_person(self, person_id: str) -> Optional[Person]:
         """Retrieve a person by ID.
 
@@ -492,10 +1218,16 @@ class Database():
         if not payload:
             logger.warning("Nessun dato valido fornito per l'aggiornamento.")
             return None
+        update = {"$set": payload}
+        if isinstance(payload.get("encoding"), dict):
+            payload["encoding_hashes"] = _encoding_hashes(payload["encoding"])
+            payload.setdefault("encoding_model", embedding_settings.model)
+            update["$unset"] = STAGED_FIELDS
+        payload["updated_at"] = datetime.now(timezone.utc)
 
         updated_doc = collection.find_one_and_update(
             {"_id": oid},
-            {"$set": payload},
+            update,
             return_document=ReturnDocument.AFTER
         )
 
@@ -510,10 +1242,10 @@ class Database():
         """Update multiple people in the database.
 
         ⚠️ **Deprecated**: This method is not currently used in the application.
-        Person management is primarily done through `add_person()` during initial setup.
-        Consider implementing batch update functionality via REST API if needed.
+        Use `write_people()`, which reports the outcome of each person.
 
-        Adds new people (id=None) or updates existing ones based on their ID.
+        Adds new people (id=None) or updates existing ones based on their ID,
+        in batches (see `write_people()`).
 
         Args:
             people (list): List of Person objects to add or update.
@@ -522,22 +1254,373 @@ class Database():
             int: Number of successfully processed people.
 
         """
-        success_count = 0
-        for person in people:
-            p = None
-            
-            if person.id is None:
-                p = self.add_person(person)                  
-            elif person.id is not None:
-                p = self.update_person(person.id, person)
+        return sum(result.ok for result in self.write_people(people))
+
+    def _existing_ids(self, collection, oids: list[ObjectId], batch_size: int) -> set[ObjectId]:
+        """Return which of the given IDs exist, with one query per batch."""
+        existing = set()
+        for start in range(0, len(oids), batch_size):
+            chunk = oids[start:start + batch_size]
+            existing.update(doc["_id"] for doc in collection.find({"_id": {"$in": chunk}}, {"_id": 1}))
+        return existing
+
+    def _encoding_models(self, collection, oids: list[ObjectId], batch_size: int) -> dict[ObjectId, Optional[str]]:
+        """Return the model of the stored embeddings of the given IDs that exist.
+
+        The model is None for a person without embeddings, and
+        ``LEGACY_ENCODING_MODEL`` for documents not tagged yet.
+
+        """
+        models = {}
+        projection = {"_id": 1, "encoding_model": 1, "encoding_hashes": 1}
+        for start in range(0, len(oids), batch_size):
+            chunk = oids[start:start + batch_size]
+            for doc in collection.find({"_id": {"$in": chunk}}, projection):
+                has_encodings = bool(doc.get("encoding_hashes"))
+                models[doc["_id"]] = doc.get("encoding_model", LEGACY_ENCODING_MODEL) if has_encodings else None
+        return models
+
+    def _stored_encodings(self, collection, oids: list[ObjectId], batch_size: int) -> dict[ObjectId, dict]:
+        """Return the stored embeddings (image hash -> vector) of the given IDs."""
+        stored = {}
+        for start in range(0, len(oids), batch_size):
+            chunk = oids[start:start + batch_size]
+            for doc in collection.find({"_id": {"$in": chunk}}, {"_id": 1, "encoding": 1}):
+                stored[doc["_id"]] = doc.get("encoding") or {}
+        return stored
+
+    def _run_bulk(self, collection, operations: list[tuple[int, object]], results: list[BulkItemResult], batch_size: int):
+        """Execute write operations as unordered ``bulk_write`` calls.
+
+        Failures are recorded on the result of the item that produced the
+        operation; a failed operation does not stop the others.
+
+        Args:
+            collection: Target collection.
+            operations (list[tuple[int, object]]): (item index, pymongo write operation) pairs.
+            results (list[BulkItemResult]): Results indexed by item.
+            batch_size (int): Operations per ``bulk_write`` call.
+
+        """
+        for start in range(0, len(operations), batch_size):
+            batch = operations[start:start + batch_size]
+            try:
+                collection.bulk_write([operation for _, operation in batch], ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    results[batch[error["index"]][0]].fail(error.get("errmsg", "errore di scrittura"))
+                for error in e.details.get("writeConcernErrors", []):
+                    logger.critical(f"Errore di write concern nel batch: {error.get('errmsg')}")
+            except PyMongoError as e:
+                logger.critical(f"Batch di {len(batch)} scritture fallito: {e}")
+                for index, _ in batch:
+                    results[index].fail(str(e))
+
+    def write_people(self, people: list[Person], batch_size: int = BULK_BATCH_SIZE) -> list[BulkItemResult]:
+        """Insert new people and update existing ones with batched writes.
+
+        People without an ID are inserted with an ID generated up front (and
+        assigned to ``person.id`` once written); the others replace the stored
+        fields with ``$set``. Operations are sent as unordered ``bulk_write``
+        calls of ``batch_size``, so a failing item does not stop the rest.
+
+        Checks run once per call rather than once per item: a single query
+        finds the current USER and one ``$in`` query per batch finds which
+        IDs exist. A person with role USER is refused when another USER exists
+        or was already accepted earlier in the same call.
+
+        Args:
+            people (list[Person]): People to add or update.
+            batch_size (int): Operations per ``bulk_write`` call. Default: ``BULK_BATCH_SIZE``.
+
+        Returns:
+            list[BulkItemResult]: One result per person, in input order.
+
+        """
+        collection = self.get_collection()
+        if collection is None:
+            return [BulkItemResult(i, person.id and str(person.id), False, "database non raggiungibile") for i, person in enumerate(people)]
+
+        oids = [Database.convert_to_objectid(str(person.id)) if person.id is not None else None for person in people]
+        existing = self._existing_ids(collection, [oid for oid in oids if oid is not None], batch_size)
+        user_doc = collection.find_one({"role": RoleType.USER.value}, {"_id": 1})
+        user_id = user_doc["_id"] if user_doc else None
+        previous_user_id = user_id
+
+        results: list[BulkItemResult] = []
+        operations: list[tuple[int, object]] = []
+        for index, (person, oid) in enumerate(zip(people, oids)):
+            result = BulkItemResult(index, None if oid is None else str(oid))
+            results.append(result)
+            if person.id is not None and oid is None:
+                result.fail(f"ID non valido: {person.id}")
+                continue
+            if oid is not None and oid not in existing:
+                result.fail("persona non trovata")
+                continue
+
+            insert = oid is None
+            if insert:
+                oid = ObjectId()
+
+            # Un solo USER: quello esistente, oppure il primo accettato in questa chiamata
+            if person.role == RoleType.USER:
+                if user_id is not None and user_id != oid:
+                    result.fail("esiste già un paziente registrato")
+                    continue
+                user_id = oid
+            elif user_id == oid:
+                user_id = None
+
+            document = self._person_to_document(person)
+            document.pop("_id", None)
+            result.id = str(oid)
+            if insert:
+                document.setdefault("encoding_hashes", [])
+                operations.append((index, InsertOne({"_id": oid, **document})))
             else:
-                logger.error(f"Impossibile aggiornare persona con dati: {person}")
-            
-            if p is not None:
-                    success_count += 1
+                update = {"$set": document}
+                if "encoding" in document:
+                    # Embeddings nuovi: quelli ri-estratti in attesa non sono più validi
+                    update["$unset"] = STAGED_FIELDS
+                operations.append((index, UpdateOne({"_id": oid}, update)))
+
+        self._run_bulk(collection, operations, results, batch_size)
+
+        for person, result in zip(people, results):
+            if not result.ok:
+                continue
+            person.id = result.id
+            if person.role == RoleType.USER:
+                self.patient = person
+            elif previous_user_id is not None and result.id == str(previous_user_id):
+                self.patient = None
+        written = sum(result.ok for result in results)
+        logger.info(f"Scrittura in blocco: {written}/{len(people)} persone salvate")
+        return results
+
+    def update_encodings(
+        self,
+        changes: dict[str, dict[str, np.ndarray | list | None]],
+        batch_size: int = BULK_BATCH_SIZE,
+        model: Optional[str] = None,
+    ) -> list[BulkItemResult]:
+        """Set or remove face encodings of many people with batched writes.
+
+        Each person gets an update with ``$set`` of ``encoding.<hash>`` for the
+        new vectors and one with ``$unset`` for the hashes mapped to None,
+        keeping ``encoding_hashes`` and ``updated_at`` in step; the other
+        encodings of the person are left untouched. Updates are sent as
+        unordered ``bulk_write`` calls of ``batch_size``.
+
+        New vectors are refused for a person whose stored embeddings come from
+        another model, and discard the embeddings staged for the person by a
+        re-embedding job (it is re-embedded again). With ``QUALITY_ENROL_DEDUPE``
+        the new vectors are compared with the ones the person keeps, and near
+        duplicates are not written (see ``utils.quality.dedupe_enrolment``).
+
+        Args:
+            changes (dict[str, dict[str, np.ndarray | list | None]]): Person ID ->
+                {image hash: embedding, or None to remove it}.
+            batch_size (int): Operations per ``bulk_write`` call. Default: ``BULK_BATCH_SIZE``.
+            model (str | None): Model pack of the new vectors. Default: None (``EMBED_MODEL``).
+
+        Returns:
+            list[BulkItemResult]: One result per person, in the order of ``changes``.
+
+        """
+        items = list(changes.items())
+        collection = self.get_collection()
+        if collection is None:
+            return [BulkItemResult(i, person_id, False, "database non raggiungibile") for i, (person_id, _) in enumerate(items)]
+
+        model = model or embedding_settings.model
+        oids = [Database.convert_to_objectid(person_id) for person_id, _ in items]
+        existing = self._encoding_models(collection, [oid for oid in oids if oid is not None], batch_size)
+        stored = {}
+        if quality_settings.enrol_dedupe:
+            adding = [oid for oid, (_, encodings) in zip(oids, items) if oid in existing and any(v is not None for v in encodings.values())]
+            stored = self._stored_encodings(collection, adding, batch_size)
+
+        results: list[BulkItemResult] = []
+        operations: list[tuple[int, object]] = []
+        for index, ((person_id, encodings), oid) in enumerate(zip(items, oids)):
+            result = BulkItemResult(index, person_id)
+            results.append(result)
+            if oid is None:
+                result.fail(f"ID non valido: {person_id}")
+                continue
+            if oid not in existing:
+                result.fail("persona non trovata")
+                continue
+            # L'hash diventa parte del percorso del campo: niente punti né $
+            invalid = [key for key in encodings if not key or "." in key or key.startswith("$")]
+            if invalid:
+                result.fail(f"hash non validi: {invalid}")
+                continue
+
+            added = [key for key, value in encodings.items() if value is not None]
+            removed = [key for key, value in encodings.items() if value is None]
+            stored_model = existing[oid]
+            if added and stored_model is not None and stored_model not in _model_values(model):
+                result.fail(f"embeddings salvati con un altro modello: {stored_model}")
+                continue
+            if added and oid in stored:
+                # Confronto con gli embeddings che la persona conserva dopo le rimozioni
+                kept, _ = dedupe_enrolment(
+                    {key: encodings[key] for key in added},
+                    {key: value for key, value in stored[oid].items() if key not in removed},
+                )
+                encodings, added = kept, list(kept)
+            now = datetime.now(timezone.utc)
+            # $addToSet e $pull sullo stesso campo non possono stare nello stesso update
+            if added:
+                to_set = {f"encoding.{key}": np.asarray(encodings[key], dtype=np.float64).ravel().tolist() for key in added}
+                operations.append((index, UpdateOne(
+                    {"_id": oid},
+                    {
+                        "$set": {**to_set, "encoding_model": model, "updated_at": now},
+                        "$addToSet": {"encoding_hashes": {"$each": added}},
+                        "$unset": STAGED_FIELDS,
+                    },
+                )))
+            if removed:
+                operations.append((index, UpdateOne(
+                    {"_id": oid},
+                    {
+                        # Come per le aggiunte: la persona va ri-estratta dal job in corso
+                        "$unset": {**{f"encoding.{key}": "" for key in removed}, **STAGED_FIELDS},
+                        "$set": {"updated_at": now},
+                        "$pull": {"encoding_hashes": {"$in": removed}},
+                    },
+                )))
+
+        self._run_bulk(collection, operations, results, batch_size)
+        written = sum(result.ok for result in results)
+        logger.info(f"Aggiornamento encodings in blocco: {written}/{len(items)} persone aggiornate")
+        return results
+
+    def find_stale_encodings(
+        self, model: str, after: Optional[ObjectId] = None, limit: int = BULK_BATCH_SIZE, exclude: tuple = ()
+    ) -> list[dict]:
+        """Return the next people whose embeddings must be re-embedded with ``model``.
+
+        People whose embeddings come from another model and have none staged
+        for ``model`` yet, in ``_id`` order: a job interrupted at any point
+        resumes from what is still missing. No embedding is read.
+
+        Args:
+            model (str): Target model pack.
+            after (ObjectId | None): Return people after this ID. Default: None (from the start).
+            limit (int): Maximum people returned. Default: ``BULK_BATCH_SIZE``.
+            exclude (tuple): IDs to skip (people that cannot be re-embedded). Default: ().
+
+        Returns:
+            list[dict]: Documents with ``_id``, ``encoding_hashes`` and ``updated_at``.
+
+        """
+        collection = self.get_collection()
+        if collection is None:
+            raise ConnectionFailure("database non raggiungibile")
+        query = {
+            "encoding_model": {"$nin": _model_values(model)},
+            "encoding_staged_model": {"$ne": model},
+            "encoding_hashes.0": {"$exists": True},
+        }
+        ids = {}
+        if after is not None:
+            ids["$gt"] = after
+        if exclude:
+            ids["$nin"] = list(exclude)
+        if ids:
+            query["_id"] = ids
+        projection = {"_id": 1, "encoding_hashes": 1, "updated_at": 1}
+        return list(collection.find(query, projection).sort("_id", ASCENDING).limit(limit))
+
+    def count_stale_encodings(self, model: str) -> dict[str, int]:
+        """Count the people still to re-embed with ``model`` and those already staged.
+
+        Returns:
+            dict[str, int]: {"pending": int, "staged": int}.
+
+        """
+        collection = self.get_collection()
+        if collection is None:
+            raise ConnectionFailure("database non raggiungibile")
+        stale = {"encoding_model": {"$nin": _model_values(model)}, "encoding_hashes.0": {"$exists": True}}
+        return {
+            "pending": collection.count_documents({**stale, "encoding_staged_model": {"$ne": model}}),
+            "staged": collection.count_documents({**stale, "encoding_staged_model": model}),
+        }
+
+    def stage_encodings(
+        self, docs: list[dict], encodings: list[dict[str, np.ndarray]], model: str, batch_size: int = BULK_BATCH_SIZE
+    ) -> list[BulkItemResult]:
+        """Store embeddings computed with a new model next to the ones in use.
+
+        Writes ``encoding_staged`` and ``encoding_staged_model`` with unordered
+        ``bulk_write`` calls, leaving ``encoding`` (read by the serving gallery)
+        untouched until ``promote_encodings``. Each update matches the
+        ``updated_at`` read by ``find_stale_encodings``: a person modified in
+        the meantime is not staged and is returned again by the next search.
+
+        Args:
+            docs (list[dict]): Documents returned by ``find_stale_encodings``.
+            encodings (list[dict[str, np.ndarray]]): New {image hash: embedding} of each document.
+            model (str): Model pack of the new embeddings.
+            batch_size (int): Operations per ``bulk_write`` call. Default: ``BULK_BATCH_SIZE``.
+
+        Returns:
+            list[BulkItemResult]: One result per document, in input order.
+
+        """
+        collection = self.get_collection()
+        if collection is None:
+            return [BulkItemResult(i, str(doc["_id"]), False, "database non raggiungibile") for i, doc in enumerate(docs)]
+
+        results = [BulkItemResult(i, str(doc["_id"])) for i, doc in enumerate(docs)]
+        operations = []
+        for index, (doc, vectors) in enumerate(zip(docs, encodings)):
+            staged = {key: np.asarray(vector, dtype=np.float64).ravel().tolist() for key, vector in vectors.items()}
+            operations.append((index, UpdateOne(
+                {"_id": doc["_id"], "updated_at": doc.get("updated_at")},
+                {"$set": {"encoding_staged": staged, "encoding_staged_model": model}},
+            )))
+        self._run_bulk(collection, operations, results, batch_size)
+        return results
+
+    def promote_encodings(self, model: str) -> int:
+        """Replace the embeddings in use with those staged for ``model``.
+
+        One server-side update moves ``encoding_staged`` into ``encoding`` and
+        sets ``encoding_model`` and ``encoding_hashes`` accordingly; hashes
+        whose image had no face with the new model are dropped.
+
+        Args:
+            model (str): Model pack of the staged embeddings.
+
+        Returns:
+            int: Number of people promoted.
+
+        """
+        collection = self.get_collection()
+        if collection is None:
+            raise ConnectionFailure("database non raggiungibile")
+        result = collection.update_many(
+            {"encoding_staged_model": model},
+            [
+                {"$set": {
+                    "encoding": "$encoding_staged",
+                    "encoding_model": model,
+                    "encoding_hashes": {"$map": {"input": {"$objectToArray": "$encoding_staged"}, "in": "$$this.k"}},
+                    "updated_at": datetime.now(timezone.utc),
+                }},
+                {"$project": {field: 0 for field in STAGED_FIELDS}},
+            ],
+        )
+        logger.info(f"Embeddings {model} promossi per {result.modified_count} persone")
+        return result.modified_count
 
-        return success_count
-        
     def get_all_encodings(self) -> tuple[list[str], list[np.ndarray]]:
         """Extract all face encodings from all people in the database.
 
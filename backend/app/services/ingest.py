@@ -0,0 +1,399 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Callable, Iterator, Optional
+
+import cv2
+import numpy as np
+
+from services.channels import ChannelHub
+
+logger = logging.getLogger(__name__)
+
+# Marcatore di fine sorgente passato dal thread di decodifica a quello di inferenza
+_END = object()
+
+
+def is_live_source(source: str) -> bool:
+    """Tell whether a source is a live stream or camera rather than a video file.
+
+    Args:
+        source (str): File path, stream URL or camera index.
+
+    Returns:
+        bool: True for camera indexes and ``scheme://`` URLs, False for file paths.
+
+    """
+    return source.isdigit() or "://" in source
+
+
+class VideoSource:
+    """Frames sampled at a target rate from a video file, stream URL or camera.
+
+    Frames that fall between two samples are only grabbed (demuxed) and never
+    converted to BGR. Files are sampled on their own timeline, live sources on
+    the wall clock. Live sources are reopened after ``reconnect_delay`` when the
+    stream fails; files end at EOF.
+
+    Attributes:
+        source (str): File path, stream URL or camera index.
+        fps (float): Frames per second to sample.
+        live (bool): Whether the source is a live stream or camera.
+        reconnect_delay (float): Seconds to wait before reopening a failed stream.
+
+    """
+
+    def __init__(self, source: str, fps: float = 5.0, reconnect_delay: float = 5.0):
+        """Initialize VideoSource.
+
+        Args:
+            source (str): File path, stream URL or camera index.
+            fps (float): Frames per second to sample. Default: 5.0.
+            reconnect_delay (float): Seconds before reopening a failed stream. Default: 5.0.
+
+        Raises:
+            FileNotFoundError: If the source is a file path that does not exist.
+
+        """
+        self.source = source
+        self.fps = fps
+        self.live = is_live_source(source)
+        # Un percorso sbagliato non va ritentato all'infinito come uno stream
+        if not self.live and not os.path.isfile(source):
+            raise FileNotFoundError(f"File video non trovato: {source}")
+        self.reconnect_delay = reconnect_delay
+        self.capture: Optional[cv2.VideoCapture] = None
+
+    def open(self) -> bool:
+        """Open the underlying capture.
+
+        Returns:
+            bool: True if the capture is open.
+
+        """
+        self.close()
+        target = int(self.source) if self.source.isdigit() else self.source
+        self.capture = cv2.VideoCapture(target)
+        if self.live:
+            # Riduce la latenza sulle sorgenti che lo supportano
+            self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if not self.capture.isOpened():
+            logger.error(f"Impossibile aprire la sorgente video {self.source}")
+            return False
+        return True
+
+    def close(self):
+        """Release the underlying capture."""
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+    def frames(self, stop: threading.Event) -> Iterator[tuple[int, float, np.ndarray]]:
+        """Yield sampled frames until the source ends or ``stop`` is set.
+
+        Args:
+            stop (threading.Event): Set to stop reading.
+
+        Yields:
+            tuple[int, float, np.ndarray]: (frame index, timestamp in ms, BGR frame).
+                The timestamp is the position in the file, or the time since the
+                source was first opened for live sources.
+
+        """
+        interval_ms = 1000.0 / self.fps if self.fps > 0 else 0.0
+        started = time.monotonic()
+        next_ms = 0.0
+        index = -1
+
+        while not stop.is_set():
+            if self.capture is None or not self.capture.isOpened():
+                if not self.open():
+                    if not self.live:
+                        return
+                    stop.wait(self.reconnect_delay)
+                    continue
+
+            if not self.capture.grab():
+                if not self.live:
+                    return
+                logger.warning(f"Stream {self.source} interrotto, riconnessione tra {self.reconnect_delay}s")
+                self.close()
+                stop.wait(self.reconnect_delay)
+                continue
+            index += 1
+
+            if self.live:
+                timestamp = (time.monotonic() - started) * 1000.0
+            else:
+                timestamp = self.capture.get(cv2.CAP_PROP_POS_MSEC)
+            if timestamp < next_ms:
+                continue
+            # Se la sorgente è più lenta del campionamento non si accumula ritardo
+            next_ms = max(next_ms + interval_ms, timestamp)
+
+            ok, frame = self.capture.retrieve()
+            if ok and frame is not None:
+                yield index, timestamp, frame
+        self.close()
+
+
+class LogSink:
+    """Sink writing a one-line summary of each result to the log."""
+
+    def __init__(self, name: str):
+        """Initialize LogSink.
+
+        Args:
+            name (str): Source name used as log prefix.
+
+        """
+        self.name = name
+
+    def emit(self, result: dict):
+        """Log a result."""
+        faces = result.get("faces", [])
+        if faces:
+            names = ", ".join(f"#{f.get('track_id')} {f.get('name')} {f.get('surname') or ''}".strip() for f in faces)
+            logger.info(f"[{self.name}] frame {result.get('frame')}: {len(faces)} volti ({names})")
+
+    def close(self):
+        """Nothing to release."""
+
+
+class JsonlSink:
+    """Sink appending each result as a JSON line to a file."""
+
+    def __init__(self, path: str):
+        """Initialize JsonlSink.
+
+        Args:
+            path (str): Output file, created with its directory if missing.
+
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def emit(self, result: dict):
+        """Append a result."""
+        self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    def close(self):
+        """Close the file."""
+        self._file.close()
+
+
+class BroadcastSink:
+    """Sink publishing results on a channel of a ``ChannelHub``.
+
+    Results are handed to the event loop thread, which delivers them to the
+    WebSocket viewers subscribed to the channel.
+
+    Attributes:
+        hub (ChannelHub): Channel registry bound to the server event loop.
+        name (str): Channel name.
+
+    """
+
+    def __init__(self, hub: ChannelHub, name: str):
+        """Initialize BroadcastSink and attach it as the channel publisher.
+
+        Args:
+            hub (ChannelHub): Channel registry bound to the server event loop.
+            name (str): Channel name.
+
+        Raises:
+            RuntimeError: If the hub is not bound to an event loop.
+            ValueError: If the channel already has a publisher.
+
+        """
+        if hub.loop is None:
+            raise RuntimeError("Il sink broadcast richiede l'event loop del server")
+        if hub.claim(name, "ingest") is None:
+            raise ValueError(f"Il canale {name} ha già un publisher")
+        self.hub = hub
+        self.name = name
+
+    def emit(self, result: dict):
+        """Publish a result from the worker thread."""
+        self.hub.publish_threadsafe(self.name, result)
+
+    def close(self):
+        """Detach from the channel."""
+        if not self.hub.loop.is_closed():
+            self.hub.loop.call_soon_threadsafe(self.hub.release, self.name)
+
+
+class IngestWorker:
+    """Server-side recognition of a video source without a browser.
+
+    A decode thread reads and samples frames from a ``VideoSource`` while an
+    inference thread runs ``process`` on the previous one, so decoding and
+    inference overlap. The two threads are connected by a queue of
+    ``queue_size`` frames: for files the decode thread waits when the queue is
+    full (no frame is lost), for live sources the oldest frame is dropped so
+    results never lag behind the stream.
+
+    Attributes:
+        name (str): Source name, included in every result.
+        source (VideoSource): Frame source.
+        process (Callable[[np.ndarray], dict]): Per-frame analysis returning a result
+            with "status" and "faces".
+        sinks (list): Objects with ``emit(result)`` and ``close()``.
+        executor (Executor | None): Executor running ``process``, shut down with the
+            worker; when None ``process`` runs on the inference thread.
+
+    """
+
+    def __init__(
+        self,
+        name: str,
+        source: VideoSource,
+        process: Callable[[np.ndarray], dict],
+        sinks: list,
+        queue_size: int = 2,
+        executor: Optional[Executor] = None,
+    ):
+        """Initialize IngestWorker.
+
+        Args:
+            name (str): Source name.
+            source (VideoSource): Frame source.
+            process (Callable[[np.ndarray], dict]): Per-frame analysis.
+            sinks (list): Result sinks.
+            queue_size (int): Frames buffered between the threads. Default: 2.
+            executor (Executor | None): Executor running ``process``. Default: None.
+
+        """
+        self.name = name
+        self.source = source
+        self.process = process
+        self.sinks = sinks
+        self.executor = executor
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self.frames_read = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.last_latency_ms: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the inference thread is alive."""
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        """Start the decode and inference threads."""
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._decode_loop, name=f"ingest-decode-{self.name}", daemon=True),
+            threading.Thread(target=self._inference_loop, name=f"ingest-infer-{self.name}", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Ingestione avviata: {self.name} <- {self.source.source} ({self.source.fps} fps)")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the threads and close the sinks.
+
+        Args:
+            timeout (float): Seconds to wait for each thread. Default: 5.0.
+
+        """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                logger.warning(f"Errore nella chiusura del sink di {self.name}: {e}")
+
+    def wait(self):
+        """Block until the source ends (files) or the worker is stopped."""
+        for thread in self._threads:
+            thread.join()
+
+    def status(self) -> dict:
+        """Return counters and state of the worker."""
+        return {
+            "name": self.name,
+            "source": self.source.source,
+            "live": self.source.live,
+            "fps": self.source.fps,
+            "running": self.running,
+            "frames_read": self.frames_read,
+            "frames_processed": self.frames_processed,
+            "frames_dropped": self.frames_dropped,
+            "last_latency_ms": self.last_latency_ms,
+            "error": self.error,
+        }
+
+    def _put(self, item):
+        if self.source.live:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self.frames_dropped += 1
+                    except queue.Empty:
+                        pass
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _decode_loop(self):
+        try:
+            for item in self.source.frames(self._stop):
+                self.frames_read += 1
+                self._put(item)
+        except Exception as e:
+            logger.error(f"Errore di decodifica su {self.name}: {e}", exc_info=True)
+            self.error = str(e)
+        finally:
+            self._put(_END)
+
+    def _inference_loop(self):
+        while not self._stop.is_set():
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is _END:
+                break
+
+            index, timestamp, frame = item
+            started = time.perf_counter()
+            try:
+                if self.executor is not None:
+                    result = self.executor.submit(self.process, frame).result()
+                else:
+                    result = self.process(frame)
+            except Exception as e:
+                logger.error(f"Errore di analisi su {self.name}: {e}", exc_info=True)
+                self.error = str(e)
+                continue
+            self.last_latency_ms = round((time.perf_counter() - started) * 1000, 2)
+            self.frames_processed += 1
+
+            result = {"source": self.name, "frame": index, "timestamp_ms": round(timestamp, 1), **result}
+            for sink in self.sinks:
+                try:
+                    sink.emit(result)
+                except Exception as e:
+                    logger.warning(f"Errore nel sink {type(sink).__name__} di {self.name}: {e}")
+        logger.info(f"Ingestione terminata: {self.name} ({self.frames_processed} frame analizzati)")
@@ -1,47 +1,184 @@
+import functools
 import logging
 import sys
 import os
+import time
 import numpy as np
-import cv2
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-import insightface
-from insightface.app import FaceAnalysis
-import onnxruntime as ort
+from models.person import Gallery, GalleryPerson
+from utils.buffers import buffer_pool
+from utils.imgstore import ImageStore, image_store
+from utils.quality import LowQualityFace, QualityGate, describe
 
-import utils.img as img
-from models.person import Person
+# insightface (~1 s), onnxruntime, cv2 e faiss sono importati al primo uso:
+# importare questo modulo (router, script, benchmark) non carica il runtime di inferenza
+if TYPE_CHECKING:
+    from insightface.app import FaceAnalysis
 
-# --- FAISS SETUP (Auto-detection) ---
-try:
-    import faiss
-    FAISS_AVAILABLE = True
-    
-    # Tentativo preliminare di verificare se la libreria supporta la GPU
-    # (Non istanziamo ancora risorse pesanti, verifichiamo solo l'importabilità)
+
+@functools.cache
+def _faiss():
+    """Import FAISS on first use.
+
+    Returns:
+        module | None: The ``faiss`` module, or None if it is not installed.
+
+    """
+    try:
+        import faiss
+    except ImportError:
+        logger.info("FAISS non installato: ricerca con NumPy")
+        return None
+    return faiss
+
+
+@functools.cache
+def faiss_gpu_available() -> bool:
+    """Tell whether FAISS can place indexes on a GPU.
+
+    Detected once, on first use, from the build (``StandardGpuResources``) and
+    the number of visible GPUs, without allocating GPU resources: the actual
+    transfer in ``FaceEngine._initialize_faiss_index`` still falls back to CPU
+    on failure.
+
+    Returns:
+        bool: True with a GPU build of FAISS and at least one GPU.
+
+    """
+    faiss = _faiss()
+    if faiss is None or not hasattr(faiss, "StandardGpuResources"):
+        return False
     try:
-        # Questo test serve a capire se 'faiss-gpu' è installato e funzionante
-        # Se siamo su faiss-cpu, StandardGpuResources solleverà un'eccezione
-        res = faiss.StandardGpuResources()
-        test_index = faiss.IndexFlatIP(128)
-        faiss.index_cpu_to_gpu(res, 0, test_index)
-        FAISS_GPU_AVAILABLE = True
-    except AttributeError:
-        # Se manca StandardGpuResources, è sicuramente la versione CPU
-        FAISS_GPU_AVAILABLE = False
+        return faiss.get_num_gpus() > 0
     except Exception:
-        # Altri errori (es. driver CUDA mancanti)
-        FAISS_GPU_AVAILABLE = False
-        
-except ImportError:
-    FAISS_AVAILABLE = False
-    FAISS_GPU_AVAILABLE = False
+        return False
+
 
 MODEL = "buffalo_l"
 DETECTION_SIZE = 640
+# Dimensione di input di SCRFD sui ritagli attorno ai volti già noti (multiplo di 32)
+ROI_DETECTION_SIZE = 160
+# Margine aggiunto ad ogni lato di una regione, in frazioni della bbox
+ROI_MARGIN = 0.5
 
 logger = logging.getLogger(__name__)
 
+
+def expand_regions(bboxes: np.ndarray, frame_shape: tuple, margin: float = ROI_MARGIN) -> np.ndarray:
+    """Turn face bounding boxes into the crops searched by region detection.
+
+    Each box is grown by ``margin`` times its size on every side, squared up
+    (faces moving sideways stay inside) and clipped to the frame; overlapping
+    crops are merged so a face is never searched, and reported, twice.
+
+    Args:
+        bboxes (np.ndarray): (N, 4) boxes as x1, y1, x2, y2.
+        frame_shape (tuple): Shape of the frame (height, width, ...).
+        margin (float): Growth per side as a fraction of the box size. Default: ``ROI_MARGIN``.
+
+    Returns:
+        np.ndarray: (M, 4) int32 crops as x1, y1, x2, y2, with M <= N.
+
+    """
+    height, width = frame_shape[:2]
+    regions = []
+    for x1, y1, x2, y2 in np.asarray(bboxes, dtype=np.float32)[:, :4]:
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        half = max(x2 - x1, y2 - y1) * (0.5 + margin)
+        regions.append([
+            max(0, int(cx - half)), max(0, int(cy - half)),
+            min(width, int(np.ceil(cx + half))), min(height, int(np.ceil(cy + half))),
+        ])
+
+    # Fusione delle regioni sovrapposte (poche regioni: il costo quadratico è irrilevante)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    regions[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return np.array([r for r in regions if r[2] > r[0] and r[3] > r[1]], dtype=np.int32).reshape(-1, 4)
+
+
+def region_crops(regions: np.ndarray | None, frame_shape: tuple) -> np.ndarray | None:
+    """Return the crops searched for ``regions``, or None when a full scan is cheaper.
+
+    Callers planning region detection use it to know whether ``analyze_frame``
+    will actually search the regions they pass.
+
+    Args:
+        regions (np.ndarray | None): (N, 4) boxes to search around.
+        frame_shape (tuple): Shape of the frame.
+
+    Returns:
+        np.ndarray | None: Crops from ``expand_regions``, or None without regions or
+            when the crops cover at least half of the frame.
+
+    """
+    if regions is None or len(regions) == 0:
+        return None
+    rois = expand_regions(regions, frame_shape)
+    area = np.sum((rois[:, 2] - rois[:, 0]) * (rois[:, 3] - rois[:, 1]))
+    # Regioni troppo estese: la scansione completa costa meno
+    if area >= 0.5 * frame_shape[0] * frame_shape[1]:
+        return None
+    return rois
+
+
+def _value(member) -> str:
+    """Return the value of an enum member, or the member itself if it is a string."""
+    return getattr(member, "value", member)
+
+
+class GalleryPartition:
+    """Subset of the gallery with its own search index.
+
+    Searching a partition only scans its rows, unlike a FAISS ``IDSelector`` on
+    the full flat index, which still visits every row.
+
+    Attributes:
+        roles (frozenset[str]): Roles selected; empty selects any role.
+        relationships (frozenset[str]): Relationships selected; empty selects any.
+        rows (np.ndarray): int64 rows of the full ``feature_matrix``, ascending.
+        matrix (np.ndarray | None): Normalized embeddings of ``rows``, None if empty.
+        index: FAISS index over ``matrix`` (None without FAISS or when empty).
+
+    """
+
+    __slots__ = ("roles", "relationships", "rows", "matrix", "index")
+
+    def __init__(self, roles: frozenset, relationships: frozenset, rows: np.ndarray, feature_matrix: np.ndarray):
+        """Initialize GalleryPartition.
+
+        Args:
+            roles (frozenset[str]): Roles selected.
+            relationships (frozenset[str]): Relationships selected.
+            rows (np.ndarray): Rows of the full feature matrix in the partition.
+            feature_matrix (np.ndarray): Normalized full feature matrix.
+
+        """
+        self.roles = roles
+        self.relationships = relationships
+        self.rows = rows
+        self.matrix = np.ascontiguousarray(feature_matrix[rows], dtype=np.float32) if len(rows) else None
+        self.index = None
+        faiss = _faiss()
+        if faiss is not None and self.matrix is not None:
+            self.index = faiss.IndexFlatIP(self.matrix.shape[1])
+            self.index.add(self.matrix)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
 class FaceEngine:
     """Face recognition engine using InsightFace and FAISS for similarity search.
 
@@ -50,24 +187,70 @@ class FaceEngine:
 
     Attributes:
         feature_matrix (np.ndarray | None): Normalized matrix of face embeddings.
-        user_map (list[Person]): List of Person objects corresponding to embeddings.
+        people (list[GalleryPerson]): One compact record per person in the gallery.
+        person_rows (np.ndarray): int32 index into ``people`` of each row of
+            ``feature_matrix``.
         index: FAISS index for fast similarity search (optional).
         app: InsightFace FaceAnalysis model instance.
+        model_name (str): InsightFace model pack of ``app``; the gallery embeddings
+            must come from the same pack.
+
+    The gallery can be searched restricted to people of some roles or
+    relationships through the partitions returned by ``partition``.
 
     """
 
-    def __init__(self, people : list):
+    def __init__(self, people : list | Gallery, load_model: bool = True, model_name: str = MODEL, enable_gpu: bool = False):
         """Initialize FaceEngine with person data.
 
         Args:
-            people (list): List of Person objects with face encodings to initialize the engine.
+            people (list | Gallery): List of Person objects with face encodings, or a
+                gallery loaded by ``Database.load_gallery``, to initialize the engine.
+            load_model (bool): Load the InsightFace models. When False only the gallery
+                and the search index are built, so the engine can ``identify`` embeddings
+                but not analyze frames (benchmarks, offline tooling). Default: True.
+            model_name (str): InsightFace model pack to load. Default: ``MODEL``.
+            enable_gpu (bool): Attempt FAISS GPU acceleration when ``load_model`` is
+                False; with the models, it follows the CUDA execution provider. Default: False.
 
         """
+        self.model_name = model_name
+        self.using_cuda = enable_gpu
         self.feature_matrix : np.ndarray | None = None
-        self.user_map: list[Person] = []
+        self.people: list[GalleryPerson] = []
+        self.person_rows = np.empty(0, dtype=np.int32)
         self.index = None
-        self.app = self._initialize_model(people)
+        # Partizioni della galleria create su richiesta, per (ruoli, relazioni)
+        self._partitions: dict[tuple, GalleryPartition] = {}
+        self.app = None
+        self.det_model = None
+        self.rec_model = None
+        if load_model:
+            self.app = self._initialize_model(people)
+            self.det_model = self.app.det_model
+            self.rec_model = self.app.models.get("recognition")
+        else:
+            self._build_gallery(people, self.using_cuda)
+
+
+    def with_gallery(self, people: list | Gallery) -> "FaceEngine":
+        """Return a new engine sharing this engine's models with another gallery.
+
+        The models are not loaded again, so a rebuilt gallery can be installed
+        in place of the serving engine with a single assignment. The search
+        index stays on the GPU if this engine's is.
+
+        Args:
+            people (list | Gallery): People or gallery of the new engine, with
+                embeddings from ``model_name``.
+
+        Returns:
+            FaceEngine: The new engine.
 
+        """
+        engine = FaceEngine(people, load_model=False, model_name=self.model_name, enable_gpu=self.using_cuda)
+        engine.app, engine.det_model, engine.rec_model = self.app, self.det_model, self.rec_model
+        return engine
 
     def _initialize_faiss_index(self, enable_gpu=False):
         """Initialize FAISS index for fast similarity search.
@@ -79,7 +262,8 @@ class FaceEngine:
             enable_gpu (bool): Whether to attempt GPU acceleration. Default: False.
 
         """
-        if not FAISS_AVAILABLE or self.feature_matrix is None:
+        faiss = _faiss()
+        if faiss is None or self.feature_matrix is None:
             return
 
         d = self.feature_matrix.shape[1]
@@ -88,7 +272,7 @@ class FaceEngine:
         cpu_index.add(self.feature_matrix.astype(np.float32))
 
         # Tentativo passaggio a GPU (solo se richiesto e disponibile)
-        if enable_gpu and FAISS_GPU_AVAILABLE:
+        if enable_gpu and faiss_gpu_available():
             try:
                 # Risorse GPU standard (necessarie per FAISS GPU)
                 self.gpu_resources = faiss.StandardGpuResources()
@@ -104,12 +288,12 @@ class FaceEngine:
             mode = "CPU (Forzata)" if not enable_gpu else "CPU (GPU non disp.)"
             logger.info(f"FAISS: Indice creato su {mode}")
         
-    def _initialize_model(self, people):
+    def _initialize_model(self, people) -> "FaceAnalysis":
         """Initialize InsightFace model and build feature matrix from people data.
 
         Selects best available execution provider (CUDA, CoreML, DML, or CPU),
-        initializes the face analysis model, and builds normalized feature matrix
-        from person encodings. Initializes FAISS index if embeddings are available.
+        initializes the face analysis model, and builds the gallery with
+        ``_build_gallery``.
 
         Args:
             people (list): List of Person objects with encodings.
@@ -119,9 +303,12 @@ class FaceEngine:
 
         Raises:
             SystemExit: If model initialization fails.
-            ValueError: If feature matrix and user_map dimensions don't match.
+            ValueError: If feature matrix and person_rows dimensions don't match.
 
         """
+        import onnxruntime as ort
+        from insightface.app import FaceAnalysis
+
         available_providers = ort.get_available_providers()
         providers_list = []
         
@@ -138,20 +325,53 @@ class FaceEngine:
         providers_list.append('CPUExecutionProvider')
         
         try:
-            model = FaceAnalysis(name=MODEL, providers=providers_list)
+            # Solo detection e recognition: landmark 3D/2D e genderage non sono usati
+            model = FaceAnalysis(name=self.model_name, providers=providers_list, allowed_modules=["detection", "recognition"])
             model.prepare(ctx_id=0, det_size=(DETECTION_SIZE, DETECTION_SIZE))
         except Exception as e:
             logger.critical(f"Impossibile avviare il modello: {e}")
             sys.exit(1)
 
+        self.using_cuda = using_cuda
+        self._build_gallery(people, using_cuda)
+        return model
+
+    def _build_gallery(self, people, enable_gpu=False):
+        """Build the normalized feature matrix and search index from people data.
+
+        The engine keeps no reference to the given ``Person`` objects: each
+        person with at least one valid embedding becomes a ``GalleryPerson``
+        record in ``people`` and each embedding row points to it through
+        ``person_rows``, so the encodings (lists of Python floats) are freed
+        with the input list.
+
+        A ``Gallery`` is used as is: its matrix and person arrays are already built.
+
+        Args:
+            people (list | Gallery): List of Person objects with encodings, or a gallery.
+            enable_gpu (bool): Whether to attempt FAISS GPU acceleration. Default: False.
+
+        Raises:
+            ValueError: If feature matrix and person_rows dimensions don't match.
+
+        """
+        self._partitions = {}
+        if isinstance(people, Gallery):
+            self.people = people.people
+            self.person_rows = people.person_rows
+            self._set_matrix(people.matrix, enable_gpu)
+            return
+
         all_embeddings = []
-        self.user_map = []
+        row_people = []
+        self.people = []
         embedding_dimension = None
         
         for person in people:
             if person.encoding is None or not person.encoding:
                 continue
-            
+
+            person_index = None
             for hash, vector in person.encoding.items():
                 try:
                     if vector is None or not isinstance(vector, (list, np.ndarray)) or len(vector) == 0:
@@ -171,36 +391,167 @@ class FaceEngine:
                         logger.error(f"Embedding con valori NaN/Inf per {person.name} {person.surname} (hash: {hash})")
                         continue
                     
+                    if person_index is None:
+                        person_index = len(self.people)
+                        self.people.append(GalleryPerson.from_person(person))
                     all_embeddings.append(np_vector)
-                    self.user_map.append(person)
+                    row_people.append(person_index)
                 except Exception as e:
                     logger.error(f"Errore nel processare encoding per {person.name} {person.surname} (hash: {hash}): {e}")
                     continue
 
-        if len(all_embeddings) > 0:
-            self.feature_matrix = np.vstack(all_embeddings)
-            if len(self.user_map) != self.feature_matrix.shape[0]:
-                logger.error(f"ERRORE CRITICO: Dimensione user_map ({len(self.user_map)}) non corrisponde a feature_matrix ({self.feature_matrix.shape[0]})")
-                raise ValueError("Inconsistenza tra user_map e feature_matrix")
+        self.person_rows = np.array(row_people, dtype=np.int32)
+        matrix = np.vstack(all_embeddings) if all_embeddings else None
+        del all_embeddings
+        self._set_matrix(matrix, enable_gpu)
+
+    def _set_matrix(self, matrix: np.ndarray | None, enable_gpu: bool = False):
+        """Normalize the embedding matrix in place and build the search index.
+
+        Args:
+            matrix (np.ndarray | None): float32 (N, D) embeddings matching ``person_rows``.
+            enable_gpu (bool): Whether to attempt FAISS GPU acceleration. Default: False.
+
+        Raises:
+            ValueError: If feature matrix and person_rows dimensions don't match.
+
+        """
+        self.feature_matrix = matrix
+        if matrix is not None and len(matrix) > 0:
+            if len(self.person_rows) != self.feature_matrix.shape[0]:
+                logger.error(f"ERRORE CRITICO: Dimensione person_rows ({len(self.person_rows)}) non corrisponde a feature_matrix ({self.feature_matrix.shape[0]})")
+                raise ValueError("Inconsistenza tra person_rows e feature_matrix")
             if np.any(np.isnan(self.feature_matrix)) or np.any(np.isinf(self.feature_matrix)):
                 logger.error("feature_matrix contiene valori NaN o Inf!")
             
             # Pre-normalizza la feature_matrix una volta sola (ottimizzazione prestazioni)
             feature_norms = np.linalg.norm(self.feature_matrix, axis=1, keepdims=True)
             feature_norms[feature_norms == 0] = 1.0
-            self.feature_matrix = self.feature_matrix / feature_norms
-            logger.info(f"feature_matrix pre-normalizzata: {self.feature_matrix.shape[0]} embeddings")
-            self._initialize_faiss_index(using_cuda)
+            self.feature_matrix /= feature_norms
+            logger.info(f"feature_matrix pre-normalizzata: {self.feature_matrix.shape[0]} embeddings di {len(self.people)} persone")
+            self._initialize_faiss_index(enable_gpu)
         else:
             self.feature_matrix = None
             logger.warning("Database vuoto: nessun encoding trovato.")
-        return model
 
-    def analyze_frame(self, frame_bgr: np.ndarray) -> list:
+    def warm_up(
+        self,
+        det_sizes: tuple = (DETECTION_SIZE,),
+        batch_sizes: tuple = (1, 4),
+        frame_shape: tuple = (480, 640, 3),
+        runs: int = 2,
+    ) -> float:
+        """Run inferences on a dummy frame so the first real frame is not slower.
+
+        The first runs of an ONNX Runtime session for a given input shape
+        allocate its memory arena and, on GPU, select and compile kernels: each
+        detection input size and recognition batch size used in production is
+        therefore run ``runs`` times, followed by a gallery search to load the
+        FAISS/BLAS code paths.
+
+        Args:
+            det_sizes (tuple): Detection input sizes to run. Default: (``DETECTION_SIZE``,).
+            batch_sizes (tuple): Numbers of faces per ArcFace call. Default: (1, 4).
+            frame_shape (tuple): Shape of the dummy frame. Default: (480, 640, 3).
+            runs (int): Repetitions of every inference. Default: 2.
+
+        Returns:
+            float: Seconds spent.
+
+        """
+        start = time.perf_counter()
+        rng = np.random.default_rng(0)
+        frame = rng.integers(0, 256, frame_shape, dtype=np.uint8)
+        for _ in range(runs):
+            if self.det_model is not None:
+                for size in det_sizes:
+                    self.det_model.detect(frame, input_size=(size, size), max_num=0, metric='default')
+            if self.rec_model is not None:
+                size = self.rec_model.input_size[0]
+                for batch in batch_sizes:
+                    crops = buffer_pool.get("crops", (batch, size, size, 3))
+                    crops[:] = frame[:size, :size]
+                    self.rec_model.get_feat(list(crops))
+            if self.feature_matrix is not None:
+                self.identify(rng.standard_normal((max(batch_sizes), self.feature_matrix.shape[1]), dtype=np.float32))
+        elapsed = time.perf_counter() - start
+        logger.info(f"Warm-up completato in {elapsed * 1000:.0f} ms (det_size {list(det_sizes)}, batch {list(batch_sizes)})")
+        return elapsed
+
+    def partition(self, roles=None, relationships=None) -> GalleryPartition | None:
+        """Return the part of the gallery with the given roles and relationships.
+
+        Values of the same field are alternatives, the two fields must both
+        match: ``partition(roles=["guest"], relationships=["madre", "padre"])``
+        selects the guests who are mother or father. Partitions are built on first
+        use and cached until the gallery is rebuilt.
+
+        Args:
+            roles (Iterable[RoleType | str] | None): Roles to keep. Default: None (any).
+            relationships (Iterable[RelationshipType | str] | None): Relationships to
+                keep. Default: None (any).
+
+        Returns:
+            GalleryPartition | None: The partition, or None when no filter is given
+                (search the whole gallery).
+
+        """
+        roles = frozenset(_value(role) for role in roles or ())
+        relationships = frozenset(_value(rel) for rel in relationships or ())
+        if not roles and not relationships:
+            return None
+        key = (roles, relationships)
+        partition = self._partitions.get(key)
+        if partition is None:
+            # Filtro sulle persone (poche), poi esteso alle righe tramite person_rows
+            selected = np.array(
+                [
+                    (not roles or _value(person.role) in roles)
+                    and (not relationships or _value(person.relationship) in relationships)
+                    for person in self.people
+                ],
+                dtype=bool,
+            )
+            rows = np.flatnonzero(selected[self.person_rows]) if len(selected) else np.empty(0, dtype=np.int64)
+            if self.feature_matrix is None:
+                rows = rows[:0]
+            # Costruzioni concorrenti della stessa partizione sono innocue: vince l'ultima
+            partition = self._partitions[key] = GalleryPartition(roles, relationships, rows, self.feature_matrix)
+            logger.info(f"Partizione galleria {sorted(roles)} {sorted(relationships)}: {len(rows)} embeddings")
+        return partition
+
+    def analyze_frame(
+        self,
+        frame_bgr: np.ndarray,
+        det_size: int | None = None,
+        recognize: bool = True,
+        regions: np.ndarray | None = None,
+        quality: QualityGate | None = None,
+    ) -> list:
         """Detect and extract face embeddings from a BGR frame.
 
+        Runs SCRFD detection, aligns every face into a pooled crop buffer and
+        extracts all embeddings with a single batched ArcFace call.
+
+        With ``regions`` (the boxes of the faces found in the previous frame)
+        SCRFD runs only on crops around them (see ``expand_regions``) at a small
+        input size and the results are mapped back to frame coordinates. Faces
+        outside the crops are not found: callers must still run a full scan
+        periodically (see ``services.tracking.RegionPlanner``). When the crops
+        cover most of the frame a full scan is run instead (see ``region_crops``).
+
         Args:
             frame_bgr (np.ndarray): Input image frame in BGR format.
+            det_size (int | None): Detection input size, smaller is faster but misses
+                small faces. Default: None (``DETECTION_SIZE``, or ``ROI_DETECTION_SIZE``
+                with ``regions``).
+            recognize (bool): Extract embeddings. When False faces are returned with
+                bounding boxes and landmarks only. Default: True.
+            regions (np.ndarray | None): (N, 4) boxes to search around. Default: None
+                (whole frame).
+            quality (QualityGate | None): Quality check run before recognition; faces
+                that fail it are returned with their ``quality`` annotation and no
+                embedding. Default: None (every face is recognized).
 
         Returns:
             list: List of Face objects with detected faces and embeddings.
@@ -209,41 +560,270 @@ class FaceEngine:
         """
         if frame_bgr is None:
             return []
-        
-        faces = self.app.get(frame_bgr)
+        if self.det_model is None:
+            logger.error("analyze_frame chiamato su un FaceEngine senza modelli (load_model=False)")
+            return []
+
+        rois = region_crops(regions, frame_bgr.shape)
+        if rois is not None:
+            bboxes, kpss = self._detect_regions(frame_bgr, rois, det_size or ROI_DETECTION_SIZE)
+        else:
+            input_size = (det_size, det_size) if det_size else None
+            bboxes, kpss = self.det_model.detect(frame_bgr, input_size=input_size, max_num=0, metric='default')
+        if bboxes.shape[0] == 0:
+            return []
+
+        from insightface.app.common import Face
+        faces = []
+        for i in range(bboxes.shape[0]):
+            kps = kpss[i] if kpss is not None else None
+            faces.append(Face(bbox=bboxes[i, 0:4], kps=kps, det_score=bboxes[i, 4]))
+
+        if not recognize:
+            return faces
+        return self.embed_faces(frame_bgr, faces, quality=quality)
+
+    def embed_faces(self, frame_bgr: np.ndarray, faces: list, quality: QualityGate | None = None) -> list:
+        """Extract the embeddings of already detected faces.
+
+        Aligns every face into a pooled crop buffer and runs a single batched
+        ArcFace call. Used by ``analyze_frame`` and by callers that detect first
+        and recognize only some of the faces (e.g. tracks without a confident
+        identity).
+
+        Args:
+            frame_bgr (np.ndarray): Frame the faces were detected in.
+            faces (list): Face objects with landmarks; ``embedding`` is set in place.
+            quality (QualityGate | None): Quality check run first; faces that fail it
+                keep no embedding. Default: None.
+
+        Returns:
+            list: The same faces.
+
+        """
+        if self.rec_model is None or not faces or any(face.kps is None for face in faces):
+            return faces
+
+        # I volti di bassa qualità non passano dal modello di riconoscimento
+        targets = faces
+        if quality is not None:
+            targets = [face for face, ok in zip(faces, quality.check(frame_bgr, faces)) if ok]
+            if not targets:
+                return faces
+
+        import cv2
+        from insightface.utils import face_align
+
+        # Allineamento nei buffer riutilizzabili + una sola inferenza ArcFace per tutti i volti
+        size = self.rec_model.input_size[0]
+        crops = buffer_pool.get("crops", (len(targets), size, size, 3))
+        for i, face in enumerate(targets):
+            M = face_align.estimate_norm(face.kps, image_size=size)
+            cv2.warpAffine(frame_bgr, M, (size, size), dst=crops[i], borderValue=0.0)
+
+        embeddings = self.rec_model.get_feat(list(crops))
+        for face, embedding in zip(targets, embeddings):
+            face.embedding = embedding
         return faces
+
+    def _detect_regions(self, frame_bgr: np.ndarray, rois: np.ndarray, det_size: int) -> tuple:
+        """Run SCRFD on each crop and map boxes and landmarks back to the frame.
+
+        Args:
+            frame_bgr (np.ndarray): Input image frame in BGR format.
+            rois (np.ndarray): (M, 4) int crops as x1, y1, x2, y2.
+            det_size (int): Detection input size for every crop.
+
+        Returns:
+            tuple: (bboxes, kpss) as returned by ``det_model.detect``.
+
+        """
+        all_bboxes, all_kpss = [], []
+        for x1, y1, x2, y2 in rois:
+            # Il ritaglio è una vista: SCRFD lo ridimensiona senza copiarlo prima
+            bboxes, kpss = self.det_model.detect(
+                frame_bgr[y1:y2, x1:x2], input_size=(det_size, det_size), max_num=0, metric='default'
+            )
+            if bboxes.shape[0] == 0:
+                continue
+            bboxes[:, [0, 2]] += x1
+            bboxes[:, [1, 3]] += y1
+            all_bboxes.append(bboxes)
+            if kpss is not None:
+                kpss[:, :, 0] += x1
+                kpss[:, :, 1] += y1
+                all_kpss.append(kpss)
+
+        if not all_bboxes:
+            return np.empty((0, 5), dtype=np.float32), None
+        kpss = np.concatenate(all_kpss) if len(all_kpss) == len(all_bboxes) else None
+        return np.concatenate(all_bboxes), kpss
     
-    def analyze_img(self, path: str | os.PathLike) -> dict | None:
+    def analyze_img(
+        self, path: str | os.PathLike, quality: QualityGate | None = None, store: ImageStore | None = None
+    ) -> dict | None:
         """Analyze an image file and extract face embedding.
 
-        Validates and normalizes the image, detects faces, and extracts
-        embedding from the largest detected face.
+        Decodes the image, detects faces, and extracts embedding from the
+        largest detected face. When a face is found the image is added to the
+        image store under its hash, with the aligned face crop; the file at
+        ``path`` is left in place.
 
         Args:
             path: Path to image file (Path object or string).
+            quality (QualityGate | None): Quality check the largest face must pass.
+                Default: None.
+            store (ImageStore | None): Store receiving the photo. Default: None
+                (``utils.imgstore.image_store``).
 
         Returns:
             dict | None: Dictionary mapping image hash to embedding list, or None if
                 no valid face detected.
 
+        Raises:
+            LowQualityFace: If the largest face fails the quality check.
+
         """
-        pic = img.ImgValidation(path, delete=True)
+        store = store or image_store
+        pic = store.open(path)
 
-        if pic.path is None:
+        if pic is None:
             return None
-        
-        face = self.analyze_frame(cv2.imread(pic.path))
+
+        frame = pic.frame
+        face = self.analyze_frame(frame)
 
         if len(face) == 0:
             return None
         
         # Seleziona il volto più grande in caso di più volti
         primary_face = max(face, key=lambda x: (x.bbox[2]-x.bbox[0]) * (x.bbox[3]-x.bbox[1]))
+        # Niente ripiego su un volto più piccolo: potrebbe essere un'altra persona
+        if quality is not None and not quality.check(frame, [primary_face])[0]:
+            raise LowQualityFace(describe(primary_face.quality["issues"]))
         embedding_list = primary_face.embedding.tolist()
 
+        try:
+            store.save(pic, self.align_face(frame, primary_face) if store.faces else None)
+        except OSError as e:
+            logger.error(f"Foto {pic.hash} non salvata nell'archivio immagini: {e}")
+
         return {pic.hash : embedding_list}
+
+    def align_face(self, frame_bgr: np.ndarray, face) -> np.ndarray:
+        """Return the aligned crop of a face, as fed to the recognition model.
+
+        Args:
+            frame_bgr (np.ndarray): Frame the face was detected in.
+            face: Face object with landmarks.
+
+        Returns:
+            np.ndarray: BGR crop of the recognition input size (112x112 for ArcFace).
+
+        """
+        import cv2
+        from insightface.utils import face_align
+
+        size = self.rec_model.input_size[0] if self.rec_model is not None else 112
+        M = face_align.estimate_norm(face.kps, image_size=size)
+        return cv2.warpAffine(frame_bgr, M, (size, size), borderValue=0.0)
+
+    def embed_aligned(self, crops: list[np.ndarray]) -> list[np.ndarray | None]:
+        """Extract the embeddings of already aligned face crops, in one batch.
+
+        Used with the crops kept by the image store (see ``align_face``), which
+        skips decoding the originals and detecting the faces again.
+
+        Args:
+            crops (list[np.ndarray]): BGR crops.
+
+        Returns:
+            list[np.ndarray | None]: The embedding of each crop; None for crops whose
+                size differs from the recognition input size of this model.
+
+        """
+        embeddings: list[np.ndarray | None] = [None] * len(crops)
+        if self.rec_model is None:
+            return embeddings
+        size = self.rec_model.input_size[0]
+        usable = [i for i, crop in enumerate(crops) if crop is not None and crop.shape[:2] == (size, size)]
+        if usable:
+            for i, embedding in zip(usable, self.rec_model.get_feat([crops[i] for i in usable])):
+                embeddings[i] = embedding
+        return embeddings
     
-    def identify(self, target_data: np.ndarray | list[np.ndarray], threshold: float = 0.5) -> list[tuple[Optional[Person], float]]:
+    def embed_images(self, frames: list[np.ndarray]) -> list[np.ndarray | None]:
+        """Extract the embedding of the largest face of each image, in one batch.
+
+        Faces are detected image by image, then all the aligned crops go
+        through a single batched ArcFace call. Used to re-embed stored source
+        images with a new model (see ``services.reembed``).
+
+        Args:
+            frames (list[np.ndarray]): BGR images; None entries are skipped.
+
+        Returns:
+            list[np.ndarray | None]: The embedding of each image, None when no face was found.
+
+        """
+        embeddings: list[np.ndarray | None] = [None] * len(frames)
+        targets = []
+        for i, frame in enumerate(frames):
+            if frame is None:
+                continue
+            faces = self.analyze_frame(frame, recognize=False)
+            if faces and faces[0].kps is not None:
+                # Stesso criterio di analyze_img: il volto più grande
+                targets.append((i, max(faces, key=lambda x: (x.bbox[2]-x.bbox[0]) * (x.bbox[3]-x.bbox[1]))))
+        if self.rec_model is None or not targets:
+            return embeddings
+
+        import cv2
+        from insightface.utils import face_align
+
+        size = self.rec_model.input_size[0]
+        crops = buffer_pool.get("embed_crops", (len(targets), size, size, 3))
+        for row, (i, face) in enumerate(targets):
+            M = face_align.estimate_norm(face.kps, image_size=size)
+            cv2.warpAffine(frames[i], M, (size, size), dst=crops[row], borderValue=0.0)
+
+        for (i, _), embedding in zip(targets, self.rec_model.get_feat(list(crops))):
+            embeddings[i] = embedding
+        return embeddings
+
+    def identify_faces(
+        self, faces: list, threshold: float = 0.5, partition: GalleryPartition | None = None
+    ) -> list[tuple[Optional[GalleryPerson], float]]:
+        """Identify detected faces, skipping those without an embedding.
+
+        Faces are left without embedding by ``analyze_frame`` when they fail the
+        quality check or recognition was disabled.
+
+        Args:
+            faces (list): Face objects returned by ``analyze_frame``.
+            threshold (float): Minimum similarity score. Default: 0.5.
+            partition (GalleryPartition | None): Search only this part of the
+                gallery. Default: None (whole gallery).
+
+        Returns:
+            list[tuple[Optional[GalleryPerson], float]]: (GalleryPerson, score) for each face, in
+                order; (None, 0.0) for faces without embedding.
+
+        """
+        results: list[tuple[Optional[GalleryPerson], float]] = [(None, 0.0)] * len(faces)
+        indexes = [i for i, face in enumerate(faces) if face.embedding is not None]
+        if indexes:
+            identities = self.identify([faces[i].embedding for i in indexes], threshold=threshold, partition=partition)
+            for i, identity in zip(indexes, identities):
+                results[i] = identity
+        return results
+
+    def identify(
+        self,
+        target_data: np.ndarray | list[np.ndarray],
+        threshold: float = 0.5,
+        partition: GalleryPartition | None = None,
+    ) -> list[tuple[Optional[GalleryPerson], float]]:
         """Identify persons from face embeddings using similarity search.
 
         Uses FAISS index (if available) or numpy dot product to find the most
@@ -253,9 +833,11 @@ class FaceEngine:
             target_data: Single embedding (np.ndarray) or list of embeddings to identify.
             threshold (float): Minimum similarity score (0.0-1.0) to consider a match.
                 Default: 0.5.
+            partition (GalleryPartition | None): Search only this part of the gallery
+                (see ``partition``). Default: None (whole gallery).
 
         Returns:
-            list[tuple[Optional[Person], float]]: List of tuples (Person, score) for each input embedding.
+            list[tuple[Optional[GalleryPerson], float]]: List of tuples (GalleryPerson, score) for each input embedding.
                 Returns (None, score) if no match above threshold found.
 
         """
@@ -265,40 +847,58 @@ class FaceEngine:
             n_items = len(target_data) if isinstance(target_data, list) else 1
             return [(None, 0.0)] * n_items
 
-        # Preparazione Input (Matrice N x D)
+        matrix, index = self.feature_matrix, getattr(self, 'index', None)
+        if partition is not None:
+            matrix, index = partition.matrix, partition.index
+
+        # Preparazione Input (Matrice N x D) nei buffer riutilizzabili del worker
         if isinstance(target_data, list) and len(target_data) > 0 and isinstance(target_data[0], np.ndarray):
-            input_matrix = np.stack(target_data)
+            rows = target_data
         else:
-            input_matrix = np.array(target_data, dtype=np.float32)
-        
-        if input_matrix.ndim == 1:
-            input_matrix = input_matrix.reshape(1, -1)
+            rows = np.asarray(target_data, dtype=np.float32)
+            if rows.ndim == 1:
+                rows = rows.reshape(1, -1)
 
+        n_items, d = len(rows), self.feature_matrix.shape[1]
+        # Partizione vuota: nessuno da confrontare
+        if matrix is None:
+            return [(None, 0.0)] * n_items
         # Importante: FAISS vuole float32
-        input_matrix = input_matrix.astype(np.float32)
-
-        # Normalizzazione L2
-        norms = np.linalg.norm(input_matrix, axis=1, keepdims=True)
+        normalized_matrix = buffer_pool.get("query", (n_items, d), np.float32)
+        for i, row in enumerate(rows):
+            normalized_matrix[i] = np.ravel(row)
+
+        # Normalizzazione L2 (in place)
+        norms = buffer_pool.get("norms", (n_items,), np.float32)
+        np.einsum("ij,ij->i", normalized_matrix, normalized_matrix, out=norms)
+        np.sqrt(norms, out=norms)
         norms[norms == 0] = 1e-10
-        normalized_matrix = input_matrix / norms
+        np.divide(normalized_matrix, norms[:, None], out=normalized_matrix)
 
         # --- FAISS vs NUMPY ---
         best_indices = None
         best_scores = None
 
-        # Controllo se self.index esiste (creato da _initialize_faiss_index)
-        if getattr(self, 'index', None) is not None:
+        # Controllo se l'indice esiste (creato da _initialize_faiss_index o dalla partizione)
+        if index is not None:
             # k=1 significa "trova solo il più simile"
-            scores, indices = self.index.search(normalized_matrix, k=1)
+            scores = buffer_pool.get("scores", (n_items, 1), np.float32)
+            indices = buffer_pool.get("indices", (n_items, 1), np.int64)
+            index.search(normalized_matrix, 1, D=scores, I=indices)
             
             # Appiattiamo i risultati (da matrice Nx1 a vettori N)
-            best_scores = scores.flatten()
-            best_indices = indices.flatten()
+            best_scores = scores[:, 0]
+            best_indices = indices[:, 0]
         else:
             # PERCORSO NUMPY
-            all_scores = np.dot(normalized_matrix, self.feature_matrix.T)
+            all_scores = buffer_pool.get("scores", (n_items, matrix.shape[0]), np.float32)
+            np.dot(normalized_matrix, matrix.T, out=all_scores)
             best_indices = np.argmax(all_scores, axis=1)
-            best_scores = np.max(all_scores, axis=1)
+            best_scores = all_scores[np.arange(n_items), best_indices]
+
+        # Righe della partizione -> righe della galleria completa
+        if partition is not None:
+            best_indices = partition.rows[best_indices]
 
         # Formattazione Risultati
         results = []
@@ -307,10 +907,10 @@ class FaceEngine:
             score = float(score) # Cast a float nativo Python
 
             if score > threshold:
-                if idx < len(self.user_map):
-                    results.append((self.user_map[idx], score))
+                if 0 <= idx < len(self.person_rows):
+                    results.append((self.people[self.person_rows[idx]], score))
                 else:
-                    logger.error(f"Index {idx} fuori range user_map")
+                    logger.error(f"Index {idx} fuori range person_rows")
                     results.append((None, score))
             else:
                 results.append((None, score))
@@ -0,0 +1,313 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+from services.database import Database
+from services.recognition import FaceEngine
+from utils.img import ImgValidation
+from utils.imgstore import ImageStore, image_store
+
+logger = logging.getLogger(__name__)
+
+# Passate di ri-estrazione + sostituzione: le successive alla prima recuperano
+# le persone registrate con il vecchio modello mentre il job era in corso
+MAX_ROUNDS = 3
+
+
+def index_images(folder: str, workers: int = 4) -> dict[str, str]:
+    """Map the hash of every PNG image of a folder to its path.
+
+    Hashes are the ones used as ``Person.encoding`` keys (see
+    ``ImgValidation.hash_img``) and are computed by ``workers`` threads. Used
+    for the photos enrolled before the image store, kept as PNG files in
+    ``LOG_IMGSFOLDER``.
+
+    Args:
+        folder (str): Image folder (``LOG_IMGSFOLDER``).
+        workers (int): Hashing threads. Default: 4.
+
+    Returns:
+        dict[str, str]: Image hash -> file path.
+
+    """
+    if not os.path.isdir(folder):
+        return {}
+    paths = [os.path.join(folder, name) for name in sorted(os.listdir(folder)) if name.lower().endswith(".png")]
+    with ThreadPoolExecutor(max(1, workers), thread_name_prefix="reembed-hash") as pool:
+        hashes = list(pool.map(ImgValidation.hash_img, paths))
+    return {key: path for key, path in zip(hashes, paths) if key is not None}
+
+
+class ReembedJob:
+    """Background re-embedding of the stored gallery with another model pack.
+
+    The job loads ``model``, then walks the people whose embeddings come from
+    another model (``Database.find_stale_encodings``) ``batch_size`` at a time:
+    their source images are read by ``workers`` threads, embedded in batches
+    of ``batch_size`` images on ``executor`` and written next to the
+    embeddings in use with one bulk write per step (``stage_encodings``).
+    Meanwhile the serving engine and its index are untouched.
+
+    Sources are looked up by image hash: the aligned face crop kept by the
+    image store, fed straight to the recognition model when its size matches;
+    otherwise the stored original, on which the face is detected again; for
+    photos enrolled before the store, the PNG files of ``image_folder``.
+
+    When no person is left, ``install`` runs the promotion under the engine
+    lock: the staged embeddings replace the old ones in the database, the
+    gallery of ``model`` is loaded into an engine sharing the new models and
+    that engine becomes the serving one, in a single assignment.
+
+    Everything written is kept when the job stops or fails: a new job for the
+    same model resumes from the people still missing. People with no source
+    image left, or no face found by the new model, stay on the old model and
+    are excluded from the new gallery; the promotion is skipped while there
+    are any unless ``force`` is set.
+
+    Attributes:
+        model (str): Target model pack.
+        state (str): "pending", "loading", "embedding", "indexing" (legacy images), "installing",
+            "done", "incomplete", "stopped" or "failed".
+        people_staged (int): People whose new embeddings were written.
+        people_failed (int): People that could not be re-embedded.
+        images_embedded (int): Source images embedded with the new model.
+        faces_reused (int): Images embedded from their stored face crop.
+        images_missing (int): Embeddings whose source image was not found.
+        faces_missing (int): Source images without a face for the new model.
+        promoted (int): People switched to the new model.
+        error (str | None): Last error.
+
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        model: str,
+        install: Callable[[Callable[[], FaceEngine]], FaceEngine],
+        image_folder: str,
+        store: Optional[ImageStore] = None,
+        executor: Optional[Executor] = None,
+        workers: int = 4,
+        batch_size: int = 32,
+        force: bool = False,
+    ):
+        """Initialize ReembedJob.
+
+        Args:
+            database (Database): Database of the gallery.
+            model (str): Target model pack.
+            install (Callable): Installs the engine built by its argument as the serving
+                one (see ``routers.route.install_engine``).
+            image_folder (str): Folder of the PNG images enrolled before the image store.
+            store (ImageStore | None): Image store. Default: None (``utils.imgstore.image_store``).
+            executor (Executor | None): Executor running the inferences, shut down with
+                the job; when None they run on the job thread. Default: None.
+            workers (int): Image reading threads. Default: 4.
+            batch_size (int): People per step and images per inference. Default: 32.
+            force (bool): Promote even if some people could not be re-embedded. Default: False.
+
+        """
+        self.database = database
+        self.model = model
+        self.install = install
+        self.image_folder = image_folder
+        self.store = store or image_store
+        self.executor = executor
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.force = force
+        self.state = "pending"
+        self.people_staged = 0
+        self.images_embedded = 0
+        self.faces_reused = 0
+        self.images_missing = 0
+        self.faces_missing = 0
+        self.promoted = 0
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._failed: set = set()
+        # Hash -> PNG di image_folder, calcolato solo se un'immagine manca dall'archivio
+        self._legacy: Optional[dict[str, str]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the job thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def people_failed(self) -> int:
+        """People that could not be re-embedded."""
+        return len(self._failed)
+
+    def start(self):
+        """Start the job thread."""
+        self._stop.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name=f"reembed-{self.model}", daemon=True)
+        self._thread.start()
+        logger.info(f"Ri-estrazione embeddings avviata: modello {self.model}")
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the job after the current step; what was written is kept.
+
+        Args:
+            timeout (float): Seconds to wait for the job thread. Default: 10.0.
+
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wait(self):
+        """Block until the job ends."""
+        if self._thread is not None:
+            self._thread.join()
+
+    def status(self) -> dict:
+        """Return counters and state of the job."""
+        end = self.finished_at or time.time()
+        return {
+            "model": self.model,
+            "state": self.state,
+            "running": self.running,
+            "force": self.force,
+            "people_staged": self.people_staged,
+            "people_failed": self.people_failed,
+            "images_embedded": self.images_embedded,
+            "faces_reused": self.faces_reused,
+            "images_missing": self.images_missing,
+            "faces_missing": self.faces_missing,
+            "promoted": self.promoted,
+            "elapsed_s": round(end - self.started_at, 1) if self.started_at else None,
+            "error": self.error,
+        }
+
+    def _run(self):
+        try:
+            self.state = "loading"
+            engine = self._load_engine()
+            for _ in range(MAX_ROUNDS):
+                self.state = "embedding"
+                self._sweep(engine)
+                if self._stop.is_set():
+                    self.state = "stopped"
+                    return
+                if self._failed and not self.force:
+                    logger.error(f"Ri-estrazione incompleta: {len(self._failed)} persone senza nuovi embeddings, galleria non sostituita")
+                    self.state = "incomplete"
+                    return
+
+                self.state = "installing"
+                self.install(lambda: self._promote(engine))
+                # Persone registrate con il vecchio modello prima della sostituzione
+                if not self.database.find_stale_encodings(self.model, limit=1, exclude=tuple(self._failed)):
+                    self.state = "done"
+                    logger.info(f"Ri-estrazione completata: {self.promoted} persone sul modello {self.model}")
+                    return
+            logger.warning(f"Ri-estrazione {self.model}: persone ancora sul vecchio modello dopo {MAX_ROUNDS} passate, rilanciare il job")
+            self.state = "incomplete"
+        except Exception as e:
+            logger.error(f"Ri-estrazione {self.model} fallita: {e}", exc_info=True)
+            self.error = str(e)
+            self.state = "failed"
+        finally:
+            self.finished_at = time.time()
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+
+    def _load_engine(self) -> FaceEngine:
+        """Load the models of the target pack, with an empty gallery."""
+        try:
+            return FaceEngine([], model_name=self.model)
+        except SystemExit:
+            # _initialize_model termina il processo se il modello non si carica: qui basta il job
+            raise RuntimeError(f"modello {self.model} non caricabile")
+
+    def _original(self, key: str) -> Optional[str]:
+        path = self.store.path(key)
+        if path is None:
+            if self._legacy is None:
+                self.state = "indexing"
+                self._legacy = index_images(self.image_folder, self.workers)
+                self.state = "embedding"
+            path = self._legacy.get(key)
+        return path
+
+    def _sweep(self, engine: FaceEngine):
+        """Stage new embeddings for every person still on another model."""
+        after = None
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="reembed-read") as pool:
+            while not self._stop.is_set():
+                docs = self.database.find_stale_encodings(self.model, after, self.batch_size, tuple(self._failed))
+                if not docs:
+                    return
+                after = docs[-1]["_id"]
+
+                faces, images = [], []
+                for index, doc in enumerate(docs):
+                    for key in doc.get("encoding_hashes", []):
+                        face = self.store.face_path(key)
+                        if face is not None:
+                            faces.append((index, key, face))
+                            continue
+                        path = self._original(key)
+                        if path is None:
+                            self.images_missing += 1
+                        else:
+                            images.append((index, key, path))
+
+                encodings: list[dict[str, np.ndarray]] = [{} for _ in docs]
+                # Lettura e decodifica in parallelo (cv2 rilascia il GIL)
+                crops = list(pool.map(cv2.imread, [path for _, _, path in faces]))
+                for (index, key, _), embedding in zip(faces, self._infer(engine.embed_aligned, crops)):
+                    if embedding is None:
+                        # Ritaglio di dimensione diversa dall'input del nuovo modello: si riparte dall'originale
+                        path = self._original(key)
+                        if path is None:
+                            self.images_missing += 1
+                        else:
+                            images.append((index, key, path))
+                        continue
+                    encodings[index][key] = embedding
+                    self.faces_reused += 1
+                    self.images_embedded += 1
+
+                frames = list(pool.map(cv2.imread, [path for _, _, path in images]))
+                for (index, key, _), embedding in zip(images, self._infer(engine.embed_images, frames)):
+                    if embedding is None:
+                        self.faces_missing += 1
+                        continue
+                    encodings[index][key] = embedding
+                    self.images_embedded += 1
+
+                ready = [index for index, vectors in enumerate(encodings) if vectors]
+                for index in set(range(len(docs))).difference(ready):
+                    self._failed.add(docs[index]["_id"])
+                    logger.warning(f"Persona {docs[index]['_id']} non ri-estratta: nessuna immagine sorgente con un volto")
+                results = self.database.stage_encodings([docs[i] for i in ready], [encodings[i] for i in ready], self.model)
+                self.people_staged += sum(result.ok for result in results)
+
+    def _infer(self, fn: Callable[[list], list], items: list) -> list:
+        """Run ``fn`` on ``items`` in chunks of ``batch_size``, on the executor if any."""
+        results = []
+        for start in range(0, len(items), self.batch_size):
+            chunk = items[start:start + self.batch_size]
+            if self.executor is None:
+                results.extend(fn(chunk))
+            else:
+                results.extend(self.executor.submit(fn, chunk).result())
+        return results
+
+    def _promote(self, engine: FaceEngine) -> FaceEngine:
+        """Promote the staged embeddings and build the new serving engine (under the engine lock)."""
+        self.promoted += self.database.promote_encodings(self.model)
+        return engine.with_gallery(self.database.load_gallery(model=self.model))
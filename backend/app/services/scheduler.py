@@ -0,0 +1,312 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from itertools import count
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Classi di priorità: valori più bassi vengono serviti prima
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+# Peso dell'ultima misura nelle medie mobili esponenziali
+EMA_ALPHA = 0.2
+
+
+class SchedulerBusy(RuntimeError):
+    """Raised when a job is rejected because the inference queue is too deep."""
+
+
+class _Job:
+    """A call waiting for an inference worker."""
+
+    __slots__ = ("fn", "args", "kwargs", "future", "degradable", "enqueued")
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict, degradable: bool):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.degradable = degradable
+        self.enqueued = time.perf_counter()
+
+
+class SchedulerClient(Executor):
+    """A connection (or other producer) submitting jobs to the scheduler.
+
+    Implements ``concurrent.futures.Executor``, so it can be passed to
+    ``loop.run_in_executor`` or used wherever an executor is expected.
+
+    Attributes:
+        name (str): Client name, for logs and status.
+        priority (int): Priority class (see ``PRIORITIES``).
+        weight (float): Share of the workers within its priority class.
+        admission (bool): Whether jobs may be rejected when the queue is too deep.
+        served (int): Jobs completed.
+        rejected (int): Jobs rejected by admission control.
+        degraded (int): Jobs run in degraded mode.
+        service_ms (float | None): Moving average of the job run time.
+        wait_ms (float | None): Moving average of the time jobs wait in the queue.
+
+    """
+
+    def __init__(self, scheduler: "InferenceScheduler", name: str, priority: int, weight: float, admission: bool):
+        """Initialize SchedulerClient (use ``InferenceScheduler.register``)."""
+        self._scheduler = scheduler
+        self.name = name
+        self.priority = priority
+        self.weight = max(weight, 1e-3)
+        self.admission = admission
+        self.pending: deque[_Job] = deque()
+        # Tempo virtuale per il weighted fair queuing
+        self.vtime = 0.0
+        self.served = 0
+        self.rejected = 0
+        self.degraded = 0
+        self.service_ms: Optional[float] = None
+        self.wait_ms: Optional[float] = None
+        self.last_submit = 0.0
+        self.closed = False
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        """Queue a call.
+
+        Returns:
+            Future: Result of the call.
+
+        Raises:
+            SchedulerBusy: If the job is rejected by admission control.
+
+        """
+        return self._scheduler._enqueue(self, _Job(fn, args, kwargs, degradable=False))
+
+    def submit_degradable(self, fn: Callable, /, *args, **kwargs) -> Future:
+        """Queue a call that accepts a ``degraded`` keyword argument.
+
+        The scheduler passes ``degraded=True`` when the queue is deeper than the
+        degradation threshold at the time the job starts.
+
+        Returns:
+            Future: Result of the call.
+
+        Raises:
+            SchedulerBusy: If the job is rejected by admission control.
+
+        """
+        return self._scheduler._enqueue(self, _Job(fn, args, kwargs, degradable=True))
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        """Unregister the client, cancelling its queued jobs."""
+        self._scheduler.unregister(self)
+
+    def status(self) -> dict:
+        """Return counters and timings of the client."""
+        return {
+            "name": self.name,
+            "priority": next(k for k, v in PRIORITIES.items() if v == self.priority),
+            "weight": self.weight,
+            "queued": len(self.pending),
+            "served": self.served,
+            "rejected": self.rejected,
+            "degraded": self.degraded,
+            "service_ms": round(self.service_ms, 2) if self.service_ms is not None else None,
+            "wait_ms": round(self.wait_ms, 2) if self.wait_ms is not None else None,
+        }
+
+
+class InferenceScheduler:
+    """Fair, priority-aware queue in front of the inference workers.
+
+    Replaces a plain FIFO executor so that no connection can starve the others:
+
+    - **Priority classes**: jobs of a higher class ("high" before "normal"
+      before "low") are always started first.
+    - **Weighted fair queuing** within a class: each client has a virtual time
+      that advances by the measured run time of its jobs divided by its
+      weight; the client with the lowest virtual time goes next. A client
+      sending large frames as fast as possible therefore gets the same share
+      of inference time as the others, not more. A client becoming active is
+      moved up to the current virtual time, so idling earns no credit.
+    - **Admission control**: when ``max_queue`` jobs are already queued, new jobs
+      from clients with admission control are rejected with ``SchedulerBusy``;
+      from ``degrade_queue`` queued jobs on, degradable jobs are started with
+      ``degraded=True``.
+
+    Attributes:
+        workers (int): Number of worker threads.
+        max_queue (int): Queued jobs above which new jobs are rejected.
+        degrade_queue (int): Queued jobs above which degradable jobs run degraded.
+
+    """
+
+    def __init__(self, workers: int = 1, max_queue: int = 16, degrade_queue: int = 8):
+        """Initialize InferenceScheduler.
+
+        Worker threads are started on the first submitted job.
+
+        Args:
+            workers (int): Number of worker threads. Default: 1.
+            max_queue (int): Queued jobs above which new jobs are rejected. Default: 16.
+            degrade_queue (int): Queued jobs above which degradable jobs run degraded. Default: 8.
+
+        """
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.degrade_queue = degrade_queue
+        self._clients: dict[int, SchedulerClient] = {}
+        self._ids = count()
+        self._depth = 0
+        self._vtime = 0.0
+        self._cond = threading.Condition()
+        self._threads: list[threading.Thread] = []
+
+    @property
+    def depth(self) -> int:
+        """Jobs currently queued (not yet started)."""
+        return self._depth
+
+    def register(self, name: str, priority: str = "normal", weight: float = 1.0, admission: bool = True) -> SchedulerClient:
+        """Register a new client.
+
+        Args:
+            name (str): Client name, for logs and status.
+            priority (str): "high", "normal" or "low". Default: "normal".
+            weight (float): Share of the workers within its priority class. Default: 1.0.
+            admission (bool): Whether jobs may be rejected when the queue is too deep.
+                Default: True.
+
+        Returns:
+            SchedulerClient: The client.
+
+        Raises:
+            ValueError: If the priority is unknown.
+
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Priorità non valida: {priority}. Valori accettati: {list(PRIORITIES)}")
+        client = SchedulerClient(self, name, PRIORITIES[priority], weight, admission)
+        with self._cond:
+            self._clients[next(self._ids)] = client
+        return client
+
+    def unregister(self, client: SchedulerClient):
+        """Remove a client and cancel its queued jobs."""
+        with self._cond:
+            client.closed = True
+            for key, registered in list(self._clients.items()):
+                if registered is client:
+                    del self._clients[key]
+            while client.pending:
+                client.pending.popleft().future.cancel()
+                self._depth -= 1
+
+    def _enqueue(self, client: SchedulerClient, job: _Job) -> Future:
+        with self._cond:
+            if client.closed:
+                raise RuntimeError(f"Client {client.name} non registrato")
+            if client.admission and self._depth >= self.max_queue:
+                client.rejected += 1
+                raise SchedulerBusy(f"Coda di inferenza piena ({self._depth} job)")
+            if not client.pending:
+                client.vtime = max(client.vtime, self._vtime)
+            client.pending.append(job)
+            client.last_submit = time.monotonic()
+            self._depth += 1
+            if not self._threads:
+                self._start()
+            self._cond.notify()
+        return job.future
+
+    def _start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"inference-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next(self) -> tuple[SchedulerClient, _Job, bool]:
+        """Wait for and pop the next job (called by workers)."""
+        with self._cond:
+            while self._depth == 0:
+                self._cond.wait()
+            client = min(
+                (c for c in self._clients.values() if c.pending),
+                key=lambda c: (c.priority, c.vtime),
+            )
+            degraded = client.pending[0].degradable and self._depth >= self.degrade_queue
+            job = client.pending.popleft()
+            self._depth -= 1
+            self._vtime = client.vtime
+            # Costo stimato anticipato, corretto a fine job: serve con più worker
+            client.vtime += (client.service_ms or 0.0) / client.weight
+            return client, job, degraded
+
+    def _worker(self):
+        while True:
+            client, job, degraded = self._next()
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            started = time.perf_counter()
+            try:
+                if degraded:
+                    result = job.fn(*job.args, degraded=True, **job.kwargs)
+                else:
+                    result = job.fn(*job.args, **job.kwargs)
+            except BaseException as e:
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(result)
+            finished = time.perf_counter()
+
+            service_ms = (finished - started) * 1000
+            wait_ms = (started - job.enqueued) * 1000
+            with self._cond:
+                estimate = client.service_ms or 0.0
+                client.vtime += (service_ms - estimate) / client.weight
+                client.service_ms = service_ms if client.service_ms is None else (
+                    (1 - EMA_ALPHA) * client.service_ms + EMA_ALPHA * service_ms
+                )
+                client.wait_ms = wait_ms if client.wait_ms is None else (
+                    (1 - EMA_ALPHA) * client.wait_ms + EMA_ALPHA * wait_ms
+                )
+                client.served += 1
+                if degraded:
+                    client.degraded += 1
+
+    def fair_interval_ms(self, client: SchedulerClient, utilization: float = 0.8, window: float = 2.0) -> Optional[float]:
+        """Interval between jobs at which a client uses no more than its fair share.
+
+        The workers offer ``workers * utilization`` seconds of inference per
+        second, split evenly among the clients that submitted a job in the last
+        ``window`` seconds. A client whose jobs take ``service_ms`` on average
+        stays within its share when it submits one job every
+        ``service_ms * active / (workers * utilization)`` milliseconds.
+
+        Args:
+            client (SchedulerClient): The client.
+            utilization (float): Target fraction of the worker time in use. Default: 0.8.
+            window (float): Seconds since the last job for a client to count as active.
+                Default: 2.0.
+
+        Returns:
+            float | None: Interval in ms, None until a job of the client has completed.
+
+        """
+        with self._cond:
+            if client.service_ms is None:
+                return None
+            now = time.monotonic()
+            active = sum(1 for c in self._clients.values() if now - c.last_submit <= window)
+            return client.service_ms * max(active, 1) / (self.workers * utilization)
+
+    def status(self) -> dict:
+        """Return queue depth, thresholds and per-client statistics."""
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "depth": self._depth,
+                "max_queue": self.max_queue,
+                "degrade_queue": self.degrade_queue,
+                "clients": [c.status() for c in self._clients.values()],
+            }
@@ -0,0 +1,346 @@
+import logging
+from collections import deque
+from itertools import count
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Compute the intersection over union of every pair of boxes.
+
+    Args:
+        a (np.ndarray): Boxes of shape (N, 4) as (left, top, right, bottom).
+        b (np.ndarray): Boxes of shape (M, 4) as (left, top, right, bottom).
+
+    Returns:
+        np.ndarray: float32 matrix of shape (N, M).
+
+    """
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    left = np.maximum(a[:, None, 0], b[None, :, 0])
+    top = np.maximum(a[:, None, 1], b[None, :, 1])
+    right = np.minimum(a[:, None, 2], b[None, :, 2])
+    bottom = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+class Track:
+    """A face followed across consecutive frames.
+
+    Attributes:
+        track_id (int): Identifier, unique within the tracker.
+        bbox (np.ndarray): Last bounding box (left, top, right, bottom).
+        hits (int): Frames in which the face was matched.
+        missed (int): Consecutive frames without a match.
+
+    """
+
+    __slots__ = ("track_id", "bbox", "hits", "missed")
+
+    def __init__(self, track_id: int, bbox: np.ndarray):
+        """Initialize Track.
+
+        Args:
+            track_id (int): Identifier.
+            bbox (np.ndarray): First bounding box.
+
+        """
+        self.track_id = track_id
+        self.bbox = np.asarray(bbox, dtype=np.float32)
+        self.hits = 1
+        self.missed = 0
+
+
+class FaceTracker:
+    """Greedy IoU tracker assigning stable identifiers to detected faces.
+
+    Each detection is matched to the live track with the highest overlap
+    above ``iou_threshold``; unmatched detections start new tracks and tracks
+    unmatched for more than ``max_missed`` frames are dropped. Detection runs
+    on every processed frame, so no motion model is needed.
+
+    Attributes:
+        iou_threshold (float): Minimum IoU to continue a track.
+        max_missed (int): Frames a track survives without a match.
+        tracks (list[Track]): Live tracks.
+
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_missed: int = 5):
+        """Initialize FaceTracker.
+
+        Args:
+            iou_threshold (float): Minimum IoU to continue a track. Default: 0.3.
+            max_missed (int): Frames a track survives without a match. Default: 5.
+
+        """
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.tracks: list[Track] = []
+        self._ids = count(1)
+
+    def update(self, bboxes: np.ndarray) -> list[Track]:
+        """Match the detections of a new frame to the live tracks.
+
+        Args:
+            bboxes (np.ndarray): Detected boxes of shape (N, 4).
+
+        Returns:
+            list[Track]: The track of each detection, in input order.
+
+        """
+        bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+        assigned: list[Track | None] = [None] * len(bboxes)
+
+        if self.tracks and len(bboxes):
+            ious = iou_matrix(bboxes, np.stack([t.bbox for t in self.tracks]))
+            used = set()
+            # Abbinamento greedy per IoU decrescente: sufficiente con pochi volti per frame
+            for flat in np.argsort(ious, axis=None)[::-1]:
+                det, trk = np.unravel_index(flat, ious.shape)
+                if ious[det, trk] < self.iou_threshold:
+                    break
+                if assigned[det] is not None or trk in used:
+                    continue
+                used.add(trk)
+                track = self.tracks[trk]
+                assigned[det] = track
+                track.bbox = bboxes[det]
+                track.hits += 1
+                track.missed = 0
+
+        matched = {id(t) for t in assigned if t is not None}
+        for track in self.tracks:
+            if id(track) not in matched:
+                track.missed += 1
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+
+        for det, track in enumerate(assigned):
+            if track is None:
+                track = Track(next(self._ids), bboxes[det])
+                assigned[det] = track
+                self.tracks.append(track)
+        return assigned
+
+    def reset(self):
+        """Drop all tracks."""
+        self.tracks = []
+
+
+class RegionPlanner:
+    """Choose between full-frame and region detection for a stream of frames.
+
+    Between periodic full scans, detection only needs to look around the
+    faces found in the previous frame (see ``FaceEngine.analyze_frame``). A full
+    scan is planned every ``full_scan_every`` frames to catch new faces, and
+    immediately when the previous frame had no faces, when a region search lost
+    a face or when the frame size changed.
+
+    Attributes:
+        full_scan_every (int): Frames between full scans; 1 disables region detection.
+        regions (np.ndarray | None): Boxes to search around in the next frame.
+
+    """
+
+    def __init__(self, full_scan_every: int = 10):
+        """Initialize RegionPlanner.
+
+        Args:
+            full_scan_every (int): Frames between full scans. Default: 10.
+
+        """
+        self.full_scan_every = max(1, full_scan_every)
+        self.regions: np.ndarray | None = None
+        self._shape: tuple | None = None
+        self._since_full = 0
+
+    def plan(self, frame_shape: tuple) -> np.ndarray | None:
+        """Return the regions to search in the next frame.
+
+        Args:
+            frame_shape (tuple): Shape of the next frame.
+
+        Returns:
+            np.ndarray | None: (N, 4) boxes, or None for a full scan.
+
+        """
+        if (
+            self.regions is None
+            or len(self.regions) == 0
+            or frame_shape[:2] != self._shape
+            or self._since_full + 1 >= self.full_scan_every
+        ):
+            return None
+        return self.regions
+
+    def update(self, bboxes: np.ndarray, frame_shape: tuple, searched: np.ndarray | None):
+        """Record the detections of a frame.
+
+        Args:
+            bboxes (np.ndarray): Detected boxes of shape (N, 4).
+            frame_shape (tuple): Shape of the frame.
+            searched (np.ndarray | None): Regions returned by ``plan`` for this frame.
+
+        """
+        bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+        self._shape = frame_shape[:2]
+        if searched is None:
+            self._since_full = 0
+        else:
+            self._since_full += 1
+        # Un volto perso nelle regioni può essere uscito dal ritaglio: scansione completa
+        if searched is not None and len(bboxes) < len(searched):
+            self.regions = None
+        else:
+            self.regions = bboxes
+
+    def reset(self):
+        """Forget the regions; the next frame gets a full scan."""
+        self.regions = None
+
+
+class TrackIdentity:
+    """Recent identification results of a track and the identity they support.
+
+    Attributes:
+        votes (deque): Last (person key, person, score) results; person is None when
+            no gallery entry was above the threshold.
+        person (Any | None): Stable identity, None while unknown.
+        confidence (float): Summed score of ``person`` over the window, divided by
+            the window length.
+        since_search (int): Frames since the last gallery search.
+
+    """
+
+    __slots__ = ("votes", "person", "confidence", "since_search")
+
+    def __init__(self, window: int):
+        """Initialize TrackIdentity.
+
+        Args:
+            window (int): Results kept.
+
+        """
+        self.votes: deque = deque(maxlen=window)
+        self.person: Optional[Any] = None
+        self.confidence = 0.0
+        self.since_search = 0
+
+
+class IdentityCache:
+    """Per-track identity accumulated over a sliding window of results.
+
+    Each gallery search of a tracked face adds a vote to its track; the stable
+    identity is the person with the highest summed score, provided it got at
+    least ``min_support`` of the votes in the window. A single bad frame (blur,
+    partial occlusion) therefore neither flips the name nor drops it. Once
+    the identity is confident, the face is not searched again for
+    ``reuse_frames`` frames, saving both the embedding and the search.
+
+    Attributes:
+        window (int): Votes kept per track.
+        min_support (float): Fraction of the votes the identity must have.
+        reuse_frames (int): Frames a confident identity is reused without searching;
+            0 searches every frame.
+        reuse_confidence (float): Confidence from which an identity is reused.
+
+    """
+
+    # Voti minimi prima di considerare un'identità riusabile
+    MIN_VOTES = 3
+
+    def __init__(self, window: int = 10, min_support: float = 0.5, reuse_frames: int = 10, reuse_confidence: float = 0.5):
+        """Initialize IdentityCache.
+
+        Args:
+            window (int): Votes kept per track. Default: 10.
+            min_support (float): Fraction of the votes the identity must have. Default: 0.5.
+            reuse_frames (int): Frames a confident identity is reused. Default: 10.
+            reuse_confidence (float): Confidence from which an identity is reused. Default: 0.5.
+
+        """
+        self.window = max(1, window)
+        self.min_support = min_support
+        self.reuse_frames = reuse_frames
+        self.reuse_confidence = reuse_confidence
+        self._tracks: dict[int, TrackIdentity] = {}
+
+    def needs_search(self, track_id: int) -> bool:
+        """Tell whether a track must be searched in the gallery this frame."""
+        entry = self._tracks.get(track_id)
+        return (
+            entry is None
+            or entry.person is None
+            or len(entry.votes) < self.MIN_VOTES
+            or entry.confidence < self.reuse_confidence
+            or entry.since_search >= self.reuse_frames
+        )
+
+    def add(self, track_id: int, person: Optional[Any], score: float):
+        """Add the result of a gallery search to a track and update its identity.
+
+        Args:
+            track_id (int): Track identifier.
+            person (Any | None): Matched person, None if below the threshold.
+            score (float): Similarity score of the best gallery entry.
+
+        """
+        entry = self._tracks.get(track_id)
+        if entry is None:
+            entry = self._tracks[track_id] = TrackIdentity(self.window)
+        key = None if person is None else (getattr(person, "id", None) or id(person))
+        entry.votes.append((key, person, score))
+        entry.since_search = 0
+
+        totals: dict = {}
+        counts: dict = {}
+        people: dict = {}
+        for key, voted, voted_score in entry.votes:
+            if key is None:
+                continue
+            totals[key] = totals.get(key, 0.0) + voted_score
+            counts[key] = counts.get(key, 0) + 1
+            people[key] = voted
+
+        entry.person, entry.confidence = None, 0.0
+        if totals:
+            best = max(totals, key=totals.get)
+            if counts[best] >= self.min_support * len(entry.votes):
+                entry.person = people[best]
+                entry.confidence = totals[best] / len(entry.votes)
+
+    def reuse(self, track_id: int):
+        """Record a frame in which a track was not searched."""
+        entry = self._tracks.get(track_id)
+        if entry is not None:
+            entry.since_search += 1
+
+    def get(self, track_id: int) -> tuple[Optional[Any], float]:
+        """Return the stable identity and confidence of a track.
+
+        Returns:
+            tuple[Any | None, float]: (person, confidence); (None, 0.0) while unknown.
+
+        """
+        entry = self._tracks.get(track_id)
+        if entry is None:
+            return None, 0.0
+        return entry.person, entry.confidence
+
+    def prune(self, live_track_ids: Iterable[int]):
+        """Forget the tracks no longer followed by the tracker."""
+        live = set(live_track_ids)
+        for track_id in [t for t in self._tracks if t not in live]:
+            del self._tracks[track_id]
+
+    def reset(self):
+        """Forget every track."""
+        self._tracks.clear()
@@ -0,0 +1,55 @@
+import threading
+
+import numpy as np
+
+
+class BufferPool:
+    """Per-thread pool of reusable NumPy buffers for the frame hot path.
+
+    Each worker thread gets its own set of named buffers, so arrays returned by
+    ``get`` can be written without locking. A buffer is reallocated only when a
+    larger capacity is requested; otherwise a reshaped view of the existing
+    memory is returned. In steady state (same frame size and similar face count)
+    frame processing therefore reuses the same memory on every call.
+
+    Buffers are overwritten by the next call to ``get`` with the same name on the
+    same thread: callers must not keep references across frames.
+
+    """
+
+    def __init__(self):
+        """Initialize an empty BufferPool."""
+        self._local = threading.local()
+
+    def get(self, name: str, shape: tuple, dtype=np.uint8) -> np.ndarray:
+        """Return a C-contiguous buffer with the given shape and dtype.
+
+        Args:
+            name (str): Buffer name, unique per use site (e.g. "frame", "crops").
+            shape (tuple): Requested array shape.
+            dtype: NumPy dtype. Default: np.uint8.
+
+        Returns:
+            np.ndarray: Uninitialized array backed by pooled memory.
+
+        """
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        key = (name, dtype)
+        flat = buffers.get(key)
+        if flat is None or flat.size < size:
+            flat = np.empty(size, dtype=dtype)
+            buffers[key] = flat
+        return flat[:size].reshape(shape)
+
+    def clear(self):
+        """Release the buffers of the calling thread."""
+        self._local.buffers = {}
+
+
+# Pool condiviso dai worker del pipeline (un set di buffer per thread)
+buffer_pool = BufferPool()
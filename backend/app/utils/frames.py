@@ -0,0 +1,310 @@
+import inspect
+import logging
+import struct
+
+import cv2
+import numpy as np
+
+from utils.buffers import BufferPool
+
+# --- DECODER JPEG VELOCI (Auto-detection) ---
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJPF_GRAY
+    _turbo = TurboJPEG()
+    TURBOJPEG_AVAILABLE = True
+    # Le versioni recenti di PyTurboJPEG accettano un buffer di destinazione
+    _TURBO_DST = "dst" in inspect.signature(TurboJPEG.decode).parameters
+except Exception:
+    # ImportError se manca il pacchetto, RuntimeError/OSError se manca libturbojpeg
+    _turbo = None
+    TURBOJPEG_AVAILABLE = False
+    _TURBO_DST = False
+
+try:
+    import simplejpeg
+    SIMPLEJPEG_AVAILABLE = True
+except ImportError:
+    SIMPLEJPEG_AVAILABLE = False
+
+# Header dei frame raw: magic, formato pixel, larghezza, altezza (little endian)
+RAW_MAGIC = b"RAW1"
+RAW_HEADER = struct.Struct("<4sBHH")
+
+RAW_RGB24 = 1
+RAW_BGR24 = 2
+RAW_I420 = 3
+RAW_NV12 = 4
+
+_REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Marker SOF che contengono le dimensioni dell'immagine (esclusi DHT, JPG, DAC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+logger = logging.getLogger(__name__)
+
+
+def is_jpeg(data: bytes) -> bool:
+    """Check whether a buffer starts with the JPEG SOI marker.
+
+    Args:
+        data (bytes): Encoded frame bytes.
+
+    Returns:
+        bool: True if the buffer looks like a JPEG stream.
+
+    """
+    return len(data) > 3 and data[0] == 0xFF and data[1] == 0xD8
+
+
+def jpeg_size(data: bytes) -> tuple[int, int] | None:
+    """Read width and height from a JPEG header without decoding it.
+
+    Walks the marker segments up to the first SOF marker.
+
+    Args:
+        data (bytes): JPEG encoded bytes.
+
+    Returns:
+        tuple[int, int] | None: (width, height), or None if no SOF marker is found.
+
+    """
+    i = 2
+    n = len(data)
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            height, width = struct.unpack_from(">HH", data, i + 5)
+            return width, height
+        segment_length = struct.unpack_from(">H", data, i + 2)[0]
+        i += 2 + segment_length
+    return None
+
+
+def reduction_factor(width: int, height: int, target: int) -> int:
+    """Pick the largest JPEG scaling factor that keeps the long side above target.
+
+    Args:
+        width (int): Original frame width.
+        height (int): Original frame height.
+        target (int): Detection input size the frame will be resized to.
+
+    Returns:
+        int: One of 1, 2, 4 or 8.
+
+    """
+    long_side = max(width, height)
+    for factor in (8, 4, 2):
+        if long_side // factor >= target:
+            return factor
+    return 1
+
+
+class FrameDecoder:
+    """Decoder for frames received over the WebSocket.
+
+    Accepts JPEG, PNG and WebP encoded images and raw RGB/BGR/YUV frames
+    prefixed with a ``RAW_HEADER``. JPEG frames larger than the detection size
+    are decoded at reduced scale, using libjpeg-turbo (PyTurboJPEG or simplejpeg)
+    when installed and OpenCV otherwise.
+
+    Attributes:
+        backend (str): Selected JPEG backend ("turbojpeg", "simplejpeg" or "opencv").
+        target_size (int): Detection input size used to pick the reduction factor.
+        reduced (bool): Whether reduced-scale decoding is enabled.
+
+    """
+
+    def __init__(self, target_size: int, backend: str = "auto", reduced: bool = True):
+        """Initialize FrameDecoder and select the JPEG backend.
+
+        Args:
+            target_size (int): Detection input size (e.g. 640).
+            backend (str): "auto", "turbojpeg", "simplejpeg" or "opencv". Default: "auto".
+            reduced (bool): Enable reduced-scale JPEG decoding. Default: True.
+
+        """
+        self.target_size = target_size
+        self.reduced = reduced
+        self.backend = self._select_backend(backend)
+        logger.info(f"FrameDecoder: backend JPEG = {self.backend}, decodifica ridotta = {reduced}")
+
+    @staticmethod
+    def _select_backend(backend: str) -> str:
+        """Resolve the requested backend against the installed libraries.
+
+        Args:
+            backend (str): Requested backend name.
+
+        Returns:
+            str: Backend actually used.
+
+        """
+        backend = (backend or "auto").lower()
+        if backend == "turbojpeg" and not TURBOJPEG_AVAILABLE:
+            logger.warning("PyTurboJPEG non disponibile, fallback su auto")
+            backend = "auto"
+        if backend == "simplejpeg" and not SIMPLEJPEG_AVAILABLE:
+            logger.warning("simplejpeg non disponibile, fallback su auto")
+            backend = "auto"
+        if backend == "auto":
+            if TURBOJPEG_AVAILABLE:
+                return "turbojpeg"
+            if SIMPLEJPEG_AVAILABLE:
+                return "simplejpeg"
+            return "opencv"
+        if backend not in ("turbojpeg", "simplejpeg", "opencv"):
+            logger.warning(f"Backend JPEG sconosciuto '{backend}', uso opencv")
+            return "opencv"
+        return backend
+
+    def decode(self, data: bytes, pool: BufferPool | None = None) -> tuple[np.ndarray | None, float]:
+        """Decode a frame to a BGR ndarray.
+
+        Args:
+            data (bytes): Encoded image bytes or raw frame with ``RAW_HEADER``.
+            pool (BufferPool | None): When given, the frame is decoded into the
+                pooled "frame" buffer of the calling thread instead of a new array
+                (libjpeg-turbo backends and raw frames; OpenCV does not expose an
+                output buffer for ``imdecode``). The frame is only valid until the
+                next pooled decode on the same thread. Default: None.
+
+        Returns:
+            tuple[np.ndarray | None, float]: (frame, scale) where scale is the factor
+                that maps frame coordinates back to the original frame size.
+                Frame is None if decoding fails.
+
+        """
+        if data[:4] == RAW_MAGIC:
+            return self.decode_raw(data, pool), 1.0
+        if is_jpeg(data):
+            return self.decode_jpeg(data, pool)
+
+        # PNG, WebP e altri formati supportati da OpenCV
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        return frame, 1.0
+
+    def decode_jpeg(self, data: bytes, pool: BufferPool | None = None) -> tuple[np.ndarray | None, float]:
+        """Decode a JPEG frame, at reduced scale when it is larger than needed.
+
+        Args:
+            data (bytes): JPEG encoded bytes.
+            pool (BufferPool | None): Optional buffer pool, see ``decode``. Default: None.
+
+        Returns:
+            tuple[np.ndarray | None, float]: (frame, scale) as in ``decode``.
+
+        """
+        factor = 1
+        size = jpeg_size(data) if (self.reduced or pool is not None) else None
+        if size is not None and self.reduced:
+            factor = reduction_factor(size[0], size[1], self.target_size)
+
+        dst = None
+        if pool is not None and size is not None and self.backend != "opencv":
+            # libjpeg-turbo arrotonda per eccesso le dimensioni scalate
+            dst = pool.get("frame", (-(-size[1] // factor), -(-size[0] // factor), 3))
+
+        if self.backend == "turbojpeg":
+            kwargs = {"dst": dst} if dst is not None and _TURBO_DST else {}
+            if factor > 1:
+                frame = _turbo.decode(data, pixel_format=TJPF_BGR, scaling_factor=(1, factor), **kwargs)
+            else:
+                frame = _turbo.decode(data, pixel_format=TJPF_BGR, **kwargs)
+        elif self.backend == "simplejpeg":
+            if factor > 1:
+                frame = simplejpeg.decode_jpeg(
+                    data, colorspace="BGR", min_width=size[0] // factor, min_height=size[1] // factor, buffer=dst
+                )
+            else:
+                frame = simplejpeg.decode_jpeg(data, colorspace="BGR", buffer=dst)
+        else:
+            flags = _REDUCED_FLAGS.get(factor, cv2.IMREAD_COLOR)
+            frame = cv2.imdecode(np.frombuffer(data, np.uint8), flags)
+
+        if frame is None:
+            return None, 1.0
+        scale = size[0] / frame.shape[1] if size is not None and factor > 1 else 1.0
+        return frame, scale
+
+    def decode_gray(self, data: bytes) -> np.ndarray | None:
+        """Decode a cheap low-resolution grayscale version of a frame.
+
+        JPEG frames are decoded at 1/8 scale, raw YUV frames reuse the Y plane.
+        Used by the motion gate before paying for a full decode.
+
+        Args:
+            data (bytes): Encoded image bytes or raw frame with ``RAW_HEADER``.
+
+        Returns:
+            np.ndarray | None: Grayscale frame, or None if decoding fails.
+
+        """
+        if data[:4] == RAW_MAGIC:
+            if len(data) < RAW_HEADER.size:
+                return None
+            _, pixel_format, width, height = RAW_HEADER.unpack_from(data)
+            if pixel_format in (RAW_I420, RAW_NV12) and len(data) >= RAW_HEADER.size + width * height:
+                return np.frombuffer(data, np.uint8, count=width * height, offset=RAW_HEADER.size).reshape(height, width)
+            frame = self.decode_raw(data)
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame is not None else None
+
+        if is_jpeg(data):
+            if self.backend == "turbojpeg":
+                return _turbo.decode(data, pixel_format=TJPF_GRAY, scaling_factor=(1, 8))[:, :, 0]
+            if self.backend == "simplejpeg":
+                return simplejpeg.decode_jpeg(data, colorspace="GRAY", min_width=1, min_height=1)[:, :, 0]
+            return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+
+    @staticmethod
+    def decode_raw(data: bytes, pool: BufferPool | None = None) -> np.ndarray | None:
+        """Convert a raw RGB/BGR/YUV frame to a BGR ndarray.
+
+        BGR24 payloads are returned as a read-only zero-copy view of ``data``.
+
+        Args:
+            data (bytes): ``RAW_HEADER`` followed by the pixel payload.
+            pool (BufferPool | None): Optional buffer pool for the converted frame. Default: None.
+
+        Returns:
+            np.ndarray | None: BGR frame, or None if the header or payload is invalid.
+
+        """
+        if len(data) < RAW_HEADER.size:
+            return None
+        _, pixel_format, width, height = RAW_HEADER.unpack_from(data)
+        payload = np.frombuffer(data, np.uint8, offset=RAW_HEADER.size)
+
+        if pixel_format in (RAW_RGB24, RAW_BGR24):
+            expected = width * height * 3
+        elif pixel_format in (RAW_I420, RAW_NV12):
+            expected = width * height * 3 // 2
+        else:
+            logger.error(f"Formato raw non supportato: {pixel_format}")
+            return None
+
+        if width == 0 or height == 0 or payload.size != expected:
+            logger.error(f"Frame raw {width}x{height} con payload errato: {payload.size} byte (attesi {expected})")
+            return None
+
+        if pixel_format == RAW_BGR24:
+            return payload.reshape(height, width, 3)
+
+        dst = pool.get("frame", (height, width, 3)) if pool is not None else None
+        if pixel_format == RAW_RGB24:
+            return cv2.cvtColor(payload.reshape(height, width, 3), cv2.COLOR_RGB2BGR, dst=dst)
+        code = cv2.COLOR_YUV2BGR_I420 if pixel_format == RAW_I420 else cv2.COLOR_YUV2BGR_NV12
+        return cv2.cvtColor(payload.reshape(height * 3 // 2, width), code, dst=dst)
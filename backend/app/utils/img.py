@@ -125,8 +125,23 @@ class ImgValidation:
         if not ImgValidation.validate_png(path):
             return None
         
-        img_hash = hashlib.md5(Image.open(path).tobytes())
-        return img_hash.hexdigest()
+        return ImgValidation.hash_pixels(Image.open(path))
+
+    @staticmethod
+    def hash_pixels(image: Image.Image) -> str:
+        """Generate the MD5 hash of the decoded pixels of an image.
+
+        PNG conversion is lossless, so the hash of an image opened in its
+        original format equals ``hash_img`` of its PNG conversion.
+
+        Args:
+            image (Image.Image): Decoded image.
+
+        Returns:
+            str: MD5 hash hexdigest.
+
+        """
+        return hashlib.md5(image.tobytes()).hexdigest()
 
     def normalize_img(self, path: str, delete: bool) -> bool:
         """Normalize image: convert to PNG, validate, and generate hash.
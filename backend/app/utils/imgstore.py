@@ -0,0 +1,234 @@
+import logging
+import os
+import tempfile
+import time
+from typing import Iterator, Optional
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from config import image_store_settings
+from utils.img import ImgValidation
+
+logger = logging.getLogger(__name__)
+
+# Formato degli originali -> estensione del file
+EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg"}
+FACE_SUFFIX = ".face.png"
+SUPPORTED_EXT = (".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".gif", ".heic", ".webp")
+
+
+class StoredImage:
+    """An image decoded for enrolment, not necessarily written to the store yet.
+
+    Attributes:
+        hash (str): MD5 of the decoded pixels, the key of its embedding.
+        image (Image.Image): Decoded image.
+        frame (np.ndarray): The image as a BGR array, for detection.
+
+    """
+
+    __slots__ = ("hash", "image", "frame")
+
+    def __init__(self, hash: str, image: Image.Image, frame: np.ndarray):
+        """Initialize StoredImage.
+
+        Args:
+            hash (str): Pixel hash.
+            image (Image.Image): Decoded image.
+            frame (np.ndarray): BGR array.
+
+        """
+        self.hash = hash
+        self.image = image
+        self.frame = frame
+
+
+class ImageStore:
+    """Content-addressed store of enrolment photos.
+
+    Each photo is stored once under the hash of its decoded pixels (the key
+    of its embedding in ``Person.encoding``, see ``ImgValidation.hash_pixels``):
+    uploading the same photo again writes nothing. Originals are re-encoded
+    as WebP or JPEG at ``quality``, downscaled to ``max_side``, next to the
+    aligned face crop used for the embedding, a small lossless PNG that a
+    re-embedding can feed to the recognition model without decoding and
+    detecting the original again.
+
+    Files live in ``<folder>/<hash[:2]>/``: ``<hash>.webp`` (or ``.jpg``) and
+    ``<hash>.face.png``. Writes go through a temporary file and a rename, so
+    readers never see a partial image. Images no person refers to are removed
+    by ``collect_garbage``.
+
+    Attributes:
+        folder (str): Root directory.
+        format (str): Format of new originals, "webp" or "jpeg".
+        quality (int): Encoding quality of new originals.
+        max_side (int): Longest side of new originals; 0 keeps the resolution.
+        faces (bool): Whether face crops are stored.
+
+    """
+
+    def __init__(self, folder: str, format: str = "webp", quality: int = 85, max_side: int = 2048, faces: bool = True):
+        """Initialize ImageStore.
+
+        Args:
+            folder (str): Root directory, created on first write.
+            format (str): Format of new originals, "webp" or "jpeg". Default: "webp".
+            quality (int): Encoding quality, 1-100. Default: 85.
+            max_side (int): Longest side of new originals; 0 keeps the resolution. Default: 2048.
+            faces (bool): Store the aligned face crops. Default: True.
+
+        Raises:
+            ValueError: If the format is not supported.
+
+        """
+        if format not in EXTENSIONS:
+            raise ValueError(f"Formato non supportato: {format}. Valori accettati: {list(EXTENSIONS)}")
+        self.folder = folder
+        self.format = format
+        self.quality = quality
+        self.max_side = max_side
+        self.faces = faces
+
+    def _base(self, hash: str) -> str:
+        return os.path.join(self.folder, hash[:2], hash)
+
+    def path(self, hash: str) -> Optional[str]:
+        """Return the path of the stored original, whatever its format, or None."""
+        base = self._base(hash)
+        for ext in EXTENSIONS.values():
+            if os.path.exists(base + ext):
+                return base + ext
+        return None
+
+    def face_path(self, hash: str) -> Optional[str]:
+        """Return the path of the stored face crop, or None."""
+        path = self._base(hash) + FACE_SUFFIX
+        return path if os.path.exists(path) else None
+
+    def open(self, path: str | os.PathLike) -> Optional[StoredImage]:
+        """Decode an uploaded image and compute its hash, without storing it.
+
+        Args:
+            path (str | os.PathLike): Image file (PNG, JPEG, BMP, TIFF, GIF, HEIC or WebP).
+
+        Returns:
+            StoredImage | None: The decoded image, or None if it cannot be read.
+
+        """
+        ext = os.path.splitext(str(path))[1].lower()
+        if ext not in SUPPORTED_EXT:
+            logger.error(f"Formato non supportato: {path}")
+            return None
+        if ext == ".heic":
+            import pillow_heif as heif
+            heif.register_heif_opener()
+        try:
+            image = Image.open(path)
+            image.load()
+            key = ImgValidation.hash_pixels(image)
+            frame = np.ascontiguousarray(np.asarray(image.convert("RGB"))[:, :, ::-1])
+        except Exception as e:
+            logger.error(f"Impossibile leggere l'immagine {path}: {e}")
+            return None
+        return StoredImage(key, image, frame)
+
+    def save(self, stored: StoredImage, face: Optional[np.ndarray] = None) -> bool:
+        """Store an image and its face crop unless they are already stored.
+
+        Args:
+            stored (StoredImage): Image returned by ``open``.
+            face (np.ndarray | None): Aligned BGR face crop; ignored when ``faces``
+                is False. Default: None.
+
+        Returns:
+            bool: True if the original was written, False if it was already stored.
+
+        """
+        base = self._base(stored.hash)
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        existing = self.path(stored.hash)
+        if existing is None:
+            image = stored.image.convert("RGB")
+            if self.max_side and max(image.size) > self.max_side:
+                image = ImageOps.contain(image, (self.max_side, self.max_side), Image.Resampling.LANCZOS)
+            self._write(base + EXTENSIONS[self.format], image, self.format.upper(), quality=self.quality)
+        else:
+            # Caricato di nuovo: l'età conta dall'ultimo caricamento (vedi collect_garbage)
+            os.utime(existing)
+
+        if self.faces and face is not None and self.face_path(stored.hash) is None:
+            self._write(base + FACE_SUFFIX, Image.fromarray(np.ascontiguousarray(face[:, :, ::-1])), "PNG")
+        return existing is None
+
+    @staticmethod
+    def _write(path: str, image: Image.Image, format: str, **params):
+        # File temporaneo nella stessa cartella + rename atomico
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                image.save(f, format, **params)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def _files(self) -> Iterator[tuple[str, str, os.stat_result]]:
+        if not os.path.isdir(self.folder):
+            return
+        with os.scandir(self.folder) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            yield entry.path, entry.name, entry.stat()
+
+    def collect_garbage(self, referenced: set[str], min_age: float = 3600, dry_run: bool = False) -> dict:
+        """Remove the images whose hash no person refers to.
+
+        Files modified less than ``min_age`` seconds ago are kept: the photos
+        of an enrolment are stored before the person is saved. Leftover
+        temporary files older than ``min_age`` are removed too.
+
+        Args:
+            referenced (set[str]): Hashes in use (``Database.referenced_hashes``).
+            min_age (float): Minimum age, in seconds, of a removed file. Default: 3600.
+            dry_run (bool): Only count what would be removed. Default: False.
+
+        Returns:
+            dict: {"files": int, "removed": int, "freed_bytes": int, "kept_recent": int}.
+
+        """
+        cutoff = time.time() - min_age
+        stats = {"files": 0, "removed": 0, "freed_bytes": 0, "kept_recent": 0}
+        for path, name, stat in list(self._files()):
+            stats["files"] += 1
+            if name.split(".", 1)[0] in referenced:
+                continue
+            if stat.st_mtime > cutoff:
+                stats["kept_recent"] += 1
+                continue
+            if not dry_run:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Impossibile rimuovere {path}: {e}")
+                    continue
+            stats["removed"] += 1
+            stats["freed_bytes"] += stat.st_size
+        action = "da rimuovere" if dry_run else "rimossi"
+        logger.info(f"Pulizia archivio immagini: {stats['removed']} file {action} ({stats['freed_bytes']} byte) su {stats['files']}")
+        return stats
+
+
+# Archivio condiviso delle foto di registrazione
+image_store = ImageStore(
+    image_store_settings.folder,
+    format=image_store_settings.format,
+    quality=image_store_settings.quality,
+    max_side=image_store_settings.max_side,
+    faces=image_store_settings.faces,
+)
@@ -0,0 +1,101 @@
+import logging
+
+import cv2
+import numpy as np
+
+# Dimensione delle miniature confrontate (larghezza, altezza)
+GATE_SIZE = (64, 48)
+
+logger = logging.getLogger(__name__)
+
+
+class MotionGate:
+    """Scene-change pre-filter for a single video stream.
+
+    Compares a small grayscale thumbnail of each frame against the thumbnail
+    of the last analyzed frame. When the mean absolute difference stays below
+    the threshold the frame is considered static and detection can be skipped.
+    A full analysis is forced after ``max_skip`` consecutive static frames so
+    results never become arbitrarily stale.
+
+    Attributes:
+        threshold (float): Mean absolute gray-level difference (0-255) above which
+            the scene is considered changed.
+        max_skip (int): Maximum number of consecutive frames that can be skipped.
+        size (tuple[int, int]): Thumbnail size (width, height).
+        reference (np.ndarray | None): Thumbnail of the last analyzed frame.
+        shape (tuple | None): Shape of the last checked frame.
+        skipped (int): Consecutive frames skipped since the last analysis.
+
+    """
+
+    def __init__(self, threshold: float = 4.0, max_skip: int = 50, size: tuple[int, int] = GATE_SIZE):
+        """Initialize MotionGate.
+
+        Args:
+            threshold (float): Change threshold on mean absolute difference. Default: 4.0.
+            max_skip (int): Consecutive static frames before a forced analysis. Default: 50.
+            size (tuple[int, int]): Thumbnail size (width, height). Default: (64, 48).
+
+        """
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.size = size
+        self.reference: np.ndarray | None = None
+        self.shape: tuple | None = None
+        self.skipped = 0
+
+    def thumbnail(self, gray: np.ndarray) -> np.ndarray:
+        """Downsample a grayscale frame to the gate thumbnail size.
+
+        Args:
+            gray (np.ndarray): Grayscale frame (any size).
+
+        Returns:
+            np.ndarray: uint8 thumbnail of shape (height, width).
+
+        """
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA)
+
+    def check(self, gray: np.ndarray) -> tuple[bool, np.ndarray]:
+        """Check whether a frame differs from the last analyzed one.
+
+        A frame of a different size than the previous one is always a change:
+        the cached result is in the coordinates of the old size.
+
+        Args:
+            gray (np.ndarray): Grayscale frame (any size).
+
+        Returns:
+            tuple[bool, np.ndarray]: (changed, thumbnail). Pass the thumbnail to
+                ``accept`` once the frame has been analyzed.
+
+        """
+        thumb = self.thumbnail(gray)
+        if gray.shape != self.shape:
+            self.reset()
+            self.shape = gray.shape
+        if self.reference is None or self.skipped >= self.max_skip:
+            return True, thumb
+
+        diff = cv2.mean(cv2.absdiff(thumb, self.reference))[0]
+        if diff > self.threshold:
+            return True, thumb
+
+        self.skipped += 1
+        return False, thumb
+
+    def accept(self, thumb: np.ndarray):
+        """Store the thumbnail of an analyzed frame as the new reference.
+
+        Args:
+            thumb (np.ndarray): Thumbnail returned by ``check``.
+
+        """
+        self.reference = thumb
+        self.skipped = 0
+
+    def reset(self):
+        """Forget the reference frame so the next frame is always analyzed."""
+        self.reference = None
+        self.skipped = 0
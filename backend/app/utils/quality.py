@@ -0,0 +1,301 @@
+import logging
+
+import numpy as np
+
+from config import quality_settings
+
+# Lato dei ritagli su cui si misura la nitidezza: rende la misura indipendente dalla dimensione del volto
+SHARPNESS_SIZE = 64
+
+# Motivi di scarto, nell'ordine in cui vengono controllati
+ISSUES = {
+    "size": "volto troppo piccolo",
+    "det_score": "rilevamento incerto",
+    "sharpness": "immagine sfocata",
+    "pose": "volto non frontale",
+}
+
+logger = logging.getLogger(__name__)
+
+
+class LowQualityFace(ValueError):
+    """Raised when the face of an enrolment photo does not meet the quality thresholds."""
+
+
+class QualityGate:
+    """Cheap quality check of detected faces, run before recognition.
+
+    All measures are computed for every face of a frame at once:
+
+    - **size**: shortest side of the bounding box, in pixels;
+    - **det_score**: SCRFD detection confidence;
+    - **sharpness**: variance of the Laplacian of the face crop resized to
+      ``SHARPNESS_SIZE`` pixels (low values mean blur);
+    - **yaw** and **pitch** from the 5 landmarks: horizontal offset of the nose
+      from the eye midpoint relative to the eye distance (0 when frontal), and
+      offset of the nose from halfway between eyes and mouth relative to that
+      distance (0 when frontal).
+
+    Attributes:
+        min_face_size (float): Minimum shortest side of the bounding box.
+        min_det_score (float): Minimum detection confidence.
+        min_sharpness (float): Minimum Laplacian variance.
+        max_yaw (float): Maximum absolute yaw measure.
+        max_pitch (float): Maximum absolute pitch measure.
+
+    """
+
+    def __init__(
+        self,
+        min_face_size: float = 32,
+        min_det_score: float = 0.6,
+        min_sharpness: float = 20.0,
+        max_yaw: float = 0.6,
+        max_pitch: float = 0.35,
+    ):
+        """Initialize QualityGate.
+
+        Args:
+            min_face_size (float): Minimum shortest side of the bounding box. Default: 32.
+            min_det_score (float): Minimum detection confidence. Default: 0.6.
+            min_sharpness (float): Minimum Laplacian variance. Default: 20.0.
+            max_yaw (float): Maximum absolute yaw measure. Default: 0.6.
+            max_pitch (float): Maximum absolute pitch measure. Default: 0.35.
+
+        """
+        self.min_face_size = min_face_size
+        self.min_det_score = min_det_score
+        self.min_sharpness = min_sharpness
+        self.max_yaw = max_yaw
+        self.max_pitch = max_pitch
+
+    def measure(self, frame_bgr: np.ndarray, faces: list) -> dict:
+        """Compute the quality measures of the faces of a frame.
+
+        Args:
+            frame_bgr (np.ndarray): Frame the faces were detected in.
+            faces (list): Face objects with ``bbox``, ``det_score`` and ``kps``.
+
+        Returns:
+            dict: Arrays of length N under "size", "det_score", "sharpness",
+                "yaw" and "pitch".
+
+        """
+        import cv2
+
+        n = len(faces)
+        bboxes = np.array([face.bbox for face in faces], dtype=np.float32).reshape(n, 4)
+        size = np.minimum(bboxes[:, 2] - bboxes[:, 0], bboxes[:, 3] - bboxes[:, 1])
+        det_score = np.array([face.det_score if face.det_score is not None else 1.0 for face in faces], dtype=np.float32)
+
+        # Ritagli normalizzati impilati: il Laplaciano si calcola su tutti i volti insieme
+        height, width = frame_bgr.shape[:2]
+        crops = np.zeros((n, SHARPNESS_SIZE, SHARPNESS_SIZE, 3), dtype=np.uint8)
+        for i, (x1, y1, x2, y2) in enumerate(bboxes.astype(np.int32)):
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(width, x2), min(height, y2)
+            if x2 > x1 and y2 > y1:
+                cv2.resize(frame_bgr[y1:y2, x1:x2], (SHARPNESS_SIZE, SHARPNESS_SIZE), dst=crops[i], interpolation=cv2.INTER_AREA)
+        gray = crops.astype(np.float32) @ np.array([0.114, 0.587, 0.299], dtype=np.float32)
+        laplacian = (
+            gray[:, :-2, 1:-1] + gray[:, 2:, 1:-1] + gray[:, 1:-1, :-2] + gray[:, 1:-1, 2:] - 4 * gray[:, 1:-1, 1:-1]
+        )
+        sharpness = laplacian.reshape(n, -1).var(axis=1)
+
+        yaw = np.zeros(n, dtype=np.float32)
+        pitch = np.zeros(n, dtype=np.float32)
+        with_kps = [i for i, face in enumerate(faces) if face.kps is not None]
+        if with_kps:
+            # Landmark SCRFD: occhio sx, occhio dx, naso, bocca sx, bocca dx
+            kps = np.stack([faces[i].kps for i in with_kps]).astype(np.float32)
+            eyes = (kps[:, 0] + kps[:, 1]) / 2
+            mouth = (kps[:, 3] + kps[:, 4]) / 2
+            nose = kps[:, 2]
+            eye_distance = np.maximum(np.linalg.norm(kps[:, 1] - kps[:, 0], axis=1), 1e-6)
+            face_height = np.maximum(mouth[:, 1] - eyes[:, 1], 1e-6)
+            yaw[with_kps] = (nose[:, 0] - eyes[:, 0]) / eye_distance
+            pitch[with_kps] = (nose[:, 1] - eyes[:, 1]) / face_height - 0.5
+
+        return {"size": size, "det_score": det_score, "sharpness": sharpness, "yaw": yaw, "pitch": pitch}
+
+    def issues(self, measures: dict) -> list[list[str]]:
+        """List the failed checks of every face.
+
+        Args:
+            measures (dict): Result of ``measure``.
+
+        Returns:
+            list[list[str]]: Keys of ``ISSUES`` failed by each face; empty when it passes.
+
+        """
+        failed = {
+            "size": measures["size"] < self.min_face_size,
+            "det_score": measures["det_score"] < self.min_det_score,
+            "sharpness": measures["sharpness"] < self.min_sharpness,
+            "pose": (np.abs(measures["yaw"]) > self.max_yaw) | (np.abs(measures["pitch"]) > self.max_pitch),
+        }
+        return [[key for key in ISSUES if failed[key][i]] for i in range(len(measures["size"]))]
+
+    def check(self, frame_bgr: np.ndarray, faces: list) -> np.ndarray:
+        """Check the faces of a frame and annotate them.
+
+        Each face gets a ``quality`` entry with its measures and the list of
+        failed checks under "issues".
+
+        Args:
+            frame_bgr (np.ndarray): Frame the faces were detected in.
+            faces (list): Face objects with ``bbox``, ``det_score`` and ``kps``.
+
+        Returns:
+            np.ndarray: Boolean mask of the faces that pass every check.
+
+        """
+        if not faces:
+            return np.zeros(0, dtype=bool)
+        measures = self.measure(frame_bgr, faces)
+        issues = self.issues(measures)
+        for i, face in enumerate(faces):
+            face.quality = {key: round(float(values[i]), 3) for key, values in measures.items()}
+            face.quality["issues"] = issues[i]
+        return np.array([not face_issues for face_issues in issues], dtype=bool)
+
+
+def describe(issues: list[str]) -> str:
+    """Turn failed quality checks into a readable reason.
+
+    Args:
+        issues (list[str]): Keys of ``ISSUES``.
+
+    Returns:
+        str: Comma-separated descriptions.
+
+    """
+    return ", ".join(ISSUES[key] for key in issues)
+
+
+def build_gate(enrol: bool = False) -> QualityGate | None:
+    """Build the quality gate configured in ``QUALITY_`` settings.
+
+    Args:
+        enrol (bool): Build the enrolment gate, with the stricter size and
+            sharpness thresholds, instead of the streaming one. Default: False.
+
+    Returns:
+        QualityGate | None: The gate, or None if disabled for that use.
+
+    """
+    if not (quality_settings.enrol if enrol else quality_settings.stream):
+        return None
+    return QualityGate(
+        min_face_size=quality_settings.enrol_min_face_size if enrol else quality_settings.min_face_size,
+        min_det_score=quality_settings.min_det_score,
+        min_sharpness=quality_settings.enrol_min_sharpness if enrol else quality_settings.min_sharpness,
+        max_yaw=quality_settings.max_yaw,
+        max_pitch=quality_settings.max_pitch,
+    )
+
+
+def dedupe_embeddings(
+    new: dict,
+    existing: dict | None = None,
+    threshold: float = 0.95,
+    merge: bool = False,
+) -> tuple[dict, dict]:
+    """Drop enrolment embeddings that nearly duplicate another one.
+
+    Burst shots and resized copies of a photo have different hashes but
+    almost the same embedding: storing them all only adds gallery rows. All
+    cosine similarities are computed with a single matrix product, new
+    embeddings against the existing ones and against each other; then, in
+    input order, an embedding is dropped when its similarity to an existing
+    embedding or to an earlier kept one reaches ``threshold``.
+
+    With ``merge`` a kept embedding is replaced by the normalized mean of
+    itself and the new embeddings dropped in its favour (duplicates of
+    existing embeddings are always dropped, the stored ones are not changed).
+
+    Args:
+        new (dict): Image hash -> embedding of the photos being enrolled.
+        existing (dict | None): Image hash -> embedding already stored for the person.
+        threshold (float): Cosine similarity from which two embeddings are duplicates.
+            Default: 0.95.
+        merge (bool): Average duplicates into the embedding they duplicate. Default: False.
+
+    Returns:
+        tuple[dict, dict]: (kept, duplicates): the embeddings to store, and dropped
+            hash -> hash of the embedding it duplicates.
+
+    """
+    keys = [key for key, value in new.items() if value is not None]
+    if not keys:
+        return {}, {}
+    vectors = np.asarray([np.asarray(new[key], dtype=np.float32).ravel() for key in keys])
+    unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    dimension = unit.shape[1]
+    existing_keys = [
+        key for key, value in (existing or {}).items()
+        if value is not None and key not in new and np.size(value) == dimension
+    ]
+    if existing_keys:
+        stored = np.asarray([np.asarray(existing[key], dtype=np.float32).ravel() for key in existing_keys])
+        stored /= np.maximum(np.linalg.norm(stored, axis=1, keepdims=True), 1e-12)
+        unit_all = np.vstack([stored, unit])
+    else:
+        unit_all = unit
+    # Una sola moltiplicazione: nuovi contro esistenti e contro sé stessi
+    similarity = unit @ unit_all.T
+    offset = len(existing_keys)
+
+    kept: list[int] = []
+    duplicates: dict = {}
+    groups: dict[int, list[int]] = {}
+    for i in range(len(keys)):
+        row = similarity[i]
+        if offset:
+            j = int(np.argmax(row[:offset]))
+            if row[j] >= threshold:
+                duplicates[keys[i]] = existing_keys[j]
+                continue
+        if kept:
+            candidates = np.asarray(kept)
+            j = int(candidates[np.argmax(row[offset + candidates])])
+            if row[offset + j] >= threshold:
+                duplicates[keys[i]] = keys[j]
+                groups[j].append(i)
+                continue
+        kept.append(i)
+        groups[i] = [i]
+
+    result = {}
+    for i in kept:
+        if merge and len(groups[i]) > 1:
+            mean = unit[groups[i]].mean(axis=0)
+            result[keys[i]] = (mean / max(float(np.linalg.norm(mean)), 1e-12)).tolist()
+        else:
+            result[keys[i]] = new[keys[i]]
+    if duplicates:
+        logger.info(f"Embeddings quasi duplicati {'uniti' if merge else 'scartati'}: {len(duplicates)} su {len(keys)}")
+    return result, duplicates
+
+
+def dedupe_enrolment(new: dict, existing: dict | None = None) -> tuple[dict, dict]:
+    """Apply ``dedupe_embeddings`` with the ``QUALITY_ENROL_DEDUPE*`` settings.
+
+    Args:
+        new (dict): Image hash -> embedding of the photos being enrolled.
+        existing (dict | None): Image hash -> embedding already stored for the person.
+
+    Returns:
+        tuple[dict, dict]: (kept, duplicates); ``new`` unchanged and no duplicates
+            when ``QUALITY_ENROL_DEDUPE`` is off.
+
+    """
+    if not quality_settings.enrol_dedupe:
+        return new, {}
+    return dedupe_embeddings(
+        new,
+        existing,
+        threshold=quality_settings.enrol_dedupe_similarity,
+        merge=quality_settings.enrol_dedupe_merge,
+    )
@@ -0,0 +1,19 @@
+"""Reproducible benchmarks for the DDFR recognition pipeline.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.run --help
+
+"""
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+
+# I moduli dell'app usano import assoluti relativi a backend/app (come main.py)
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+# DB_HASH è obbligatorio in DatabaseSettings ma non usato dai benchmark
+os.environ.setdefault("DB_HASH", "benchmark")
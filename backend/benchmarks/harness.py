@@ -0,0 +1,171 @@
+import gc
+import json
+import platform
+import time
+from datetime import datetime
+from typing import Callable
+
+import numpy as np
+
+
+def measure(fn: Callable, repeat: int = 50, warmup: int = 3) -> dict:
+    """Time repeated calls of a function and summarize the latency distribution.
+
+    The garbage collector is run before timing and disabled during it, so that
+    collections triggered by earlier setup do not land inside the measurement.
+
+    Args:
+        fn (Callable): Zero-argument callable to benchmark.
+        repeat (int): Number of timed calls. Default: 50.
+        warmup (int): Number of untimed calls before measuring. Default: 3.
+
+    Returns:
+        dict: Latency statistics in milliseconds (see ``summarize``).
+
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples = np.empty(repeat, dtype=np.int64)
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(repeat):
+            start = time.perf_counter_ns()
+            fn()
+            samples[i] = time.perf_counter_ns() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return summarize(samples / 1e6)
+
+
+def summarize(samples_ms) -> dict:
+    """Summarize a list of latencies.
+
+    Args:
+        samples_ms: Latencies in milliseconds.
+
+    Returns:
+        dict: n, mean_ms, p50_ms, p95_ms, p99_ms, min_ms, max_ms and ops_per_s.
+
+    """
+    samples_ms = np.asarray(samples_ms, dtype=np.float64)
+    if samples_ms.size == 0:
+        return {"n": 0}
+    mean = float(samples_ms.mean())
+    return {
+        "n": int(samples_ms.size),
+        "mean_ms": round(mean, 4),
+        "p50_ms": round(float(np.percentile(samples_ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(samples_ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(samples_ms, 99)), 4),
+        "min_ms": round(float(samples_ms.min()), 4),
+        "max_ms": round(float(samples_ms.max()), 4),
+        "ops_per_s": round(1000.0 / mean, 2) if mean > 0 else None,
+    }
+
+
+def environment() -> dict:
+    """Collect interpreter, platform and library versions for a report.
+
+    Returns:
+        dict: Environment description.
+
+    """
+    info = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "numpy": np.__version__,
+    }
+    for module in ("cv2", "faiss", "onnxruntime", "insightface", "pymongo", "simplejpeg"):
+        try:
+            info[module] = __import__(module).__version__
+        except Exception:
+            info[module] = None
+    return info
+
+
+def save_report(path: str, results: dict, config: dict):
+    """Write a benchmark report as JSON.
+
+    Args:
+        path (str): Output file path.
+        results (dict): Benchmark name -> statistics.
+        config (dict): Parameters the suite was run with.
+
+    """
+    report = {"environment": environment(), "config": config, "results": results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load_report(path: str) -> dict:
+    """Load a JSON benchmark report.
+
+    Args:
+        path (str): Report file path.
+
+    Returns:
+        dict: The report.
+
+    """
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.15, metric: str = "p50_ms") -> list[dict]:
+    """Compare results against a baseline report.
+
+    Args:
+        results (dict): Benchmark name -> statistics of the current run.
+        baseline (dict): Baseline report as written by ``save_report``.
+        tolerance (float): Allowed relative slowdown before flagging a regression. Default: 0.15.
+        metric (str): Statistic to compare. Default: "p50_ms".
+
+    Returns:
+        list[dict]: One entry per benchmark present in both runs with name,
+            baseline, current, ratio and regression flag.
+
+    """
+    rows = []
+    base_results = baseline.get("results", {})
+    for name in sorted(results):
+        current = results[name].get(metric)
+        previous = base_results.get(name, {}).get(metric)
+        if current is None or not previous:
+            continue
+        ratio = current / previous
+        rows.append({
+            "name": name,
+            "baseline": previous,
+            "current": current,
+            "ratio": round(ratio, 3),
+            "regression": ratio > 1.0 + tolerance,
+        })
+    return rows
+
+
+def format_table(results: dict) -> str:
+    """Format benchmark results as a plain-text table.
+
+    Args:
+        results (dict): Benchmark name -> statistics.
+
+    Returns:
+        str: Table with one row per benchmark.
+
+    """
+    width = max([len(name) for name in results] + [9])
+    lines = [f"{'benchmark':<{width}}  {'p50 ms':>10}  {'p95 ms':>10}  {'ops/s':>10}"]
+    for name in sorted(results):
+        r = results[name]
+        if "p50_ms" not in r:
+            lines.append(f"{name:<{width}}  {r.get('skipped', 'n/a')}")
+            continue
+        lines.append(f"{name:<{width}}  {r['p50_ms']:>10.3f}  {r['p95_ms']:>10.3f}  {r['ops_per_s'] or 0:>10.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,324 @@
+"""WebSocket load generator for capacity planning.
+
+Opens N concurrent connections to ``/ws`` and streams JPEG frames at a target
+FPS, stepping through increasing connection counts to find where
+``websocket_endpoint`` saturates.
+
+Examples (from the ``backend`` directory)::
+
+    python -m benchmarks.loadgen --url ws://localhost:8000/ws --connections 1,2,4,8,16 --fps 13
+    python -m benchmarks.loadgen --mode fire --frames-dir ~/faces --duration 30 --output load.json
+
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import deque
+
+import benchmarks  # noqa: F401  (configura sys.path e variabili d'ambiente)
+from benchmarks import synthetic
+from benchmarks.harness import environment, summarize
+
+logger = logging.getLogger(__name__)
+
+# Guadagno minimo di throughput per considerare utile un livello di carico in più
+SATURATION_GAIN = 0.05
+# Frazione del throughput richiesto sotto la quale il server non tiene il passo
+SATURATION_DEMAND = 0.9
+
+
+class ConnectionStats:
+    """Measurements collected by a single simulated client.
+
+    Attributes:
+        sent (int): Frames sent.
+        received (int): Responses received.
+        cached (int): Responses flagged as cached by the motion gate.
+        busy (int): Frames rejected by the scheduler admission control.
+        latencies_ms (list[float]): Send-to-response latency of each frame.
+        errors (list[str]): Connection, protocol and timeout errors.
+
+    """
+
+    def __init__(self):
+        """Initialize empty ConnectionStats."""
+        self.sent = 0
+        self.received = 0
+        self.cached = 0
+        self.busy = 0
+        self.latencies_ms: list[float] = []
+        self.errors: list[str] = []
+
+    def record(self, payload: str, sent_at: float):
+        """Record a server response.
+
+        Args:
+            payload (str): JSON text received from the server.
+            sent_at (float): perf_counter timestamp of the matching send.
+
+        """
+        self.latencies_ms.append((time.perf_counter() - sent_at) * 1000)
+        self.received += 1
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            self.errors.append("risposta non JSON")
+            return
+        if isinstance(data, dict) and data.get("status") == "busy":
+            self.busy += 1
+        elif not isinstance(data, dict) or data.get("status") != "ok":
+            self.errors.append(f"risposta di errore: {str(data)[:80]}")
+        elif data.get("cached"):
+            self.cached += 1
+
+
+async def _run_wait(ws, frames: list[bytes], interval: float, deadline: float, stats: ConnectionStats, timeout: float):
+    """Send a frame, wait for its response, then respect the minimum interval.
+
+    Mirrors the frontend ``useWebcam`` loop with ``isProcessing``.
+    """
+    i = 0
+    last_send = 0.0
+    while time.perf_counter() < deadline:
+        wait = interval - (time.perf_counter() - last_send)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        last_send = time.perf_counter()
+        await ws.send(frames[i % len(frames)])
+        stats.sent += 1
+        i += 1
+        try:
+            payload = await asyncio.wait_for(ws.recv(), timeout)
+        except asyncio.TimeoutError:
+            stats.errors.append("timeout")
+            return
+        stats.record(payload, last_send)
+
+
+async def _run_fire(ws, frames: list[bytes], interval: float, deadline: float, stats: ConnectionStats, timeout: float):
+    """Send frames at a fixed rate regardless of responses.
+
+    The server answers frames of a connection in order, so responses are
+    matched to send timestamps FIFO.
+    """
+    pending: deque[float] = deque()
+
+    async def receiver():
+        while True:
+            payload = await ws.recv()
+            stats.record(payload, pending.popleft() if pending else time.perf_counter())
+
+    receive_task = asyncio.create_task(receiver())
+    try:
+        i = 0
+        next_send = time.perf_counter()
+        while time.perf_counter() < deadline:
+            pending.append(time.perf_counter())
+            await ws.send(frames[i % len(frames)])
+            stats.sent += 1
+            i += 1
+            next_send += interval
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+        # Attende le risposte ancora in volo
+        drain_deadline = time.perf_counter() + timeout
+        while pending and time.perf_counter() < drain_deadline and not receive_task.done():
+            await asyncio.sleep(0.01)
+        if pending:
+            stats.errors.append(f"{len(pending)} risposte mancanti")
+    finally:
+        receive_task.cancel()
+
+
+async def run_client(url: str, frames: list[bytes], mode: str, fps: float, duration: float, timeout: float, offset: float) -> ConnectionStats:
+    """Run one simulated camera.
+
+    Args:
+        url (str): WebSocket URL.
+        frames (list[bytes]): Encoded frames, sent cyclically.
+        mode (str): "wait" (send after response) or "fire" (fixed rate).
+        fps (float): Target frames per second.
+        duration (float): Seconds of streaming.
+        timeout (float): Seconds to wait for a response before giving up.
+        offset (float): Start delay, to spread connections over the first frame interval.
+
+    Returns:
+        ConnectionStats: Collected measurements.
+
+    """
+    import websockets
+
+    stats = ConnectionStats()
+    await asyncio.sleep(offset)
+    try:
+        async with websockets.connect(url, max_size=None, open_timeout=timeout) as ws:
+            deadline = time.perf_counter() + duration
+            runner = _run_wait if mode == "wait" else _run_fire
+            await runner(ws, frames, 1.0 / fps, deadline, stats, timeout)
+    except Exception as e:
+        stats.errors.append(f"{type(e).__name__}: {e}")
+    return stats
+
+
+async def run_level(args, frames: list[bytes], connections: int) -> dict:
+    """Run one load level and aggregate the per-connection statistics.
+
+    Args:
+        args: Parsed CLI arguments.
+        frames (list[bytes]): Encoded frames.
+        connections (int): Number of concurrent connections.
+
+    Returns:
+        dict: Aggregated results of the level.
+
+    """
+    interval = 1.0 / args.fps
+    tasks = [
+        run_client(args.url, frames, args.mode, args.fps, args.duration, args.timeout, interval * i / connections)
+        for i in range(connections)
+    ]
+    started = time.perf_counter()
+    all_stats: list[ConnectionStats] = await asyncio.gather(*tasks)
+    # Include lo sfasamento iniziale e, in modalità fire, lo smaltimento delle risposte in volo
+    elapsed = time.perf_counter() - started
+
+    latencies = [lat for s in all_stats for lat in s.latencies_ms]
+    received = sum(s.received for s in all_stats)
+    per_connection = [
+        {
+            "sent": s.sent,
+            "received": s.received,
+            "cached": s.cached,
+            "busy": s.busy,
+            "fps": round(s.received / elapsed, 2),
+            "latency": summarize(s.latencies_ms),
+            "errors": s.errors[:10],
+        }
+        for s in all_stats
+    ]
+    return {
+        "connections": connections,
+        "elapsed_s": round(elapsed, 2),
+        "target_fps": args.fps * connections,
+        "throughput_fps": round(received / elapsed, 2),
+        "fps_per_connection": summarize([c["fps"] for c in per_connection]),
+        "latency": summarize(latencies),
+        "cached_ratio": round(sum(s.cached for s in all_stats) / received, 3) if received else 0.0,
+        "busy_ratio": round(sum(s.busy for s in all_stats) / received, 3) if received else 0.0,
+        "errors": sum(len(s.errors) for s in all_stats),
+        "per_connection": per_connection,
+    }
+
+
+def find_saturation(levels: list[dict]) -> dict | None:
+    """Find the load level at which the server stops keeping up.
+
+    A level is saturated when the total throughput falls below
+    ``SATURATION_DEMAND`` of the requested frame rate, when adding connections
+    increases throughput by less than ``SATURATION_GAIN``, or when the server
+    starts failing or rejecting frames as busy.
+
+    Args:
+        levels (list[dict]): Results of ``run_level`` in increasing order.
+
+    Returns:
+        dict | None: First saturated level, the last level below it and the peak
+            throughput, or None if no saturation was observed.
+
+    """
+    previous = None
+    for current in levels:
+        below_demand = current["throughput_fps"] < SATURATION_DEMAND * current["target_fps"]
+        new_errors = current["errors"] > 0 and (previous is None or previous["errors"] == 0)
+        rejecting = current.get("busy_ratio", 0.0) > 0
+        no_gain = False
+        if previous is not None:
+            gain = (current["throughput_fps"] - previous["throughput_fps"]) / max(previous["throughput_fps"], 1e-9)
+            no_gain = gain < SATURATION_GAIN
+        if below_demand or new_errors or rejecting or no_gain:
+            return {
+                "saturated_at": current["connections"],
+                "last_ok": previous["connections"] if previous is not None else None,
+                "capacity_fps": max(level["throughput_fps"] for level in levels),
+                "latency_p95_ms": current["latency"].get("p95_ms"),
+                "last_ok_p95_ms": previous["latency"].get("p95_ms") if previous is not None else None,
+            }
+        previous = current
+    return None
+
+
+def load_frames(args) -> list[bytes]:
+    """Load frames from ``--frames-dir`` or generate synthetic ones."""
+    if args.frames_dir:
+        frames = synthetic.load_frames(args.frames_dir, limit=args.frame_count)
+        if not frames:
+            raise SystemExit(f"Nessuna immagine in {args.frames_dir}")
+        return frames
+    count = 1 if args.static else args.frame_count
+    width, height = args.frame_size
+    return [synthetic.encode_jpeg(synthetic.synthetic_frame(width, height, seed=i)) for i in range(count)]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Generatore di carico WebSocket per DDFR")
+    parser.add_argument("--url", default="ws://localhost:8000/ws", help="URL del WebSocket")
+    parser.add_argument("--connections", type=lambda v: [int(x) for x in v.split(",")], default=[1, 2, 4, 8],
+                        help="Livelli di connessioni concorrenti (es. 1,2,4,8,16)")
+    parser.add_argument("--fps", type=float, default=13.0, help="FPS obiettivo per connessione")
+    parser.add_argument("--mode", choices=["wait", "fire"], default="wait",
+                        help="wait = invio dopo la risposta (come il frontend), fire = invio a ritmo fisso")
+    parser.add_argument("--duration", type=float, default=20.0, help="Secondi per livello")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Timeout per risposta e connessione (s)")
+    parser.add_argument("--frames-dir", default=None, help="Cartella con immagini JPEG da inviare")
+    parser.add_argument("--frame-count", type=int, default=30, help="Frame sintetici distinti")
+    parser.add_argument("--frame-size", type=lambda v: tuple(int(x) for x in v.split("x")), default=(640, 480),
+                        help="Dimensione dei frame sintetici (es. 640x480)")
+    parser.add_argument("--static", action="store_true", help="Invia sempre lo stesso frame (scena statica)")
+    parser.add_argument("--output", default=None, help="File JSON del report")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """Run all load levels and print the capacity report.
+
+    Returns:
+        int: Exit code.
+
+    """
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(name)s - %(message)s")
+    args = parse_args(argv)
+    frames = load_frames(args)
+
+    levels = []
+    for connections in args.connections:
+        print(f"== {connections} connessioni, {args.fps} fps, modalità {args.mode} ==", flush=True)
+        level = asyncio.run(run_level(args, frames, connections))
+        levels.append(level)
+        lat = level["latency"]
+        print(f"  throughput {level['throughput_fps']:.1f}/{level['target_fps']:.0f} fps, "
+              f"p50 {lat.get('p50_ms', 0):.1f} ms, p95 {lat.get('p95_ms', 0):.1f} ms, "
+              f"p99 {lat.get('p99_ms', 0):.1f} ms, cached {level['cached_ratio']:.0%}, "
+              f"busy {level['busy_ratio']:.0%}, errori {level['errors']}")
+
+    saturation = find_saturation(levels)
+    if saturation:
+        print(f"\nSaturazione a {saturation['saturated_at']} connessioni "
+              f"(ultimo livello sostenuto: {saturation['last_ok']}): "
+              f"capacità ~{saturation['capacity_fps']:.1f} fps totali, p95 {saturation['latency_p95_ms'] or 0:.1f} ms")
+    else:
+        print("\nNessuna saturazione osservata: aumentare --connections o --fps")
+
+    if args.output:
+        config = {k: v for k, v in vars(args).items() if k != "output"}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "config": config, "levels": levels, "saturation": saturation},
+                      f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Command-line entry point for the benchmark suite.
+
+Examples (from the ``backend`` directory)::
+
+    python -m benchmarks.run --suites decode,identify --output results.json
+    python -m benchmarks.run --gallery-sizes 10,1000,100000,1000000 --index-types flat,hnsw
+    python -m benchmarks.run --baseline benchmarks/baselines/laptop.json --tolerance 0.1
+    python -m benchmarks.run --save-baseline benchmarks/baselines/laptop.json
+
+"""
+import argparse
+import logging
+import sys
+
+import benchmarks  # noqa: F401  (configura sys.path e variabili d'ambiente)
+from benchmarks.harness import compare, format_table, load_report, save_report
+from benchmarks.suites import INDEX_TYPES, SUITES
+
+logger = logging.getLogger(__name__)
+
+
+def _int_list(value: str) -> list[int]:
+    """Parse a comma-separated list of integers."""
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _str_list(value: str) -> list[str]:
+    """Parse a comma-separated list of strings."""
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command-line arguments.
+
+    Args:
+        argv: Argument list. Default: sys.argv[1:].
+
+    Returns:
+        argparse.Namespace: Parsed arguments.
+
+    """
+    parser = argparse.ArgumentParser(description="Benchmark della pipeline di riconoscimento DDFR")
+    parser.add_argument("--suites", type=_str_list, default=list(SUITES), help="Suite da eseguire (default: tutte)")
+    parser.add_argument("--repeat", type=int, default=50, help="Chiamate misurate per benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Seed per i dati sintetici")
+    parser.add_argument("--gallery-sizes", type=_int_list, default=[10, 1000, 10000, 100000],
+                        help="Dimensioni delle gallerie sintetiche (es. 10,1000,1000000)")
+    parser.add_argument("--index-types", type=_str_list, default=INDEX_TYPES,
+                        help="Tipi di indice: numpy, flat, hnsw, ivf")
+    parser.add_argument("--batch-sizes", type=_int_list, default=[1, 4], help="Volti per chiamata a identify")
+    parser.add_argument("--frames-dir", default=None, help="Cartella con immagini reali (volti) da usare come frame")
+    parser.add_argument("--pipeline-gallery", type=int, default=1000, help="Persone nella galleria del benchmark end-to-end")
+    parser.add_argument("--mongo-url", default=None, help="URL di un mongod locale (default: mongomock)")
+    parser.add_argument("--db-people", type=int, default=1000, help="Persone inserite per il benchmark del database")
+    parser.add_argument("--import-repeat", type=int, default=5, help="Interpreti avviati per misurare ogni import")
+    parser.add_argument("--output", default=None, help="File JSON dei risultati")
+    parser.add_argument("--baseline", default=None, help="Report JSON di riferimento da confrontare")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Rallentamento relativo tollerato (0.15 = 15%%)")
+    parser.add_argument("--save-baseline", default=None, help="Salva i risultati come nuova baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """Run the selected suites, write the report and compare with a baseline.
+
+    Args:
+        argv: Argument list. Default: sys.argv[1:].
+
+    Returns:
+        int: Exit code, 1 if a regression beyond the tolerance was found or an
+            import exceeded its budget.
+
+    """
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(name)s - %(message)s")
+    args = parse_args(argv)
+
+    unknown = [s for s in args.suites if s not in SUITES]
+    if unknown:
+        print(f"Suite sconosciute: {unknown}. Disponibili: {list(SUITES)}")
+        return 2
+
+    results = {}
+    for name in args.suites:
+        print(f"== {name} ==", flush=True)
+        results.update(SUITES[name](args))
+
+    print(format_table(results))
+
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "save_baseline")}
+    if args.output:
+        save_report(args.output, results, config)
+    if args.save_baseline:
+        save_report(args.save_baseline, results, config)
+
+    status = 0
+    over_budget = {name: r for name, r in results.items() if r.get("over_budget")}
+    for name, r in over_budget.items():
+        print(f"{name}: {r['p50_ms']:.1f} ms oltre il budget di {r['budget_ms']} ms")
+    for name, r in results.items():
+        if r.get("heavy_modules"):
+            print(f"{name}: carica {r['heavy_modules']} all'import")
+    if over_budget:
+        status = 1
+
+    if args.baseline:
+        rows = compare(results, load_report(args.baseline), args.tolerance)
+        regressions = [r for r in rows if r["regression"]]
+        print(f"\nConfronto con {args.baseline} (p50, tolleranza {args.tolerance:.0%}):")
+        for r in rows:
+            flag = "REGRESSIONE" if r["regression"] else "ok"
+            print(f"  {r['name']}: {r['baseline']:.3f} -> {r['current']:.3f} ms (x{r['ratio']}) {flag}")
+        if regressions:
+            print(f"{len(regressions)} regressioni oltre la tolleranza")
+            return 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+import logging
+import os
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks import APP_DIR, synthetic
+from benchmarks.harness import measure, summarize
+
+logger = logging.getLogger(__name__)
+
+FRAME_SIZES = [(640, 480), (1280, 720), (1920, 1080)]
+INDEX_TYPES = ["numpy", "flat", "hnsw", "ivf"]
+
+# Tempo di import massimo (p50, ms) dei moduli caricati da server e script
+IMPORT_BUDGETS_MS = {
+    "services.recognition": 600,
+    "insertdata": 800,
+    "routers.websocket": 1200,
+}
+# Moduli che non devono essere caricati dall'import: solo al primo uso
+HEAVY_MODULES = ("insightface", "onnxruntime", "faiss")
+
+
+def _skipped(reason: str) -> dict:
+    """Build the result entry of a benchmark that could not run."""
+    return {"skipped": reason}
+
+
+def _load_engine(people: list):
+    """Load a FaceEngine with InsightFace models, or None if they are unavailable."""
+    from services.recognition import FaceEngine
+    try:
+        return FaceEngine(people)
+    except SystemExit:
+        # _initialize_model chiama sys.exit(1) se il modello non si carica
+        return None
+
+
+def bench_decode(args) -> dict:
+    """Benchmark cv2.imdecode and FrameDecoder on synthetic JPEG frames.
+
+    Args:
+        args: Parsed CLI arguments (repeat).
+
+    Returns:
+        dict: Benchmark name -> statistics.
+
+    """
+    from services.recognition import DETECTION_SIZE
+    from utils.buffers import buffer_pool
+    from utils.frames import FrameDecoder, SIMPLEJPEG_AVAILABLE, TURBOJPEG_AVAILABLE
+
+    backends = ["opencv"]
+    if SIMPLEJPEG_AVAILABLE:
+        backends.append("simplejpeg")
+    if TURBOJPEG_AVAILABLE:
+        backends.append("turbojpeg")
+
+    results = {}
+    for width, height in FRAME_SIZES:
+        data = synthetic.encode_jpeg(synthetic.synthetic_frame(width, height))
+        np_arr = np.frombuffer(data, np.uint8)
+        size = f"{width}x{height}"
+
+        results[f"decode.cv2_imdecode.{size}"] = measure(
+            lambda: cv2.imdecode(np_arr, cv2.IMREAD_COLOR), args.repeat
+        )
+        for backend in backends:
+            decoder = FrameDecoder(DETECTION_SIZE, backend=backend, reduced=True)
+            results[f"decode.{backend}.reduced.{size}"] = measure(
+                lambda: decoder.decode(data, buffer_pool), args.repeat
+            )
+            results[f"decode.{backend}.gray.{size}"] = measure(lambda: decoder.decode_gray(data), args.repeat)
+    return results
+
+
+def _engine_from_matrix(matrix: np.ndarray, index_type: str):
+    """Build a model-less FaceEngine around a gallery matrix and index type.
+
+    Args:
+        matrix (np.ndarray): L2-normalized float32 gallery.
+        index_type (str): "numpy", "flat", "hnsw" or "ivf".
+
+    Returns:
+        tuple: (engine, build_seconds)
+
+    """
+    from services.recognition import FaceEngine
+
+    engine = FaceEngine([], load_model=False)
+    engine.feature_matrix = matrix
+    engine.people = [None]
+    engine.person_rows = np.zeros(matrix.shape[0], dtype=np.int32)
+
+    start = time.perf_counter()
+    if index_type != "numpy":
+        import faiss
+        n, d = matrix.shape
+        if index_type == "flat":
+            index = faiss.IndexFlatIP(d)
+        elif index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(d, 32, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efSearch = 64
+        else:
+            nlist = max(1, int(4 * np.sqrt(n)))
+            engine._bench_quantizer = faiss.IndexFlatIP(d)
+            index = faiss.IndexIVFFlat(engine._bench_quantizer, d, nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(matrix[: min(n, nlist * 64)])
+            index.nprobe = 8
+        index.add(matrix)
+        engine.index = index
+    return engine, time.perf_counter() - start
+
+
+def bench_identify(args) -> dict:
+    """Benchmark FaceEngine.identify across gallery sizes and index types.
+
+    Args:
+        args: Parsed CLI arguments (repeat, gallery_sizes, index_types, batch_sizes, seed).
+
+    Returns:
+        dict: Benchmark name -> statistics.
+
+    """
+    try:
+        import faiss  # noqa: F401
+        faiss_available = True
+    except ImportError:
+        faiss_available = False
+
+    results = {}
+    for size in args.gallery_sizes:
+        matrix = synthetic.synthetic_gallery(size, seed=args.seed)
+        for index_type in args.index_types:
+            name = f"identify.{index_type}.{size}"
+            if index_type != "numpy" and not faiss_available:
+                results[name] = _skipped("faiss non installato")
+                continue
+            if index_type == "ivf" and size < 1000:
+                results[name] = _skipped("galleria troppo piccola per IVF")
+                continue
+
+            engine, build_s = _engine_from_matrix(matrix, index_type)
+            results[f"identify.build.{index_type}.{size}"] = summarize([build_s * 1000])
+            for batch in args.batch_sizes:
+                queries = list(synthetic.synthetic_queries(matrix, batch, seed=args.seed + 1))
+                results[f"{name}.batch{batch}"] = measure(lambda: engine.identify(queries, threshold=0.4), args.repeat)
+            del engine
+    return results
+
+
+def bench_analyze(args) -> dict:
+    """Benchmark FaceEngine.analyze_frame (detection + batched recognition).
+
+    Uses images from ``--frames-dir`` when given, synthetic frames otherwise
+    (synthetic frames contain no faces and measure detection only).
+
+    Args:
+        args: Parsed CLI arguments (repeat, frames_dir).
+
+    Returns:
+        dict: Benchmark name -> statistics.
+
+    """
+    engine = _load_engine([])
+    if engine is None:
+        return {"analyze_frame": _skipped("modello InsightFace non disponibile")}
+
+    results = {}
+    if args.frames_dir:
+        frames = [cv2.imdecode(np.frombuffer(d, np.uint8), cv2.IMREAD_COLOR) for d in synthetic.load_frames(args.frames_dir)]
+        frames = [f for f in frames if f is not None]
+        counter = iter(range(1 << 62))
+        results["analyze_frame.frames_dir"] = measure(
+            lambda: engine.analyze_frame(frames[next(counter) % len(frames)]), args.repeat
+        )
+    for width, height in FRAME_SIZES:
+        frame = synthetic.synthetic_frame(width, height)
+        results[f"analyze_frame.synthetic.{width}x{height}"] = measure(lambda: engine.analyze_frame(frame), args.repeat)
+    return results
+
+
+def bench_pipeline(args) -> dict:
+    """Benchmark process_image_sync end to end with a synthetic gallery.
+
+    Measures the full path (decode, detection, recognition, search, formatting)
+    and the motion-gated path on a static scene.
+
+    Args:
+        args: Parsed CLI arguments (repeat, frames_dir, pipeline_gallery, seed).
+
+    Returns:
+        dict: Benchmark name -> statistics.
+
+    """
+    from models.person import Person
+
+    people = [Person.model_validate(doc) for doc in synthetic.synthetic_people_docs(args.pipeline_gallery, seed=args.seed)]
+    engine = _load_engine(people)
+    if engine is None:
+        return {"process_image_sync": _skipped("modello InsightFace non disponibile")}
+
+    import routers.route as route
+    import routers.websocket as websocket
+    route._engine = engine
+
+    if args.frames_dir:
+        frames = synthetic.load_frames(args.frames_dir)
+    else:
+        frames = [synthetic.encode_jpeg(synthetic.synthetic_frame(640, 480, seed=i)) for i in range(8)]
+
+    counter = iter(range(1 << 62))
+    results = {
+        "process_image_sync.full": measure(
+            lambda: websocket.process_image_sync(frames[next(counter) % len(frames)]), args.repeat
+        )
+    }
+    session = websocket.StreamSession()
+    if session.motion_gate is not None:
+        results["process_image_sync.static_gated"] = measure(
+            lambda: websocket.process_image_sync(frames[0], session), args.repeat
+        )
+    return results
+
+
+def bench_database(args) -> dict:
+    """Benchmark Database.get_all_people and Database.load_gallery on a local mongod or mongomock.
+
+    mongomock ignores the ``RawBSONDocument`` codec, so the raw gallery loader
+    is only measured against mongod.
+
+    Args:
+        args: Parsed CLI arguments (repeat, mongo_url, db_people, seed).
+
+    Returns:
+        dict: Benchmark name -> statistics.
+
+    """
+    from services.database import Database
+
+    url = args.mongo_url
+    if url is None:
+        try:
+            import mongomock
+        except ImportError:
+            return {"get_all_people": _skipped("né --mongo-url né mongomock disponibili")}
+        Database.close_connection()
+        Database.current_client = mongomock.MongoClient()
+        url = "mongodb://localhost:27017/"
+        backend = "mongomock"
+    else:
+        backend = "mongod"
+
+    db_name = "ddfr_benchmark"
+    dataset = Database(url=url, name=db_name, collection="people")
+    collection = dataset.get_collection()
+    if backend == "mongomock" and "single_user" in collection.index_information():
+        # mongomock ignora partialFilterExpression: l'indice renderebbe unico ogni ruolo
+        collection.drop_index("single_user")
+    collection.delete_many({})
+    collection.insert_many(synthetic.synthetic_people_docs(args.db_people, seed=args.seed))
+
+    repeat = max(3, args.repeat // 10)
+    try:
+        results = {
+            f"get_all_people.{backend}.{args.db_people}": measure(dataset.get_all_people, repeat, warmup=1),
+            f"load_gallery.dict.{backend}.{args.db_people}": measure(
+                lambda: dataset.load_gallery(raw=False), repeat, warmup=1
+            ),
+        }
+        if backend == "mongod":
+            results[f"load_gallery.raw.{backend}.{args.db_people}"] = measure(
+                lambda: dataset.load_gallery(raw=True), repeat, warmup=1
+            )
+    finally:
+        Database.current_client.drop_database(db_name)
+        Database.close_connection()
+    return results
+
+
+def _import_time(module: str) -> tuple[float, list[str]]:
+    """Import a module in a fresh interpreter with ``-X importtime``.
+
+    Args:
+        module (str): Dotted module name, relative to ``backend/app``.
+
+    Returns:
+        tuple[float, list[str]]: Cumulative import time in milliseconds and the
+            ``HEAVY_MODULES`` loaded by the import.
+
+    Raises:
+        RuntimeError: If the import fails.
+
+    """
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR,
+        env={**os.environ, "PYTHONPATH": APP_DIR},
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    # Righe "import time: <self us> | <cumulative us> | <nome>": il modulo richiesto non è indentato
+    for line in completed.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].rstrip() == f" {module}":
+            heavy = [m for m in completed.stdout.strip().split(",") if m]
+            return int(parts[1]) / 1000, heavy
+    raise RuntimeError(f"{module} assente nell'output di -X importtime")
+
+
+def bench_imports(args) -> dict:
+    """Measure the import time of the backend entry points against a budget.
+
+    Each module is imported ``--import-repeat`` times in a fresh interpreter
+    (after one untimed import that writes the bytecode cache). Entries carry
+    ``budget_ms`` and ``over_budget`` (p50 above the budget), and
+    ``heavy_modules``: inference libraries that the import loaded although
+    they should only be loaded on first use.
+
+    Args:
+        args: Parsed CLI arguments (import_repeat).
+
+    Returns:
+        dict: Benchmark name -> statistics.
+
+    """
+    results = {}
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        name = f"import.{module}"
+        try:
+            _import_time(module)
+            samples = [_import_time(module) for _ in range(args.import_repeat)]
+        except RuntimeError as e:
+            results[name] = _skipped(str(e))
+            continue
+        stats = summarize([ms for ms, _ in samples])
+        stats["budget_ms"] = budget
+        stats["over_budget"] = stats["p50_ms"] > budget
+        stats["heavy_modules"] = samples[0][1]
+        results[name] = stats
+    return results
+
+
+SUITES = {
+    "decode": bench_decode,
+    "identify": bench_identify,
+    "analyze": bench_analyze,
+    "pipeline": bench_pipeline,
+    "database": bench_database,
+    "imports": bench_imports,
+}
@@ -0,0 +1,144 @@
+import os
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+EMBEDDING_DIM = 512
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def synthetic_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Generate a deterministic BGR frame that compresses like a camera image.
+
+    Smooth gradients plus a few filled shapes and mild noise, so JPEG size and
+    decode cost are close to a real webcam frame (pure noise would not be).
+
+    Args:
+        width (int): Frame width.
+        height (int): Frame height.
+        seed (int): Random seed. Default: 0.
+
+    Returns:
+        np.ndarray: uint8 BGR frame.
+
+    """
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, width, dtype=np.float32)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:, :, 0] = (80 + 120 * x * (1 - y)).astype(np.uint8)
+    frame[:, :, 1] = (60 + 100 * y + 40 * x).astype(np.uint8)
+    frame[:, :, 2] = (90 + 110 * (1 - x) * y).astype(np.uint8)
+
+    for _ in range(8):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        axes = (int(rng.integers(width // 20, width // 6)), int(rng.integers(height // 20, height // 5)))
+        color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+        cv2.ellipse(frame, center, axes, float(rng.integers(0, 180)), 0, 360, color, -1)
+
+    noise = rng.integers(-6, 7, size=frame.shape, dtype=np.int16)
+    return np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def encode_jpeg(frame: np.ndarray, quality: int = 70) -> bytes:
+    """Encode a frame as JPEG bytes (the frontend uses quality 0.7).
+
+    Args:
+        frame (np.ndarray): BGR frame.
+        quality (int): JPEG quality. Default: 70.
+
+    Returns:
+        bytes: JPEG encoded frame.
+
+    """
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Codifica JPEG fallita")
+    return buffer.tobytes()
+
+
+def load_frames(folder: str, limit: int = 50) -> list[bytes]:
+    """Load encoded images from a directory, sorted by name.
+
+    Args:
+        folder (str): Directory with JPEG/PNG/WebP images.
+        limit (int): Maximum number of images. Default: 50.
+
+    Returns:
+        list[bytes]: Encoded image bytes.
+
+    """
+    names = sorted(n for n in os.listdir(folder) if n.lower().endswith(IMAGE_EXTENSIONS))
+    frames = []
+    for name in names[:limit]:
+        with open(os.path.join(folder, name), "rb") as f:
+            frames.append(f.read())
+    return frames
+
+
+def synthetic_gallery(size: int, dim: int = EMBEDDING_DIM, seed: int = 0) -> np.ndarray:
+    """Generate a matrix of random unit embeddings.
+
+    Args:
+        size (int): Number of embeddings (rows).
+        dim (int): Embedding dimension. Default: 512.
+        seed (int): Random seed. Default: 0.
+
+    Returns:
+        np.ndarray: float32 matrix of shape (size, dim) with L2-normalized rows.
+
+    """
+    rng = np.random.default_rng(seed)
+    matrix = rng.standard_normal((size, dim), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix
+
+
+def synthetic_queries(gallery: np.ndarray, count: int, noise: float = 0.05, seed: int = 1) -> np.ndarray:
+    """Generate query embeddings close to random gallery rows.
+
+    Args:
+        gallery (np.ndarray): Gallery matrix.
+        count (int): Number of queries.
+        noise (float): Standard deviation of the perturbation. Default: 0.05.
+        seed (int): Random seed. Default: 1.
+
+    Returns:
+        np.ndarray: float32 matrix of shape (count, dim).
+
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, gallery.shape[0], size=count)
+    queries = gallery[rows] + rng.standard_normal((count, gallery.shape[1]), dtype=np.float32) * noise
+    return queries.astype(np.float32)
+
+
+def synthetic_people_docs(count: int, encodings_per_person: int = 3, dim: int = EMBEDDING_DIM, seed: int = 0) -> list[dict]:
+    """Generate MongoDB person documents with random embeddings.
+
+    Documents follow the schema written by ``Database._person_to_document``.
+
+    Args:
+        count (int): Number of people.
+        encodings_per_person (int): Embeddings per person. Default: 3.
+        dim (int): Embedding dimension. Default: 512.
+        seed (int): Random seed. Default: 0.
+
+    Returns:
+        list[dict]: Person documents (without ``_id``).
+
+    """
+    gallery = synthetic_gallery(count * encodings_per_person, dim, seed)
+    docs = []
+    for i in range(count):
+        rows = gallery[i * encodings_per_person:(i + 1) * encodings_per_person]
+        docs.append({
+            "name": f"Nome{i:06d}",
+            "surname": f"Cognome{i:06d}",
+            "birthday": datetime(1950 + i % 60, 1 + i % 12, 1 + i % 28),
+            "relationship": "altro",
+            "role": "guest",
+            "encoding": {f"{i:08x}{j:024x}": row.tolist() for j, row in enumerate(rows)},
+        })
+    return docs
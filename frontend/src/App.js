@@ -41,9 +41,20 @@ function App() {
   // Hook per tracking latenza
   const { latency, avgLatency, markSent, markReceived } = useLatency();
 
+  // Dimensioni dell'ultimo frame inviato (cambiano con i suggerimenti del server)
+  const sentSizeRef = useRef({ width: CAPTURE_WIDTH, height: CAPTURE_HEIGHT });
+  // Dimensioni del frame a cui si riferiscono i volti mostrati
+  const [frameSize, setFrameSize] = useState({ width: CAPTURE_WIDTH, height: CAPTURE_HEIGHT });
+
   // Handler per messaggi WebSocket
   const handleMessage = (data) => {
     markReceived(); // Marca ricezione risposta per calcolo latenza
+    // Server sovraccarico: il frame è stato scartato, manteniamo i volti precedenti
+    if (data.status === "busy") return;
+
+    // La risposta si riferisce all'ultimo frame inviato
+    const sent = sentSizeRef.current;
+    setFrameSize(prev => (prev.width === sent.width && prev.height === sent.height ? prev : sent));
     const rawFaces = Array.isArray(data.faces) ? data.faces : [];
 
     const parsedFaces = rawFaces.map((f) => {
@@ -69,10 +80,10 @@ function App() {
   };
 
   // Hook WebSocket con riconnessione automatica
-  const { ws, connectionStatus, isProcessing } = useWebSocket(handleMessage);
+  const { ws, connectionStatus, isProcessing, hints } = useWebSocket(handleMessage);
 
-  // Hook per cattura e invio frame (con requestAnimationFrame)
-  useWebcam(webcamRef, ws, isProcessing, markSent);
+  // Hook per cattura e invio frame (con requestAnimationFrame), al ritmo suggerito dal server
+  useWebcam(webcamRef, ws, isProcessing, markSent, hints, sentSizeRef);
 
   // Stato per forzare il ricalcolo dello scaling quando le dimensioni cambiano
   const [videoDimensions, setVideoDimensions] = useState({ width: 0, height: 0, clientWidth: 0, clientHeight: 0 });
@@ -109,9 +120,10 @@ function App() {
   }, [isCameraReady]);
   
   // Calcolo scale factors con useMemo (ottimizzazione)
-  // Le coordinate dal backend sono basate sul frame ridimensionato (CAPTURE_WIDTH x CAPTURE_HEIGHT = 640x480)
-  // Il frame viene catturato usando drawImage(video, 0, 0, CAPTURE_WIDTH, CAPTURE_HEIGHT)
-  // quindi le coordinate sono sempre relative a 640x480
+  // Le coordinate dal backend sono basate sul frame ridimensionato (frameSize, 640x480 di default,
+  // ridotto dal server quando è sotto carico)
+  // Il frame viene catturato usando drawImage(video, 0, 0, frameSize.width, frameSize.height)
+  // quindi le coordinate sono relative a frameSize
   // Dobbiamo scalare dalle coordinate 640x480 alle dimensioni del video renderizzato VISIBILE
   const { scaleX, scaleY, offsetX, offsetY } = useMemo(() => {
     const videoEl = webcamRef.current?.video;
@@ -120,8 +132,8 @@ function App() {
     }
     
     // Dimensioni del frame catturato (quello inviato al backend)
-    const captureWidth = CAPTURE_WIDTH;  // 640
-    const captureHeight = CAPTURE_HEIGHT; // 480
+    const captureWidth = frameSize.width;  // 640 di default
+    const captureHeight = frameSize.height; // 480 di default
     
     // Dimensioni reali del video (usa lo stato per garantire che siano aggiornate)
     const videoWidth = videoDimensions.width;
@@ -180,7 +192,7 @@ function App() {
       offsetX: -offsetX, // Negativo perché le coordinate devono essere spostate a sinistra
       offsetY: -offsetY   // Negativo perché le coordinate devono essere spostate in alto
     };
-  }, [isCameraReady, videoDimensions]); // Ricalcola quando la camera è pronta o le dimensioni cambiano
+  }, [isCameraReady, videoDimensions, frameSize]); // Ricalcola quando la camera è pronta o le dimensioni cambiano
 
   // Handler fullscreen
   const requestFullscreen = () => {
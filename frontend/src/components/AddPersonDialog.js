@@ -77,6 +77,12 @@ const AddPersonDialog = ({ open, onOpenChange, onSuccess }) => {
 
       const result = await response.json();
       console.log('Persona creata:', result);
+      if (result.photos_rejected?.length) {
+        console.warn('Foto scartate per qualità:', result.photos_rejected);
+      }
+      if (result.photos_duplicate?.length) {
+        console.info('Foto quasi duplicate non salvate:', result.photos_duplicate);
+      }
       
       // Reset e chiudi
       resetDialog();
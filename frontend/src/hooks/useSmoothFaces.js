@@ -19,7 +19,8 @@ export const useSmoothFaces = (rawFaces, threshold = 8) => {
     }
 
     const newSmoothedFaces = rawFaces.map((face) => {
-      const faceId = face.id || `${face.name}_${face.top}_${face.left}`;
+      // track_id è stabile tra i frame, id cambia quando il volto si sposta
+      const faceId = face.track_id ?? face.id ?? `${face.name}_${face.top}_${face.left}`;
       const prevFace = previousFacesRef.current[faceId];
 
       if (!prevFace) {
@@ -62,7 +63,7 @@ export const useSmoothFaces = (rawFaces, threshold = 8) => {
     setSmoothedFaces(newSmoothedFaces);
 
     // Cleanup: rimuovi volti che non sono più presenti
-    const currentIds = new Set(rawFaces.map(f => f.id || `${f.name}_${f.top}_${f.left}`));
+    const currentIds = new Set(rawFaces.map(f => String(f.track_id ?? f.id ?? `${f.name}_${f.top}_${f.left}`)));
     Object.keys(previousFacesRef.current).forEach(id => {
       if (!currentIds.has(id)) {
         delete previousFacesRef.current[id];
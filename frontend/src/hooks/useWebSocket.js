@@ -1,15 +1,32 @@
 import { useRef, useState, useEffect } from 'react';
-import { getWebSocketUrl, RECONNECT_BASE_DELAY, RECONNECT_MAX_DELAY } from '../utils/constants';
+import {
+  getWebSocketUrl,
+  RECONNECT_BASE_DELAY,
+  RECONNECT_MAX_DELAY,
+  MIN_FRAME_INTERVAL,
+  CAPTURE_WIDTH,
+  CAPTURE_HEIGHT
+} from '../utils/constants';
+
+// Suggerimenti iniziali, sostituiti da quelli inviati dal server ad ogni risposta
+const DEFAULT_HINTS = {
+  intervalMs: MIN_FRAME_INTERVAL,
+  width: CAPTURE_WIDTH,
+  height: CAPTURE_HEIGHT
+};
 
 /**
  * Hook per gestire la connessione WebSocket con riconnessione automatica
+ * Memorizza in `hints` l'intervallo tra frame e la risoluzione di cattura
+ * suggeriti dal server in base al suo carico
  * @param {Function} onMessage - Callback chiamata quando arriva un messaggio
- * @returns {Object} { ws, connectionStatus, isProcessing }
+ * @returns {Object} { ws, connectionStatus, isProcessing, hints }
  */
 export const useWebSocket = (onMessage) => {
   const ws = useRef(null);
   const reconnectTimerRef = useRef(null);
   const isProcessing = useRef(false);
+  const hints = useRef(DEFAULT_HINTS);
   
   const [connectionStatus, setConnectionStatus] = useState("disconnected");
   const reconnectAttemptsRef = useRef(0);
@@ -38,6 +55,7 @@ export const useWebSocket = (onMessage) => {
         console.log("WS Connesso con successo a:", wsUrl);
         setConnectionStatus("connected");
         reconnectAttemptsRef.current = 0;
+        hints.current = DEFAULT_HINTS;
         if (reconnectTimerRef.current) {
           clearTimeout(reconnectTimerRef.current);
           reconnectTimerRef.current = null;
@@ -63,6 +81,15 @@ export const useWebSocket = (onMessage) => {
         if (onMessage) {
           onMessage(data);
         }
+
+        // Applicati dopo onMessage: la risposta si riferisce al frame già inviato
+        if (data.hints) {
+          hints.current = {
+            intervalMs: data.hints.interval_ms ?? DEFAULT_HINTS.intervalMs,
+            width: data.hints.width ?? DEFAULT_HINTS.width,
+            height: data.hints.height ?? DEFAULT_HINTS.height
+          };
+        }
       };
     } catch (e) {
       console.error("Errore nell'inizializzazione WebSocket:", e);
@@ -88,7 +115,8 @@ export const useWebSocket = (onMessage) => {
   return {
     ws,
     connectionStatus,
-    isProcessing
+    isProcessing,
+    hints
   };
 };
 
@@ -1,6 +1,5 @@
 import { useRef, useEffect } from 'react';
 import { captureAndSend } from '../utils/videoCapture';
-import { MIN_FRAME_INTERVAL } from '../utils/constants';
 
 /**
  * Hook per gestire la cattura e l'invio dei frame via WebSocket
@@ -9,9 +8,11 @@ import { MIN_FRAME_INTERVAL } from '../utils/constants';
  * @param {Object} ws - Ref al WebSocket
  * @param {Object} isProcessing - Ref per tracking dello stato di processamento
  * @param {Function} onFrameSent - Callback chiamata quando viene inviato un frame
+ * @param {Object} hints - Ref con intervallo e risoluzione suggeriti dal server
+ * @param {Object} sentSize - Ref aggiornato con le dimensioni dell'ultimo frame inviato
  * @returns {Object} { captureCanvasRef }
  */
-export const useWebcam = (webcamRef, ws, isProcessing, onFrameSent) => {
+export const useWebcam = (webcamRef, ws, isProcessing, onFrameSent, hints, sentSize) => {
   const captureCanvasRef = useRef(null);
   const lastSendTimeRef = useRef(0);
 
@@ -21,9 +22,11 @@ export const useWebcam = (webcamRef, ws, isProcessing, onFrameSent) => {
     const loop = () => {
       const now = performance.now();
       
-      // Controllo throttling e disponibilità
+      const { intervalMs, width, height } = hints.current;
+
+      // Controllo throttling (intervallo suggerito dal server) e disponibilità
       if (
-        now - lastSendTimeRef.current >= MIN_FRAME_INTERVAL &&
+        now - lastSendTimeRef.current >= intervalMs &&
         webcamRef.current?.video.readyState === 4 &&
         ws.current?.readyState === WebSocket.OPEN &&
         !isProcessing.current
@@ -32,11 +35,14 @@ export const useWebcam = (webcamRef, ws, isProcessing, onFrameSent) => {
         lastSendTimeRef.current = now;
         
         const video = webcamRef.current.video;
-        const sent = captureAndSend(video, ws.current, captureCanvasRef.current);
+        const sent = captureAndSend(video, ws.current, captureCanvasRef.current, width, height);
         
-        // Marca timestamp invio per calcolo latenza
-        if (sent && onFrameSent) {
-          onFrameSent();
+        if (sent) {
+          sentSize.current = { width, height };
+          // Marca timestamp invio per calcolo latenza
+          if (onFrameSent) {
+            onFrameSent();
+          }
         }
       }
       
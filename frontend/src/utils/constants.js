@@ -29,6 +29,7 @@ export const getApiUrl = () => {
 
 // Intervalli e timing
 export const MIN_FRAME_INTERVAL = 15; // ms (~13 FPS - bilanciamento ottimale tra fluidità e performance)
+// Intervallo e risoluzione iniziali: poi seguono i suggerimenti "hints" del server
 export const RECONNECT_BASE_DELAY = 3000; // ms
 export const RECONNECT_MAX_DELAY = 15000; // ms
 
@@ -38,7 +39,7 @@ export const VIDEO_CONSTRAINTS = {
   height: { ideal: 720 }
 };
 
-// Dimensioni frame per l'invio (ridotte per ottimizzare banda)
+// Dimensioni frame per l'invio (ridotte per ottimizzare banda), finché il server non ne suggerisce altre
 export const CAPTURE_WIDTH = 640;
 export const CAPTURE_HEIGHT = 480;
 export const JPEG_QUALITY = 0.7;
@@ -2,12 +2,14 @@
 import { CAPTURE_WIDTH, CAPTURE_HEIGHT, JPEG_QUALITY } from './constants';
 
 /**
- * Cattura un frame dal video e lo ridimensiona a 640x480 per ottimizzare banda
+ * Cattura un frame dal video e lo ridimensiona (640x480 di default) per ottimizzare banda
  * @param {HTMLVideoElement} video - Elemento video da cui catturare
  * @param {HTMLCanvasElement} canvas - Canvas riutilizzabile (opzionale)
+ * @param {number} width - Larghezza del frame catturato
+ * @param {number} height - Altezza del frame catturato
  * @returns {HTMLCanvasElement|null} Canvas con il frame catturato
  */
-export const captureFrame = (video, canvas = null) => {
+export const captureFrame = (video, canvas = null, width = CAPTURE_WIDTH, height = CAPTURE_HEIGHT) => {
   if (!video || !video.videoWidth || !video.videoHeight) {
     return null;
   }
@@ -18,18 +20,18 @@ export const captureFrame = (video, canvas = null) => {
   }
 
   // Imposta dimensioni ridotte (ottimizzazione prestazioni)
-  if (canvas.width !== CAPTURE_WIDTH || canvas.height !== CAPTURE_HEIGHT) {
-    canvas.width = CAPTURE_WIDTH;
-    canvas.height = CAPTURE_HEIGHT;
+  if (canvas.width !== width || canvas.height !== height) {
+    canvas.width = width;
+    canvas.height = height;
   }
 
   const ctx = canvas.getContext('2d');
   if (!ctx) return null;
 
-  // Disegna il frame ridimensionato a 640x480
+  // Disegna il frame ridimensionato a width x height
   // NOTA: Questo potrebbe distorcere il video se l'aspect ratio è diverso,
-  // ma le coordinate dal backend saranno relative a questo frame 640x480
-  ctx.drawImage(video, 0, 0, CAPTURE_WIDTH, CAPTURE_HEIGHT);
+  // ma le coordinate dal backend saranno relative a questo frame
+  ctx.drawImage(video, 0, 0, width, height);
 
   return canvas;
 };
@@ -48,14 +50,16 @@ export const canvasToBlob = (canvas, callback) => {
  * @param {HTMLVideoElement} video - Elemento video
  * @param {WebSocket} ws - WebSocket connection
  * @param {HTMLCanvasElement} canvasRef - Canvas riutilizzabile
+ * @param {number} width - Larghezza del frame inviato
+ * @param {number} height - Altezza del frame inviato
  * @returns {boolean} True se l'invio è stato avviato
  */
-export const captureAndSend = (video, ws, canvasRef) => {
+export const captureAndSend = (video, ws, canvasRef, width = CAPTURE_WIDTH, height = CAPTURE_HEIGHT) => {
   if (!ws || ws.readyState !== WebSocket.OPEN) {
     return false;
   }
 
-  const canvas = captureFrame(video, canvasRef);
+  const canvas = captureFrame(video, canvasRef, width, height);
   if (!canvas) return false;
 
   canvasToBlob(canvas, (blob) => {